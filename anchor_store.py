@@ -0,0 +1,551 @@
+# anchor_store.py
+
+import argparse
+import json
+import os
+import struct
+import textwrap
+import threading
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # No flock on this platform: appenders are only safe within one process
+    fcntl = None
+
+from expression_dag import LazyAnchor, default_dag
+
+RECORD_HEADER = struct.Struct("<II")  # payload length, crc32
+
+
+class AnchorStore:
+    """
+    Append-only store of compiled anchors, a directory in place of the
+    whole-file JSON rewrite of compiled_braid.sbraid.
+
+    Anchors are appended as CRC-framed JSON records to the active segment
+    (`segment-NNNNNNNN.sbr`); a new segment is started once it passes
+    `segment_bytes`. Each segment has an index file of
+    `[id, tier, offset, length]` lines, so opening the store reads only the
+    indexes, and lookups by ID or tier read just the records they need. A
+    later record for the same ID supersedes earlier ones. MANIFEST lists
+    the live segments, oldest first.
+
+    Anchors that name an ExpressionDAG node ("expr_id") without storing
+    their "expression" (fusions, mutations) are stored that way: the nodes
+    they use go once into NODES, as lines of `ExpressionDAG.rows`, ahead of
+    the records, and are read back into the DAG so those anchors come back
+    as LazyAnchors.
+
+    Appenders in several processes are serialised with flock on LOCK, and
+    each picks up the others' records from the index before writing. A
+    crash mid-append leaves a torn tail, which the next appender truncates
+    (re-indexing any complete records the index missed). A background
+    thread compacts the sealed segments into one, dropping superseded
+    records, once there are `compact_segments` of them or at least
+    `compact_garbage` of their records are superseded; it holds the lock
+    only to pick the segments and to swap the manifest.
+    """
+
+    def __init__(self, path, segment_bytes=8 << 20, fsync=True, compact_interval=60.0,
+                 compact_segments=4, compact_garbage=0.5):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.compact_interval = compact_interval
+        self.compact_segments = compact_segments
+        self.compact_garbage = compact_garbage
+        self.segments = []     # Live segment numbers, oldest first; the last one takes appends
+        self._next = 1
+        self._index = {}       # id -> (segment, offset, length, tier)
+        self._tiers = {}       # tier -> set of ids
+        self._records = {}     # segment -> records indexed in it, superseded ones included
+        self._ends = {}        # segment -> end of its last indexed record
+        self._consumed = {}    # segment -> bytes of its index file read
+        self._sealed = set()   # Sealed segments whose index has been read to the end
+        self._files = {}       # segment -> open read handle
+        self._node_ids = set() # expr_ids of the nodes in NODES
+        self._nodes_consumed = 0
+        self._lock = threading.RLock()
+        self._closed = False
+        self._wake = threading.Event()
+        os.makedirs(path, exist_ok=True)
+        self._lock_file = open(os.path.join(path, "LOCK"), "a+b")
+        with self._locked(exclusive=True):
+            if not os.path.exists(self._manifest_path()):
+                self._write_manifest([1], 2)
+                for name in (self._segment_path(1), self._index_path(1)):
+                    open(name, "ab").close()
+            self._refresh()
+        self._compactor = None
+        if compact_interval is not None:
+            self._compactor = threading.Thread(target=self._compact_loop, name="AnchorStoreCompactor", daemon=True)
+            self._compactor.start()
+
+    # -- Files --
+
+    def _manifest_path(self):
+        return os.path.join(self.path, "MANIFEST")
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, f"segment-{segment:08d}.sbr")
+
+    def _nodes_path(self):
+        return os.path.join(self.path, "NODES")
+
+    def _index_path(self, segment):
+        return os.path.join(self.path, f"segment-{segment:08d}.idx")
+
+    def _write_manifest(self, segments, next_segment):
+        blob = json.dumps({"segments": segments, "next": next_segment}).encode()
+        tmp_path = f"{self._manifest_path()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path())
+
+    @contextmanager
+    def _locked(self, exclusive=False):
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    # -- Index --
+
+    def _refresh(self):
+        """Catch up with the manifest and the index entries other appenders wrote. Needs the lock."""
+        # Read every time: a replaced MANIFEST can reuse the inode, size and mtime of the old one
+        with open(self._manifest_path(), "rb") as f:
+            manifest = json.load(f)
+        segments = manifest["segments"]
+        if segments[:len(self.segments)] != self.segments:
+            self._reload()  # Compacted: segments were replaced, not just added
+        self.segments = segments
+        self._next = manifest["next"]
+        for segment in self.segments:
+            if segment not in self._files:
+                self._files[segment] = open(self._segment_path(segment), "rb")
+        self._read_nodes()
+        # A sealed segment's index is read to the end once; only the active one grows
+        for segment in self.segments:
+            if segment not in self._sealed:
+                self._read_index(segment)
+                if segment != self.segments[-1]:
+                    self._sealed.add(segment)
+
+    def _reload(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        self._index.clear()
+        self._tiers.clear()
+        self._records.clear()
+        self._ends.clear()
+        self._consumed.clear()
+        self._sealed.clear()
+        self.segments = []
+
+    def _read_index(self, segment):
+        consumed = self._consumed.get(segment, 0)
+        with open(self._index_path(segment), "rb") as f:
+            f.seek(consumed)
+            data = f.read()
+        complete = data.rfind(b"\n") + 1  # A torn last line is left for the next appender to repair
+        for line in data[:complete].splitlines():
+            anchor_id, tier, offset, length = json.loads(line)
+            self._put(anchor_id, (segment, offset, length, tier))
+        self._consumed[segment] = consumed + complete
+
+    def _read_nodes(self):
+        """Load the expression nodes other appenders added to NODES into the DAG. Needs the lock."""
+        path = self._nodes_path()
+        if not os.path.exists(path) or os.path.getsize(path) == self._nodes_consumed:
+            return
+        with open(path, "rb") as f:
+            f.seek(self._nodes_consumed)
+            data = f.read()
+        complete = data.rfind(b"\n") + 1  # Like the indexes, a torn last line is repaired by the next appender
+        rows = [json.loads(line) for line in data[:complete].splitlines()]
+        default_dag().load_rows(rows)
+        self._node_ids.update(row[0] for row in rows)
+        self._nodes_consumed += complete
+
+    def _append_nodes(self, anchors):
+        """Write the nodes the lazy `anchors` use that NODES lacks, before their records. Needs the exclusive lock."""
+        dag = default_dag()
+        known = set(self._node_ids)
+        rows = []
+        for anchor in anchors:
+            if "expression" in anchor or "expr_id" not in anchor:
+                continue
+            node = dag.find(anchor)
+            if node is None:
+                raise ValueError(f"[AnchorStore] Anchor {anchor['id']} has no expression and an unknown expr_id {anchor['expr_id']}")
+            rows += dag.rows(node, known)
+        path = self._nodes_path()
+        if os.path.exists(path) and os.path.getsize(path) > self._nodes_consumed:
+            with open(path, "r+b") as f:
+                f.truncate(self._nodes_consumed)
+        if not rows:
+            return
+        with open(path, "ab") as f:
+            f.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode())
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._read_nodes()
+
+    def _put(self, anchor_id, location):
+        old = self._index.get(anchor_id)
+        if old is not None:
+            self._tiers[old[3]].discard(anchor_id)
+        self._index[anchor_id] = location
+        self._tiers.setdefault(location[3], set()).add(anchor_id)
+        segment, offset, length, _ = location
+        self._records[segment] = self._records.get(segment, 0) + 1
+        self._ends[segment] = max(self._ends.get(segment, 0), offset + length)
+
+    def _repair(self, segment):
+        """Drop a torn tail left by a crashed appender, indexing any complete records it had written. Needs the exclusive lock."""
+        index_path = self._index_path(segment)
+        if os.path.getsize(index_path) > self._consumed.get(segment, 0):
+            with open(index_path, "r+b") as f:
+                f.truncate(self._consumed.get(segment, 0))
+        end = self._ends.get(segment, 0)
+        path = self._segment_path(segment)
+        if os.path.getsize(path) == end:
+            return
+        with open(path, "r+b") as f:
+            f.seek(end)
+            data = f.read()
+            position = 0
+            lines = []
+            while position + RECORD_HEADER.size <= len(data):
+                length, crc = RECORD_HEADER.unpack_from(data, position)
+                payload = data[position + RECORD_HEADER.size:position + RECORD_HEADER.size + length]
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                anchor = json.loads(payload)
+                lines.append([anchor["id"], anchor.get("tier", 0), end + position, RECORD_HEADER.size + length])
+                position += RECORD_HEADER.size + length
+            if position < len(data):
+                print(f"[AnchorStore] Dropping torn record at {path}:{end + position}")
+                f.truncate(end + position)
+        if lines:
+            self._append_index(segment, lines)
+
+    def _append_index(self, segment, lines):
+        with open(self._index_path(segment), "ab") as f:
+            f.write("".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode())
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._read_index(segment)
+
+    # -- Writing --
+
+    def append(self, anchor, replace=False):
+        """Store `anchor`; returns False if its ID is already stored (unless `replace`)."""
+        return self.append_many([anchor], replace=replace) == 1
+
+    def append_many(self, anchors, replace=False):
+        """
+        Store a batch of anchors in one locked write. Anchors whose ID is
+        already stored are skipped unless `replace`; returns how many were written.
+        """
+        anchors = list(anchors)
+        with self._locked(exclusive=True):
+            self._refresh()
+            segment = self.segments[-1]
+            self._repair(segment)
+            seen = set()
+            frames = []
+            written = []
+            for anchor in anchors:
+                anchor_id = anchor["id"]
+                if anchor_id in seen or (not replace and anchor_id in self._index):
+                    continue
+                seen.add(anchor_id)
+                written.append(anchor)
+                payload = json.dumps(anchor, ensure_ascii=False).encode()
+                frames.append((anchor_id, anchor.get("tier", 0), RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload))
+            if not frames:
+                return 0
+            self._append_nodes(written)
+            if self._ends.get(segment, 0) >= self.segment_bytes:
+                segment = self._roll()
+            offset = self._ends.get(segment, 0)
+            lines = []
+            for anchor_id, tier, frame in frames:
+                lines.append([anchor_id, tier, offset, len(frame)])
+                offset += len(frame)
+            with open(self._segment_path(segment), "ab") as f:
+                f.write(b"".join(frame for _, _, frame in frames))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            self._append_index(segment, lines)
+        return len(frames)
+
+    def _roll(self):
+        """Seal the active segment and start a new one. Needs the exclusive lock."""
+        segment = self._next
+        for name in (self._segment_path(segment), self._index_path(segment)):
+            open(name, "ab").close()
+        self._write_manifest(self.segments + [segment], segment + 1)
+        self._refresh()
+        if len(self.segments) - 1 >= self.compact_segments:
+            self._wake.set()
+        return segment
+
+    # -- Reading --
+
+    def __len__(self):
+        with self._locked():
+            self._refresh()
+            return len(self._index)
+
+    def __contains__(self, anchor_id):
+        with self._locked():
+            self._refresh()
+            return anchor_id in self._index
+
+    def ids(self):
+        """Every stored anchor ID, oldest first."""
+        with self._locked():
+            self._refresh()
+            return [anchor_id for _, anchor_id in self._ordered(self._index)]
+
+    def tiers(self):
+        """{tier: number of anchors}."""
+        with self._locked():
+            self._refresh()
+            return {tier: len(ids) for tier, ids in sorted(self._tiers.items()) if ids}
+
+    def get(self, anchor_id):
+        with self._locked():
+            self._refresh()
+            location = self._index.get(anchor_id)
+            if location is None:
+                return None
+            segment, offset, length, _ = location
+            return _decode(os.pread(self._files[segment].fileno(), length, offset))
+
+    def get_many(self, anchor_ids):
+        return [self.get(anchor_id) for anchor_id in anchor_ids]
+
+    def __iter__(self):
+        """Stream every anchor, oldest first, reading one record at a time."""
+        return self._scan(None)
+
+    def by_tier(self, tier):
+        """Stream the anchors of one tier, oldest first."""
+        return self._scan(tier)
+
+    def _ordered(self, ids):
+        order = {segment: i for i, segment in enumerate(self.segments)}
+        located = sorted(
+            (order[self._index[anchor_id][0]], self._index[anchor_id][1], anchor_id) for anchor_id in ids
+        )
+        return [((self.segments[position], offset), anchor_id) for position, offset, anchor_id in located]
+
+    def _scan(self, tier):
+        with self._locked():
+            self._refresh()
+            ids = self._index if tier is None else self._tiers.get(tier, ())
+            plan = [(segment, offset, self._index[anchor_id][2]) for (segment, offset), anchor_id in self._ordered(ids)]
+            # Own handles: a compaction may delete these segments while we stream them
+            handles = {segment: os.dup(self._files[segment].fileno()) for segment in {s for s, _, _ in plan}}
+        files = {segment: os.fdopen(fd, "rb", buffering=1 << 20) for segment, fd in handles.items()}
+        try:
+            for segment, offset, length in plan:
+                f = files[segment]
+                if f.tell() != offset:
+                    f.seek(offset)
+                yield _decode(f.read(length))
+        finally:
+            for f in files.values():
+                f.close()
+
+    # -- Compaction --
+
+    def _garbage(self, sealed):
+        live = sum(1 for location in self._index.values() if location[0] in sealed)
+        total = sum(self._records.get(segment, 0) for segment in sealed)
+        return (total - live) / total if total else 0.0
+
+    def compaction_due(self):
+        with self._locked():
+            self._refresh()
+            sealed = set(self.segments[:-1])
+            return len(sealed) >= self.compact_segments or (bool(sealed) and self._garbage(sealed) >= self.compact_garbage)
+
+    def compact(self):
+        """Merge the sealed segments into one, dropping superseded records. Returns False if there was nothing to do."""
+        with self._locked(exclusive=True):
+            self._refresh()
+            sealed = self.segments[:-1]
+            if not sealed or (len(sealed) == 1 and not self._garbage(set(sealed))):
+                return False
+            target = self._next
+            self._write_manifest(self.segments, target + 1)  # Reserve the output segment's number
+            self._refresh()
+            ids = [anchor_id for anchor_id, location in self._index.items() if location[0] in set(sealed)]
+            plan = [(segment, offset, self._index[anchor_id]) for (segment, offset), anchor_id in self._ordered(ids)]
+            handles = {segment: os.dup(self._files[segment].fileno()) for segment in sealed}
+
+        # Copy the live records without holding the lock: sealed segments never change
+        lines = []
+        position = 0
+        try:
+            with open(self._segment_path(target), "wb") as out:
+                for segment, offset, (_, _, length, tier) in plan:
+                    frame = os.pread(handles[segment], length, offset)
+                    anchor_id = json.loads(frame[RECORD_HEADER.size:])["id"]
+                    out.write(frame)
+                    lines.append([anchor_id, tier, position, length])
+                    position += length
+                out.flush()
+                os.fsync(out.fileno())
+        finally:
+            for fd in handles.values():
+                os.close(fd)
+        with open(self._index_path(target), "wb") as f:
+            f.write("".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode())
+            f.flush()
+            os.fsync(f.fileno())
+
+        with self._locked(exclusive=True):
+            self._refresh()
+            if self.segments[:len(sealed)] != sealed:  # Another process compacted them first
+                for name in (self._segment_path(target), self._index_path(target)):
+                    os.remove(name)
+                return False
+            self._write_manifest([target] + self.segments[len(sealed):], self._next)
+            self._refresh()
+            for segment in sealed:
+                for name in (self._segment_path(segment), self._index_path(segment)):
+                    os.remove(name)
+        print(f"[AnchorStore] Compacted {len(sealed)} segments into one ({len(lines)} live records).")
+        return True
+
+    def _compact_loop(self):
+        while not self._closed:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            if self._closed:
+                break
+            try:
+                if self.compaction_due():
+                    self.compact()
+            except Exception as e:
+                print(f"[AnchorStore] Compaction failed: {e}")
+
+    # -- JSON layout --
+
+    def import_json(self, path, replace=False):
+        """Append the anchors of a compiled_braid.sbraid JSON file (plain or DAG-packed layout)."""
+        with open(path, "r", encoding="utf-8") as f:
+            braid = default_dag().unpack(json.load(f))
+        added = self.append_many(braid.get("compiled_anchors", []), replace=replace)
+        print(f"[AnchorStore] Imported {added} anchors from {path}.")
+        return added
+
+    def export_json(self, path):
+        """Write the store as {"compiled_anchors": [...]} (the layout json.dump(indent=2) gives), streaming."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write('{\n  "compiled_anchors": [')
+            count = 0
+            for anchor in self:
+                if isinstance(anchor, LazyAnchor):
+                    anchor = anchor.materialized()
+                f.write(("\n" if not count else ",\n") + textwrap.indent(json.dumps(anchor, indent=2), "    "))
+                count += 1
+            f.write("\n  ]\n}" if count else "]\n}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return count
+
+    def stats(self):
+        with self._locked():
+            self._refresh()
+            return {
+                "anchors": len(self._index),
+                "segments": len(self.segments),
+                "records": sum(self._records.values()),
+                "bytes": sum(self._ends.values()),
+                "garbage": round(self._garbage(set(self.segments)), 3)
+            }
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
+            self._lock_file.close()
+
+
+def _decode(frame):
+    length, crc = RECORD_HEADER.unpack_from(frame)
+    payload = frame[RECORD_HEADER.size:RECORD_HEADER.size + length]
+    if len(payload) < length or zlib.crc32(payload) != crc:
+        raise ValueError("[AnchorStore] Corrupt record")
+    anchor = json.loads(payload)
+    if "expression" not in anchor and "expr_id" in anchor:
+        return LazyAnchor(default_dag(), anchor)
+    return anchor
+
+
+class StoreView:
+    """A read-only sequence over a snapshot of a store's IDs; anchors are read as they are indexed."""
+
+    def __init__(self, store, ids=None):
+        self.store = store
+        self.anchor_ids = store.ids() if ids is None else list(ids)
+
+    def __len__(self):
+        return len(self.anchor_ids)
+
+    def __getitem__(self, i):
+        return self.store.get(self.anchor_ids[i])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import, export, compact or inspect a compiled anchor store.")
+    parser.add_argument("store", help="Store directory, e.g. compiled_braid.sbraid.d")
+    parser.add_argument("--import-json", metavar="PATH", help="Append the anchors of a compiled_braid.sbraid JSON file")
+    parser.add_argument("--export-json", metavar="PATH", help="Write the store out in the JSON layout")
+    parser.add_argument("--compact", action="store_true", help="Merge the sealed segments now")
+    args = parser.parse_args()
+
+    store = AnchorStore(args.store, compact_interval=None)
+    try:
+        if args.import_json:
+            store.import_json(args.import_json)
+        if args.compact:
+            store.compact()
+        if args.export_json:
+            count = store.export_json(args.export_json)
+            print(f"[AnchorStore] Exported {count} anchors to {args.export_json}.")
+        print(f"[AnchorStore] {args.store}: {store.stats()} | tiers={store.tiers()}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,52 @@
 # anchor_tracker.py
 
+from bisect import bisect_left, insort
+from collections import deque
+
+from expression_dag import default_dag
+
+def _emergence_score(entry):
+    dag = default_dag()
+    node = dag.find(entry)
+    distinct = dag.char_count(node) if node is not None else len(set(entry.get("expression", "")))
+    return distinct + entry.get("tier", 0) * 0.5
+
 def track_emergence(state):
     emergence_data = []
     for anchor in state.discovery_log[-50:]:
-        expression = anchor.get("expression", "")
-        tier = anchor.get("tier", 0)
-        score = len(set(expression)) + tier * 0.5
-        emergence_data.append((anchor["anchor"], score))
+        emergence_data.append((anchor["anchor"], _emergence_score(anchor)))
     return sorted(emergence_data, key=lambda x: -x[1])
+
+
+class EmergenceTracker:
+    """
+    `track_emergence` for a loop that calls it every step: the last `window`
+    discoveries are kept ranked, so each update scores and inserts only the
+    discoveries made since the previous one and evicts those that slid out.
+    Results are identical to `track_emergence(state)`.
+    """
+
+    def __init__(self, window=50):
+        self.window = window
+        self.position = 0
+        self.live = deque()   # (position, ranked entry) in log order
+        self.ranked = []      # (-score, position, anchor), best first
+
+    def update(self, state):
+        log = state.discovery_log
+        end = log.position
+        if end < self.position:  # The log was reset; start over
+            self.position = 0
+            self.live.clear()
+            self.ranked.clear()
+        first = max(self.position, end - self.window, log.dropped)
+        for position in range(first, end):
+            entry = log[position - log.dropped]
+            item = (-_emergence_score(entry), position, entry["anchor"])
+            insort(self.ranked, item)
+            self.live.append((position, item))
+        while self.live and self.live[0][0] < max(end - self.window, log.dropped):
+            _, item = self.live.popleft()
+            del self.ranked[bisect_left(self.ranked, item)]
+        self.position = end
+        return [(anchor, -score) for score, _, anchor in self.ranked]
@@ -0,0 +1,130 @@
+# background_persister.py
+
+import threading
+import time
+
+
+class BackgroundPersister:
+    """
+    Debounced persistence off the request path.
+
+    Writers call `mark_dirty(item)` with the latest thing to persist (e.g. an
+    immutable StateSnapshot); that only records it. A background thread calls
+    `write(item)` for the latest item once `interval` seconds have passed
+    since the first unflushed mark, or as soon as `every` marks are pending,
+    whichever comes first. `write` is expected to be atomic (temp file plus
+    rename). `flush()` forces a synchronous flush and `close()` flushes one
+    last time before stopping.
+
+    `stats()` reports flush latency (how long `write` takes) and lag (how
+    long the oldest unflushed change has been waiting).
+    """
+
+    def __init__(self, write, interval=1.0, every=100, name="BackgroundPersister"):
+        self.write = write
+        self.interval = interval
+        self.every = every
+        self.name = name
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._latest = None
+        self._pending = 0
+        self._dirty_since = None
+        self._closed = False
+        self.flushes = 0
+        self.failures = 0
+        self.flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.last_flush_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self, item, count=1):
+        """Record `item` as the newest state to persist; `count` changes went into it."""
+        with self._cond:
+            self._latest = item
+            self._pending += count
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+                self._cond.notify()  # Start the interval clock
+            elif self.every and self._pending >= self.every:
+                self._cond.notify()
+
+    def _due(self):
+        if self._dirty_since is None:
+            return False
+        if self.every and self._pending >= self.every:
+            return True
+        return time.monotonic() - self._dirty_since >= self.interval
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._due():
+                    timeout = None
+                    if self._dirty_since is not None:
+                        timeout = max(0.0, self._dirty_since + self.interval - time.monotonic())
+                    self._cond.wait(timeout)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Write the latest dirty item now, if there is one. Returns True if it wrote."""
+        with self._flush_lock:
+            with self._cond:
+                item, dirty_since = self._latest, self._dirty_since
+                pending = self._pending
+                self._latest = None
+                self._pending = 0
+                self._dirty_since = None
+            if dirty_since is None:
+                return False
+
+            started = time.monotonic()
+            try:
+                self.write(item)
+            except Exception as e:
+                self.failures += 1
+                print(f"[{self.name}] Flush failed, will retry: {e}")
+                with self._cond:
+                    if self._dirty_since is None:  # Nothing newer arrived meanwhile; retry this one
+                        self._latest = item
+                    self._pending += pending
+                    self._dirty_since = min(dirty_since, self._dirty_since or dirty_since)
+                return False
+
+            finished = time.monotonic()
+            elapsed = finished - started
+            self.flushes += 1
+            self.flush_seconds += elapsed
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.max_lag_seconds = max(self.max_lag_seconds, finished - dirty_since)
+            return True
+
+    def stats(self):
+        with self._cond:
+            lag = time.monotonic() - self._dirty_since if self._dirty_since is not None else 0.0
+            pending = self._pending
+        return {
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "pending_changes": pending,
+            "lag_ms": 1000 * lag,
+            "max_lag_ms": 1000 * self.max_lag_seconds,
+            "last_flush_ms": 1000 * self.last_flush_seconds,
+            "mean_flush_ms": 1000 * self.flush_seconds / self.flushes if self.flushes else 0.0,
+            "max_flush_ms": 1000 * self.max_flush_seconds,
+        }
+
+    def close(self):
+        """Stop the background thread and force a final flush."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
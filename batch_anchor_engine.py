@@ -0,0 +1,227 @@
+# batch_anchor_engine.py
+
+import numpy as np
+
+from truth_anchors import feeding_aux, truth_anchors_scaffold, vectorized_truth_anchors
+
+DRAWS_PER_STEP = 10   # Anchor evaluations per simulation step
+BLOCK_STEPS = 1024    # Steps drawn and evaluated together
+VALUE_COLUMNS = 5     # a, b, c, x, y ~ U(-5, 5)
+FLAG_COLUMNS = 2      # p, q ~ fair coin
+AUX_COLUMNS = 3       # U(0, 1) inputs for anchors that draw their own arguments
+
+
+class DrawStream:
+    """
+    All of a braid's simulation randomness, from one numpy Generator.
+
+    Draws are made BLOCK_STEPS steps at a time into a buffer that later
+    `take` calls consume, so the cost of calling into the Generator is paid
+    once per block. What a step sees depends only on the seed and how many
+    steps came before it, not on how the run was chunked into calls.
+
+    Pickling keeps the Generator state at the start of the current block
+    plus the cursor into it, and unpickling re-draws that block, so a saved
+    run resumes bit for bit.
+    """
+
+    def __init__(self, seed=None, block_steps=BLOCK_STEPS, draws_per_step=DRAWS_PER_STEP):
+        self.seed = seed
+        self.block_steps = block_steps
+        self.draws_per_step = draws_per_step
+        self.generator = np.random.default_rng(seed)
+        self._block = None
+        self._block_state = None
+        self._cursor = 0
+
+    def _refill(self):
+        self._block_state = self.generator.bit_generator.state
+        shape = (self.block_steps, self.draws_per_step)
+        g = self.generator
+        self._block = {
+            "choice": g.random(shape),
+            "values": g.uniform(-5, 5, shape + (VALUE_COLUMNS,)),
+            "flags": g.integers(0, 2, shape + (FLAG_COLUMNS,)).astype(bool),
+            "aux": g.random(shape + (AUX_COLUMNS,)),
+            "depth_decay": g.integers(0, 3, self.block_steps),
+        }
+        self._cursor = 0
+
+    def take(self, steps):
+        """The next `steps` steps of draws, as a dict of arrays with leading dimension `steps`."""
+        parts = []
+        while steps > 0:
+            if self._block is None or self._cursor == self.block_steps:
+                self._refill()
+            n = min(steps, self.block_steps - self._cursor)
+            parts.append({k: v[self._cursor:self._cursor + n] for k, v in self._block.items()})
+            self._cursor += n
+            steps -= n
+        if len(parts) == 1:
+            return parts[0]
+        return {k: np.concatenate([part[k] for part in parts]) for k in parts[0]}
+
+    def get_state(self):
+        if self._block is None:
+            return {"seed": self.seed, "generator": self.generator.bit_generator.state, "cursor": None}
+        return {"seed": self.seed, "generator": self._block_state, "cursor": self._cursor}
+
+    def set_state(self, state):
+        self.seed = state["seed"]
+        self.generator.bit_generator.state = state["generator"]
+        self._block = None
+        if state["cursor"] is not None:
+            self._refill()
+            self._cursor = state["cursor"]
+
+    def __getstate__(self):
+        return {
+            "block_steps": self.block_steps,
+            "draws_per_step": self.draws_per_step,
+            "bit_generator": type(self.generator.bit_generator).__name__,
+            "random_state": self.get_state(),
+        }
+
+    def __setstate__(self, attrs):
+        self.block_steps = attrs["block_steps"]
+        self.draws_per_step = attrs["draws_per_step"]
+        self.generator = np.random.Generator(getattr(np.random, attrs["bit_generator"])())
+        self.set_state(attrs["random_state"])
+
+    def fork(self):
+        """An independent copy that will produce exactly the draws this stream would."""
+        stream = DrawStream.__new__(DrawStream)
+        stream.__setstate__(self.__getstate__())
+        return stream
+
+
+class BatchAnchorEngine:
+    """
+    Evaluates truth anchors over whole blocks of random draws at once.
+
+    A block holds, for every step and draw, the chosen anchor and the argument
+    vector [a, b, c, x, y, p, q] the scalar simulation would have drawn, plus
+    AUX_COLUMNS uniforms for zero-argument anchors. Each anchor then runs its
+    array form once over all draws that selected it. Anchors without an array
+    form fall back to their scalar lambda.
+    """
+
+    def __init__(self, scaffold, vectorized=None, draws_per_step=DRAWS_PER_STEP):
+        self.scaffold = scaffold
+        self.names = list(scaffold.keys())
+        self.arity = [fn.__code__.co_argcount for fn in scaffold.values()]
+        self.draws_per_step = draws_per_step
+
+        if vectorized is None:
+            # Only trust the shipped array forms for the shipped lambdas
+            vectorized = {
+                name: vectorized_truth_anchors[name]
+                for name, fn in scaffold.items()
+                if truth_anchors_scaffold.get(name) is fn and name in vectorized_truth_anchors
+            }
+        self.vectorized = [vectorized.get(name) for name in self.names]
+
+    def matches(self, scaffold):
+        return len(scaffold) == len(self.names) and all(
+            self.scaffold.get(name) is fn for name, fn in scaffold.items()
+        )
+
+    def block(self, draws):
+        """Turn a DrawStream slice into an evaluation block for this scaffold."""
+        anchors = (draws["choice"] * len(self.names)).astype(np.intp)
+        return anchors, draws["values"], draws["flags"], draws["aux"]
+
+    def evaluate(self, block, verify=False):
+        """Return a (steps, draws_per_step) boolean array of anchor hits."""
+        anchors, values, flags, aux = block
+        hits = np.zeros(anchors.shape, dtype=bool)
+        for k in np.unique(anchors):
+            mask = anchors == k
+            hits[mask] = self._evaluate_anchor(k, values[mask], flags[mask], aux[mask])
+        if verify:
+            self._verify(block, hits)
+        return hits
+
+    def evaluate_scalar(self, block):
+        """
+        Reference path: call each scalar lambda draw by draw. Zero-argument
+        anchors are fed the block's aux draws (see truth_anchors.aux_uniform),
+        so they see the same inputs as their array forms.
+        """
+        anchors, values, flags, aux = block
+        hits = np.zeros(anchors.shape, dtype=bool)
+        for k in np.unique(anchors):
+            mask = anchors == k
+            hits[mask] = self._evaluate_scalar(k, values[mask], flags[mask], aux[mask])
+        return hits
+
+    def _evaluate_anchor(self, k, values, flags, aux):
+        fn = self.vectorized[k]
+        if fn is not None:
+            n = len(values)
+            try:
+                with np.errstate(all="ignore"):
+                    if self.arity[k] == 0:
+                        result = fn(aux)
+                    else:
+                        result = fn(*self._columns(values, flags, self.arity[k]))
+                return np.broadcast_to(np.asarray(result, dtype=bool), (n,))
+            except Exception:
+                pass
+        return self._evaluate_scalar(k, values, flags, aux)
+
+    def _evaluate_scalar(self, k, values, flags, aux):
+        fn = self.scaffold[self.names[k]]
+        args = self.arity[k]
+        result = np.zeros(len(values), dtype=bool)
+        for i in range(len(values)):
+            row = list(values[i]) + [bool(f) for f in flags[i]]
+            try:
+                if args == 0:
+                    with feeding_aux(aux[i]):
+                        result[i] = bool(fn())
+                else:
+                    result[i] = bool(fn(*row[:args]))
+            except Exception:
+                result[i] = False
+        return result
+
+    @staticmethod
+    def _columns(values, flags, args):
+        columns = [values[:, j] for j in range(VALUE_COLUMNS)] + [flags[:, j] for j in range(FLAG_COLUMNS)]
+        return columns[:args]
+
+    def _verify(self, block, hits):
+        anchors = block[0]
+        expected = self.evaluate_scalar(block)
+        mismatch = hits != expected
+        # Zero-argument anchors outside the shipped scaffold may draw their own
+        # inputs instead of using aux_uniform, so they can't agree draw for draw
+        for k, args in enumerate(self.arity):
+            name = self.names[k]
+            if args == 0 and self.scaffold[name] is not truth_anchors_scaffold.get(name):
+                mismatch &= anchors != k
+        if mismatch.any():
+            step, draw = np.argwhere(mismatch)[0]
+            k = anchors[step, draw]
+            raise RuntimeError(
+                f"[BatchAnchorEngine] Vectorized result for '{self.names[k]}' disagrees with scalar path "
+                f"({int(mismatch.sum())} draws, first at step {step} draw {draw}: "
+                f"values={block[1][step, draw].tolist()} flags={block[2][step, draw].tolist()})"
+            )
+
+
+_engines = {}
+
+
+def engine_for(scaffold, vectorized=None):
+    """
+    Return a cached engine for this scaffold, rebuilding it if the scaffold
+    changed. `vectorized` (name -> array form) is used when building it, for
+    scaffolds whose anchors aren't the shipped ones.
+    """
+    engine = _engines.get(id(scaffold))
+    if engine is None or engine.scaffold is not scaffold or not engine.matches(scaffold):
+        engine = BatchAnchorEngine(scaffold, vectorized=vectorized)
+        _engines[id(scaffold)] = engine
+    return engine
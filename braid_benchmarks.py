@@ -0,0 +1,381 @@
+# braid_benchmarks.py
+
+import argparse
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from batch_anchor_engine import engine_for
+from braid_self_directed_fusion import BraidSelfDirectedFusion
+from generative_ops import ContentIndex, fuse_batch
+from llm_backends import StubLLM
+from semantic_cluster import cluster_anchors
+from symbolic_braid_simulation import SymbolicState, save_state, simulate_step
+from symbolic_filter_wrapper import SymbolicFilter
+from symbolic_self_loop import SymbolicSelfLoop
+from truth_anchors import (anchor_tiers, observe_environment, symbolic_environment,
+                           truth_anchors_scaffold, vectorized_truth_anchors)
+
+DEFAULT_SEED = 1234
+SHIPPED_STATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "braid_state.pkl")
+STEPS_PER_CALL = 100
+
+
+class Case:
+    """
+    One benchmark. `setup(stack, seed, info)` builds the seeded fixtures
+    (registering cleanup on the ExitStack, recording facts about them in
+    `info`) and returns the callable that is timed; each call does `units`
+    units of work, so throughput is units per second.
+    """
+
+    def __init__(self, name, setup, units=1, unit="calls", repeat=50, warmup=2, params=None):
+        self.name = name
+        self.setup = setup
+        self.units = units
+        self.unit = unit
+        self.repeat = repeat
+        self.warmup = warmup
+        self.params = params or {}
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Silence the code under test (it prints progress on every call)."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+# -- Fixtures --
+
+def _scaffold(size):
+    """The first `size` shipped anchors, or replicas of them (with their array forms) beyond that."""
+    names = list(truth_anchors_scaffold)
+    scaffold, vectorized, tiers = {}, {}, {}
+    for i in range(size):
+        name = names[i % len(names)]
+        replica = name if i < len(names) else f"{name}_r{i // len(names)}"
+        scaffold[replica] = truth_anchors_scaffold[name]
+        tiers[replica] = anchor_tiers.get(name, 8)
+        if name in vectorized_truth_anchors:
+            vectorized[replica] = vectorized_truth_anchors[name]
+    return scaffold, vectorized, tiers
+
+
+def _warm_state(seed, steps):
+    state = SymbolicState(seed=seed)
+    simulate_step(state, truth_anchors_scaffold, anchor_tiers, steps=steps)
+    return state
+
+
+_state_files = {}
+
+
+def _state_file(kind, seed, directory):
+    """A fresh copy of a saved state fixture: 'new' (none), 'warm' (20k seeded steps) or 'shipped' (braid_state.pkl)."""
+    path = os.path.join(directory, f"{kind}-{len(os.listdir(directory))}.snap")
+    if kind == "new":
+        return path
+    source = _state_files.get((kind, seed))
+    if source is None:
+        source = os.path.join(directory, f"{kind}-fixture")
+        if kind == "shipped":
+            shutil.copyfile(SHIPPED_STATE, source)
+        else:
+            save_state(_warm_state(seed, 20_000), source)
+        _state_files[(kind, seed)] = source
+    shutil.copyfile(source, path)
+    return path
+
+
+def _prompts(seed, n=64):
+    rng = random.Random(seed)
+    names = [name.replace("_", " ") for name in truth_anchors_scaffold]
+    templates = [
+        "Is the {} property always valid in math?",
+        "How does {} relate to {}?",
+        "The {} identity implies {} for every x.",
+        "Therefore {} holds, and {} follows.",
+    ]
+    return [rng.choice(templates).format(*rng.sample(names, 2)) for _ in range(n)]
+
+
+_anchor_sets = {}
+
+
+def _anchors(n, seed):
+    """`n` compiled anchors: the shipped truth anchors plus seeded fusions of them."""
+    key = (n, seed)
+    if key not in _anchor_sets:
+        anchors = []
+        for name in truth_anchors_scaffold:
+            expression = name.replace("_", " ")
+            digest = hashlib.md5(expression.encode()).digest()
+            anchors.append({
+                "id": digest.hex()[:12],
+                "name": name,
+                "expression": expression,
+                "tier": anchor_tiers.get(name, 1),
+                "quantized_fingerprint": [10 + b % 246 for b in digest[:4]]
+            })
+        rng = np.random.default_rng(seed)
+        index = ContentIndex(anchors)
+        while len(anchors) < n:
+            # Fusing only the first 64 keeps expressions from compounding
+            anchors += fuse_batch(anchors[:64], min(64, n - len(anchors)), rng, index=index)
+        _anchor_sets[key] = anchors[:n]
+    return _anchor_sets[key]
+
+
+# -- Cases --
+
+def _simulate_case(size, warm):
+    def setup(stack, seed, info):
+        scaffold, vectorized, tiers = _scaffold(size)
+        engine_for(scaffold, vectorized=vectorized)
+        state = SymbolicState(seed=seed)
+        if warm:
+            simulate_step(state, scaffold, tiers, steps=warm)
+        info["discovered"] = len(state.discovered_anchors)
+        info["discoveries"] = len(state.discovery_log)
+        return lambda: simulate_step(state, scaffold, tiers, steps=STEPS_PER_CALL)
+    return Case(f"simulate_step[scaffold={size},warm={warm}]", setup, units=STEPS_PER_CALL, unit="steps",
+                repeat=30, params={"scaffold": size, "warm_steps": warm, "steps_per_call": STEPS_PER_CALL})
+
+
+def _observe_case():
+    def setup(stack, seed, info):
+        state = _warm_state(seed, 1000)
+        return lambda: observe_environment(state, symbolic_environment, truth_anchors_scaffold)
+    return Case("observe_environment", setup, repeat=200)
+
+
+def _filter_case(method, kind):
+    def setup(stack, seed, info):
+        braid = SymbolicFilter(state_path=_state_file(kind, seed, os.getcwd()))
+        stack.callback(braid.close)
+        info["discovered"] = len(braid.snapshot().discovered_anchors)
+        info["discoveries"] = len(braid.snapshot().discovery_log)
+        inputs = itertools.cycle(_prompts(seed))
+        call = getattr(braid, method)
+        return lambda: call(next(inputs))
+    return Case(f"SymbolicFilter.{method}[state={kind}]", setup, repeat=100, params={"state": kind})
+
+
+def _cluster_case(n):
+    def setup(stack, seed, info):
+        anchors = _anchors(n, seed)
+        info["mean_expression_chars"] = round(sum(len(a["expression"]) for a in anchors) / n, 1)
+        return lambda: cluster_anchors(anchors, k=5)
+    return Case(f"cluster_anchors[n={n}]", setup, units=n, unit="anchors", repeat=10, params={"anchors": n})
+
+
+def _fusion_case(n, cycles=50):
+    def setup(stack, seed, info):
+        anchors = _anchors(n, seed)
+        calls = itertools.count(seed)
+        return lambda: BraidSelfDirectedFusion(anchors, seed=next(calls)).reflect_and_mutate(cycles)
+    return Case(f"BraidSelfDirectedFusion.reflect_and_mutate[n={n}]", setup, units=cycles, unit="fusions",
+                repeat=30, params={"anchors": n, "cycles": cycles})
+
+
+def _self_loop_case():
+    def setup(stack, seed, info):
+        loop = SymbolicSelfLoop(model_path="stub", llm=StubLLM())
+        stack.callback(loop.filter.close)
+        steps = itertools.count(1)
+        return lambda: loop.loop_once(next(steps))
+    return Case("SymbolicSelfLoop.loop_once[stub]", setup, unit="steps", repeat=100)
+
+
+def default_cases():
+    cases = [_simulate_case(size, warm) for size in (8, 27, 108) for warm in (0, 5000)]
+    cases.append(_observe_case())
+    cases += [_filter_case(method, kind)
+              for method in ("validate_prompt", "score_output")
+              for kind in ("new", "warm", "shipped")]
+    cases += [_cluster_case(n) for n in (250, 1000)]
+    cases.append(_fusion_case(1000))
+    cases.append(_self_loop_case())
+    return cases
+
+
+# -- Measurement --
+
+def measure(case, seed=DEFAULT_SEED, repeat_scale=1.0):
+    """Time `case`: latency per call, throughput and peak traced allocation."""
+    random.seed(seed)  # Some paths still draw from the global generators
+    np.random.seed(seed)
+    info = {}
+    repeat = max(3, int(case.repeat * repeat_scale))
+    with contextlib.ExitStack() as stack, _quiet():
+        fn = case.setup(stack, seed, info)
+        for _ in range(case.warmup):
+            fn()
+        latencies = np.empty(repeat)
+        for i in range(repeat):
+            started = time.perf_counter()
+            fn()
+            latencies[i] = time.perf_counter() - started
+
+        # Separate pass: tracing slows allocation-heavy code down
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            for _ in range(min(3, repeat)):
+                fn()
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+
+    total = float(latencies.sum())
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    return {
+        "params": {**case.params, **info},
+        "unit": case.unit,
+        "units_per_call": case.units,
+        "calls": repeat,
+        "total_s": round(total, 6),
+        "throughput": round(case.units * repeat / total, 3) if total else None,
+        "latency_ms": {
+            "p50": round(float(p50), 4),
+            "p90": round(float(p90), 4),
+            "p99": round(float(p99), 4),
+            "mean": round(float(latencies.mean()) * 1000, 4),
+            "max": round(float(latencies.max()) * 1000, 4)
+        },
+        "peak_kb": round(max(peak, 0) / 1024, 1)
+    }
+
+
+def _meta(seed, repeat_scale):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(SHIPPED_STATE), timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "seed": seed,
+        "repeat_scale": repeat_scale,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def run(cases, seed=DEFAULT_SEED, repeat_scale=1.0):
+    """Run the cases in a scratch directory (the code under test saves state files) and collect the report."""
+    report = {"meta": _meta(seed, repeat_scale), "results": {}}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="braid-bench-") as scratch:
+        os.chdir(scratch)
+        try:
+            for case in cases:
+                print(f"[BraidBench] {case.name} ...", flush=True)
+                report["results"][case.name] = measure(case, seed=seed, repeat_scale=repeat_scale)
+        finally:
+            os.chdir(cwd)
+            _state_files.clear()
+    try:
+        import resource
+        report["meta"]["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except ImportError:
+        pass
+    return report
+
+
+def compare(report, baseline, tolerance=0.10, memory_floor_kb=64):
+    """
+    Compare a report against a baseline report. A case regresses when its
+    throughput drops, or its median latency or peak allocation grows, by
+    more than `tolerance` (allocation changes under `memory_floor_kb` are
+    ignored). Returns (rows, regressed case names).
+    """
+    rows, regressed = [], []
+    for name, current in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            rows.append((name, current, None, []))
+            continue
+        problems = []
+        if base["throughput"] and current["throughput"] < base["throughput"] * (1 - tolerance):
+            problems.append("throughput")
+        if current["latency_ms"]["p50"] > base["latency_ms"]["p50"] * (1 + tolerance):
+            problems.append("p50")
+        if current["peak_kb"] - base["peak_kb"] > max(memory_floor_kb, base["peak_kb"] * tolerance):
+            problems.append("memory")
+        if problems:
+            regressed.append(name)
+        rows.append((name, current, base, problems))
+    return rows, regressed
+
+
+def print_report(report, rows=None):
+    print(f"\n{'case':<58} {'throughput':>18} {'p50 ms':>10} {'p99 ms':>10} {'peak KB':>10}  vs baseline")
+    rows = rows or [(name, result, None, []) for name, result in report["results"].items()]
+    for name, result, base, problems in rows:
+        throughput = f"{result['throughput']:,.1f} {result['unit']}/s"
+        line = (f"{name:<58} {throughput:>18} {result['latency_ms']['p50']:>10.3f} "
+                f"{result['latency_ms']['p99']:>10.3f} {result['peak_kb']:>10.1f}")
+        if base is not None:
+            change = result["throughput"] / base["throughput"] - 1 if base["throughput"] else 0.0
+            line += f"  {change:+.1%}" + (f"  ⚠️ REGRESSION ({', '.join(problems)})" if problems else "")
+        elif rows and any(r[2] is not None for r in rows):
+            line += "  (new)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the braid simulation and service hot paths.")
+    parser.add_argument("--only", nargs="*", default=[], help="Run only cases whose name contains one of these")
+    parser.add_argument("--list", action="store_true", help="List the cases and exit")
+    parser.add_argument("--quick", action="store_true", help="A fifth of the timed calls per case")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to save the JSON report")
+    parser.add_argument("--baseline", help="A saved report to compare against; exits 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown before flagging")
+    args = parser.parse_args()
+
+    cases = [c for c in default_cases() if not args.only or any(s in c.name for s in args.only)]
+    if args.list:
+        for case in cases:
+            print(case.name)
+        return 0
+
+    report = run(cases, seed=args.seed, repeat_scale=0.2 if args.quick else 1.0)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    regressed = []
+    rows = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows, regressed = compare(report, baseline, tolerance=args.tolerance)
+    print_report(report, rows)
+    print(f"\n[BraidBench] Report saved to {args.output}")
+    if regressed:
+        print(f"[BraidBench] {len(regressed)} regression(s) against {args.baseline}: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,80 @@
 # braid_equilibrium.py
-import statistics
+
+from history_retention import Ring
+from streaming_metrics import RingSeries
+
+SERIES = ("anchor_count", "fused_count", "mirror_coherence", "identity_shift")
 
 class BraidEquilibrium:
-    def __init__(self):
+    def __init__(self, retention=None, capacity=1024, window=3, trend_window=50, alpha=0.2):
+        """
+        Each metric lives in a fixed-capacity RingSeries with running sums
+        over the last `window` values (the stability index) and the last
+        `trend_window` values (variance and slope), so updating and scoring
+        cost the same on step ten million as on step ten. Cheap enough to
+        call every step: mirror metrics are only recorded when the mirror
+        log has a new entry. A Ring `retention` policy sets the capacity.
+        """
+        if isinstance(retention, Ring):
+            capacity = retention.size
+        capacity = max(capacity, window, trend_window)
+        self.window = window
+        self.trend_window = trend_window
         self.history = {
-            "anchor_count": [],
-            "fused_count": [],
-            "mirror_coherence": [],
-            "identity_shift": []
+            name: RingSeries(capacity, windows=(window, trend_window), alpha=alpha)
+            for name in SERIES
         }
+        self._last_mirror = None
+
+    @staticmethod
+    def _mirror_pair(prev, last):
+        coherence = 1.0 if last.get("self_statement", "") == prev.get("self_statement", "") else 0.0
+        last_set = set(last.get("strongest", []))
+        prev_set = set(prev.get("strongest", []))
+        union = last_set.union(prev_set)
+        shift = 1 - len(last_set.intersection(prev_set)) / max(len(union), 1)
+        return coherence, shift
 
     def update_metrics(self, anchors, fusions, mirror_log):
         self.history["anchor_count"].append(len(anchors))
         self.history["fused_count"].append(fusions)
 
-        if len(mirror_log) >= 2:
-            last = mirror_log[-1].get("self_statement", "")
-            prev = mirror_log[-2].get("self_statement", "")
-            coherence = 1.0 if last == prev else 0.0
+        if len(mirror_log) >= 2 and mirror_log[-1] is not self._last_mirror:
+            coherence, shift = self._mirror_pair(mirror_log[-2], mirror_log[-1])
             self.history["mirror_coherence"].append(coherence)
-
-            last_set = set(mirror_log[-1].get("strongest", []))
-            prev_set = set(mirror_log[-2].get("strongest", []))
-            union = last_set.union(prev_set)
-            shift = 1 - len(last_set.intersection(prev_set)) / max(len(union), 1)
             self.history["identity_shift"].append(shift)
+            self._last_mirror = mirror_log[-1]
+
+    def update_metrics_batch(self, anchor_counts, fusion_counts, mirror_entries=()):
+        """
+        Record many steps at once: one anchor and fusion count per step, plus
+        the mirror entries added over those steps, in order (each is paired
+        with the one before it, across batches too).
+        """
+        self.history["anchor_count"].extend(anchor_counts)
+        self.history["fused_count"].extend(fusion_counts)
+        entries = list(mirror_entries)
+        if self._last_mirror is not None:
+            entries.insert(0, self._last_mirror)
+        pairs = [self._mirror_pair(prev, last) for prev, last in zip(entries, entries[1:])]
+        if pairs:
+            self.history["mirror_coherence"].extend([coherence for coherence, _ in pairs])
+            self.history["identity_shift"].extend([shift for _, shift in pairs])
+        if entries:
+            self._last_mirror = entries[-1]
+
+    def series(self, name):
+        """The retained values of one metric, oldest first: a read-only view for plotting, no copy."""
+        return self.history[name].values()
 
     def calculate_stability_index(self):
-        if len(self.history["anchor_count"]) < 3:
+        anchor_count = self.history["anchor_count"]
+        if len(anchor_count) < 3 or not len(self.history["identity_shift"]):
             return 0.5  # Default neutral stability when insufficient history
 
-        recent_shift = statistics.mean(self.history["identity_shift"][-3:])
-        recent_coherence = statistics.mean(self.history["mirror_coherence"][-3:])
-        anchor_growth = (
-            self.history["anchor_count"][-1] - self.history["anchor_count"][-3]
-        ) / 3.0
+        recent_shift = self.history["identity_shift"].mean(self.window)
+        recent_coherence = self.history["mirror_coherence"].mean(self.window)
+        anchor_growth = (anchor_count[-1] - anchor_count[-3]) / 3.0
 
         # Combine metrics into stability score
         score = (
@@ -44,6 +84,17 @@ class BraidEquilibrium:
         )
         return round(max(0.0, min(1.0, score)), 3)
 
+    def stability_trends(self):
+        """Streaming statistics per metric: EWMA, and variance and slope over `trend_window`."""
+        return {
+            name: {
+                "ewma": series.ewma,
+                "variance": series.variance(self.trend_window),
+                "slope": series.slope(self.trend_window),
+            }
+            for name, series in self.history.items()
+        }
+
     def recommend_adjustments(self):
         stability = self.calculate_stability_index()
         fusion_rate = max(1, int(5 * (1 - stability)))
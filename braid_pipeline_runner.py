@@ -1,56 +1,57 @@
 # braid_pipeline_runner.py
 
 from symbolic_self_loop import SymbolicSelfLoop
-from anchor_tracker import track_emergence
-from semantic_cluster import cluster_anchors
-from capability_mapper import map_cluster_to_capability
-from language_fusion import fuse_with_llm
+from semantic_cluster import IncrementalClusterer
+from llm_backends import load_backend
+from fusion_stage import FusionStage
 
 import os
-import json
 
 RUN_DIR = "braid_pipeline_logs"
+MODEL_PATH = os.getenv("BRAID_MODEL_PATH", "stub")  # GGUF path for llama.cpp, or "stub"
 STEPS = 1000
 CLUSTER_K = 5
+FUSION_WORKERS = 4
 
 os.makedirs(RUN_DIR, exist_ok=True)
 
-loop = SymbolicSelfLoop(model_path=MODEL_PATH)
-llm = loop.llm
-
-print(f"[🚀] Starting symbolic simulation batch for {STEPS} steps...")
-for step in range(1, STEPS + 1):
-    loop.loop_once(step)
-
-    if step % 250 == 0:
-        print(f"\n[🔍] Analyzing symbolic state at step {step}...")
-
-        anchors = list(loop.filter.state.discovered_anchors)
-        fingerprints = loop.filter.state.symbolic_resilience
-        compiled = [
-            {
-                "anchor": a,
-                "expression": a,
-                "tier": fingerprints.get(a, 0),
-                "quantized_fingerprint": [fingerprints.get(a, 0)] * 4
-            } for a in anchors
-        ]
-
-        clusters = cluster_anchors(compiled, k=CLUSTER_K)
-
-        for idx, cluster in enumerate(clusters):
-            cap = map_cluster_to_capability(cluster)
-            output = fuse_with_llm(cap, cluster, llm)
-
-            print(f"\n[🧠] Cluster {idx+1} Capability: {cap}")
-            print(f"[🗣️] Generated Output:\n{output}")
-
-            with open(os.path.join(RUN_DIR, f"step_{step}_cluster_{idx+1}.json"), "w") as f:
-                json.dump({
-                    "step": step,
-                    "capability": cap,
-                    "anchor_expressions": [a["expression"] for a in cluster],
-                    "generated": output
-                }, f, indent=2)
-
-print("\n✅ Simulation batch complete.")
+clusterer = IncrementalClusterer(k=CLUSTER_K)  # Stable cluster IDs across checkpoints
+llm = load_backend(MODEL_PATH)
+loop = SymbolicSelfLoop(model_path=MODEL_PATH, llm=llm)
+
+# Cluster fusion runs in the background while the simulation keeps stepping;
+# each checkpoint lands in the run log as one batch of NDJSON records.
+fusion = FusionStage(
+    llm,
+    os.path.join(RUN_DIR, "fusion_log.ndjson"),
+    cache=loop.cache,
+    model=loop.model_name,
+    workers=FUSION_WORKERS
+)
+
+try:
+    print(f"[🚀] Starting symbolic simulation batch for {STEPS} steps...")
+    for step in range(1, STEPS + 1):
+        loop.loop_once(step)
+
+        if step % 250 == 0:
+            print(f"\n[🔍] Analyzing symbolic state at step {step}...")
+
+            snapshot = loop.filter.snapshot()
+            anchors = list(snapshot.discovered_anchors)
+            fingerprints = snapshot.symbolic_resilience
+            compiled = [
+                {
+                    "anchor": a,
+                    "expression": a,
+                    "tier": fingerprints.get(a, 0),
+                    "quantized_fingerprint": [fingerprints.get(a, 0)] * 4
+                } for a in anchors
+            ]
+
+            clusters = clusterer.update(compiled)
+            fusion.submit(step, clusters)
+finally:
+    fusion.close()
+    loop.close()
+print(f"\n✅ Simulation batch complete. Fusion log: {fusion.log_path}")
@@ -0,0 +1,203 @@
+# braid_pool.py
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from symbolic_braid_simulation import STATE_PATH
+
+BRAID_ID = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+class _Entry:
+    __slots__ = ("filter", "leases", "nbytes")
+
+    def __init__(self, braid_filter):
+        self.filter = braid_filter
+        self.leases = 0
+        self.nbytes = braid_filter.snapshot().nbytes()
+
+
+class _Loading:
+    """A braid being loaded, and how many other requests are waiting to share it."""
+    __slots__ = ("future", "waiters")
+
+    def __init__(self):
+        self.future = Future()
+        self.waiters = 0
+
+
+class BraidPool:
+    """
+    Many independent braids in one process, keyed by braid ID.
+
+    Each braid is a SymbolicFilter, built as `factory(state_path=...,
+    **filter_options)`, over its own state file under `state_dir`
+    (`<braid_id>.snap`; the ID None is the default braid at `default_path`).
+    Braids are loaded lazily on first use, and concurrent first requests for
+    one braid share a single load. Resident braids are kept in LRU order;
+    whenever their combined size exceeds `budget_mb`, the least recently used
+    idle ones are closed (which flushes them to disk) and dropped. A braid
+    in use is never evicted, so the budget can be exceeded while many are
+    busy at once.
+
+    `filter_options` are passed to every braid's filter (journal, retention,
+    flush settings, ...).
+    """
+
+    def __init__(self, factory, state_dir="braids", budget_mb=512, default_path=STATE_PATH, **filter_options):
+        self.factory = factory
+        self.state_dir = state_dir
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.default_path = default_path
+        self.filter_options = filter_options
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._closing = {}
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, braid_id):
+        if braid_id is None:
+            return self.default_path
+        if not BRAID_ID.match(braid_id) or braid_id.startswith("."):
+            raise ValueError(f"[BraidPool] Invalid braid ID {braid_id!r}")
+        return os.path.join(self.state_dir, f"{braid_id}.snap")
+
+    @contextmanager
+    def braid(self, braid_id=None):
+        """Lease the braid's SymbolicFilter for the duration of the block, loading it if needed."""
+        entry = self._acquire(braid_id)
+        try:
+            yield entry.filter
+        finally:
+            self._release(braid_id, entry)
+
+    def _acquire(self, braid_id):
+        path = self.path_for(braid_id)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("[BraidPool] Pool is closed")
+            entry = self._entries.get(braid_id)
+            if entry is not None:
+                self._entries.move_to_end(braid_id)
+                entry.leases += 1
+                self.hits += 1
+                return entry
+            self.misses += 1
+            loading = self._loading.get(braid_id)
+            if loading is None:
+                loading = self._loading[braid_id] = _Loading()
+                owner = True
+            else:
+                loading.waiters += 1  # The owner takes this lease for us, before anyone can evict
+                owner = False
+            closing = self._closing.get(braid_id)
+
+        if not owner:
+            return loading.future.result()  # Someone else is loading this braid; share their result
+
+        try:
+            if closing is not None:
+                closing.wait()  # An eviction is still flushing this braid; load what it wrote
+            if braid_id is not None:
+                os.makedirs(self.state_dir, exist_ok=True)
+            entry = _Entry(self.factory(state_path=path, **self.filter_options))
+        except BaseException as e:
+            with self._lock:
+                del self._loading[braid_id]
+            loading.future.set_exception(e)
+            raise
+        with self._lock:
+            entry.leases += 1 + loading.waiters
+            self._entries[braid_id] = entry
+            del self._loading[braid_id]
+        loading.future.set_result(entry)
+        self._evict()
+        return entry
+
+    def _release(self, braid_id, entry):
+        nbytes = entry.filter.snapshot().nbytes()
+        with self._lock:
+            entry.leases -= 1
+            entry.nbytes = nbytes
+        self._evict()
+
+    def _evict(self):
+        """Close least recently used idle braids until the pool fits its budget."""
+        evicted = []
+        with self._lock:
+            total = sum(entry.nbytes for entry in self._entries.values())
+            for braid_id, entry in list(self._entries.items()):
+                if total <= self.budget:
+                    break
+                if entry.leases:
+                    continue
+                del self._entries[braid_id]
+                total -= entry.nbytes
+                self._closing[braid_id] = threading.Event()
+                evicted.append((braid_id, entry))
+                self.evictions += 1
+        for braid_id, entry in evicted:
+            try:
+                entry.filter.close()
+            finally:
+                with self._lock:
+                    self._closing.pop(braid_id).set()
+            print(f"[BraidPool] Evicted braid '{braid_id or 'default'}' ({entry.nbytes / 1e6:.1f} MB)")
+
+    def resident(self, braid_id=None):
+        """The braid's filter if it is loaded, else None. Does not load it or count as a use."""
+        entry = self._entries.get(braid_id)
+        return entry.filter if entry is not None else None
+
+    def score_outputs(self, items):
+        """Score (braid_id, output) pairs; each braid scores its own outputs as one batch."""
+        return self._per_braid(items, lambda braid_filter, outputs: braid_filter.score_outputs(outputs))
+
+    def validate_prompts(self, items):
+        """Validate (braid_id, prompt) pairs; each braid validates its own prompts as one batch."""
+        return self._per_braid(items, lambda braid_filter, prompts: braid_filter.validate_prompts(prompts))
+
+    def _per_braid(self, items, handler):
+        groups = OrderedDict()
+        for i, (braid_id, value) in enumerate(items):
+            groups.setdefault(braid_id, []).append((i, value))
+        results = [None] * len(items)
+        for braid_id, group in groups.items():
+            with self.braid(braid_id) as braid_filter:
+                for (i, _), result in zip(group, handler(braid_filter, [value for _, value in group])):
+                    results[i] = result
+        return results
+
+    def reset(self, braid_id=None):
+        with self.braid(braid_id) as braid_filter:
+            braid_filter.reset()
+
+    def stats(self):
+        with self._lock:
+            resident = sum(entry.nbytes for entry in self._entries.values())
+            return {
+                "resident_braids": len(self._entries),
+                "loading": len(self._loading),
+                "resident_mb": resident / (1024 * 1024),
+                "budget_mb": self.budget / (1024 * 1024),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def close(self):
+        """Close (and so flush) every resident braid."""
+        with self._lock:
+            self._closed = True
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.filter.close()
@@ -1,49 +1,27 @@
 # braid_self_directed_fusion.py
-import hashlib
-import random
+import numpy as np
+
+from generative_ops import FUSION, ContentIndex, fuse_batch, fuse_pairs
 
 class BraidSelfDirectedFusion:
-    def __init__(self, anchors):
+    def __init__(self, anchors, seed=None, index=None):
+        # Pairs are drawn from a local Generator; `index` holds the IDs of every
+        # anchor known so far, so the same fusion is never emitted twice
         self.anchors = anchors
         self.generated = []
+        self.rng = np.random.default_rng(seed)
+        self.index = index if index is not None else ContentIndex(anchors)
 
     def fuse_anchors(self, a1, a2):
-        # Safely extract properties
-        name1 = a1.get("name", "A")
-        name2 = a2.get("name", "B")
-        expr1 = a1.get("expression", "A")
-        expr2 = a2.get("expression", "B")
-        tier1 = a1.get("tier", 1)
-        tier2 = a2.get("tier", 1)
-
-        # Generate fusion
-        fused_name = f"{name1}_{name2}_fusion"
-        fused_expr = f"({expr1}) <=> ({expr2})"
-        tier = max(tier1, tier2) + 1
-
-        # Generate fingerprint
-        seed = int(hashlib.sha256(fused_expr.encode()).hexdigest(), 16)
-        random.seed(seed)
-        fingerprint = [random.randint(10, 255) for _ in range(4)]
+        return fuse_pairs([(a1, a2)], FUSION, ContentIndex())[0].materialized()
 
-        anchor_id = hashlib.md5((fused_name + fused_expr).encode()).hexdigest()[:12]
-
-        return {
-            "id": anchor_id,
-            "name": fused_name,
-            "expression": fused_expr,
-            "tier": tier,
-            "quantized_fingerprint": fingerprint
-        }
+    def fuse_batch(self, n):
+        """Up to `n` new fusions at once; repeats of known anchors are dropped."""
+        return fuse_batch(self.anchors, n, self.rng, FUSION, self.index)
 
     def reflect_and_mutate(self, cycles=5):
         print(f"[🧠] Initiating self-directed symbolic fusion...")
-        for i in range(cycles):
-            if len(self.anchors) < 2:
-                break
-            a1, a2 = random.sample(self.anchors, 2)
-            fused = self.fuse_anchors(a1, a2)
-
+        for i, fused in enumerate(self.fuse_batch(cycles)):
             print(f"🔄 Fusion {i+1}: '{fused['name']}'")
             print(f"     Expression: {fused['expression']}")
             print(f"     Fingerprint: {fused['quantized_fingerprint']}")
@@ -51,21 +29,24 @@ class BraidSelfDirectedFusion:
         return self.generated
 
 if __name__ == "__main__":
-    import json
+    import os
+
+    from anchor_store import AnchorStore, StoreView
 
-    try:
-        with open("compiled_braid.sbraid", "r") as f:
-            braid = json.load(f)
-    except FileNotFoundError:
+    # Anchors live in an append-only store; a legacy JSON memory is imported once
+    store = AnchorStore("compiled_braid.sbraid.d", compact_interval=None)
+    if not len(store) and os.path.isfile("compiled_braid.sbraid"):
+        store.import_json("compiled_braid.sbraid")
+    if not len(store):
         print("[⚠️] No compiled memory found. Starting from scratch.")
-        braid = {"compiled_anchors": []}
 
-    base_anchors = braid.get("compiled_anchors", [])
-    fusion_engine = BraidSelfDirectedFusion(base_anchors)
+    base_anchors = StoreView(store)
+    fusion_engine = BraidSelfDirectedFusion(base_anchors, index=ContentIndex.from_ids(base_anchors.anchor_ids))
     new_anchors = fusion_engine.reflect_and_mutate(5)
 
-    braid["compiled_anchors"].extend(new_anchors)
-    with open("compiled_braid.sbraid", "w") as f:
-        json.dump(braid, f, indent=2)
+    added = store.append_many(new_anchors)
+    if store.compaction_due():
+        store.compact()
+    store.close()
 
-    print(f"[✅] {len(new_anchors)} new symbolic anchors integrated into memory.")
+    print(f"[✅] {added} new symbolic anchors integrated into memory.")
@@ -0,0 +1,239 @@
+# braid_snapshot.py
+
+import argparse
+import json
+import os
+import pickle
+import struct
+
+import numpy as np
+
+from history_retention import Retention
+from symbolic_arrays import CycleLog, DiscoveryLog, NumericHistory, RollupLog, SymbolChain
+from symbolic_braid_simulation import SymbolicState
+
+MAGIC = b"BRAIDSNP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")  # magic, version, flags, manifest length, data offset
+ALIGN = 64
+TABLE_COLUMNS = ("resilience", "curvature", "alive", "curved", "discovered")
+LOGS = {
+    "discovery_log": DiscoveryLog,
+    "symbolic_cycles": CycleLog,
+    "symbol_chain": SymbolChain,
+    "symbolic_memory_depth": NumericHistory,
+}
+
+# Layout (all integers little-endian):
+#
+#   header    magic "BRAIDSNP", format version, flags, manifest length, data offset
+#   manifest  UTF-8 JSON: scalars, anchor names, synthetic anchors, RNG state,
+#             discovery extras, retention spec and per-log dropped counts,
+#             and {offset, dtype, shape} for every column
+#   data      raw column arrays, each starting on a 64-byte boundary; logs
+#             hold only their retained window (plus rollups, if any)
+#
+# Column offsets are relative to the data offset. Readers must reject files
+# whose version is newer than FORMAT_VERSION.
+
+
+def _aligned(n):
+    return -(-n // ALIGN) * ALIGN
+
+
+def _log_parts(log, name):
+    """A log's retained column as (mapped base, in-memory tail) pieces, without joining them."""
+    parts = []
+    if log._base is not None and log._start < log._base_size:
+        parts.append(log._base[name][log._start:log._base_size])
+    parts.append(log._data[name][max(0, log._start - log._base_size):log._size - log._base_size].copy())
+    return parts
+
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"[BraidSnapshot] Cannot store {type(value).__name__} in the manifest")
+
+
+def encode_snapshot(state):
+    """
+    Lay out `state` as a snapshot: returns (header + manifest bytes, column pieces).
+
+    Per-anchor arrays and in-memory log tails are copied; a log's mapped base
+    is passed through as is (it is read-only), so this is cheap to call under
+    a lock and the pieces can be written out after releasing it.
+    """
+    n = len(state.anchor_ids)
+    columns = {}
+    pieces = []
+    offset = 0
+
+    def add(key, parts):
+        nonlocal offset
+        dtype = parts[0].dtype
+        shape = list(parts[0].shape)
+        shape[0] = sum(len(part) for part in parts)
+        columns[key] = {"offset": offset, "dtype": dtype.str, "shape": shape}
+        for part in parts:
+            pieces.append((offset, part))
+            offset += part.nbytes
+        offset = _aligned(offset)
+
+    table = state.anchors
+    for attr in TABLE_COLUMNS:
+        add(f"anchors/{attr}", [getattr(table, attr)[:n].copy()])
+    counts = np.zeros((n, n), dtype=np.int64)
+    filled = min(n, len(state.symbol_pair_counter.counts))
+    counts[:filled, :filled] = state.symbol_pair_counter.counts[:filled, :filled]
+    add("pairs", [counts])
+    for attr in LOGS:
+        log = getattr(state, attr)
+        for name, _ in log.columns:
+            add(f"{attr}/{name}", _log_parts(log, name))
+        if log.rollups is not None:
+            for name, _ in RollupLog.columns:
+                add(f"{attr}.rollups/{name}", _log_parts(log.rollups, name))
+
+    random_state = state.rng.get_state()
+    if not isinstance(random_state["seed"], (int, type(None))):
+        random_state = dict(random_state, seed=None)  # The seed is informational; the generator state is what replays
+    manifest = json.dumps({
+        "version": FORMAT_VERSION,
+        "time": state.time,
+        "reflection_drift": state.reflection_drift,
+        "names": list(state.anchor_ids.names),
+        "synthetic_anchors": dict(state.synthetic_anchors),
+        "random_state": random_state,
+        "discovery_extras": {str(i): extras for i, extras in state.discovery_log.extras_since(0).items()},
+        "dropped": {attr: getattr(state, attr).dropped for attr in LOGS},
+        "rollups": {attr: getattr(state, attr).rollups.dropped for attr in LOGS if getattr(state, attr).rollups is not None},
+        "retention": state.retention.spec() if state.retention is not None else None,
+        "columns": columns,
+    }, default=_json_default).encode("utf-8")
+
+    data_offset = _aligned(HEADER.size + len(manifest))
+    head = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(manifest), data_offset) + manifest
+    head += b"\0" * (data_offset - len(head))
+    return head, pieces
+
+
+def write_snapshot(path, encoded):
+    """Write an encoded snapshot to `path` atomically (tmp file, fsync, rename)."""
+    head, pieces = encoded
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(head)
+        for offset, part in pieces:
+            f.seek(len(head) + offset)
+            f.write(np.ascontiguousarray(part).data)
+        f.truncate(f.tell())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def save_snapshot(state, path):
+    write_snapshot(path, encode_snapshot(state))
+
+
+def is_snapshot(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_manifest(path):
+    """The header fields and JSON manifest of a snapshot, without touching its columns."""
+    with open(path, "rb") as f:
+        magic, version, _, manifest_size, data_offset = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"[BraidSnapshot] {path} is not a braid snapshot")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"[BraidSnapshot] {path} is format v{version}; this build reads up to v{FORMAT_VERSION}")
+        manifest = json.loads(f.read(manifest_size).decode("utf-8"))
+    return manifest, data_offset
+
+
+def load_snapshot(path, mmap=True):
+    """
+    Open a snapshot as a SymbolicState.
+
+    Anchor names, the per-anchor arrays and the pair matrix are read into
+    memory (they scale with the anchor count). With `mmap=True` the history
+    logs stay memory-mapped: opening costs the same for a multi-GB history as
+    for an empty one, pages are read only where a log is accessed, and new
+    entries are appended in memory after the mapped ones.
+    """
+    manifest, data_offset = read_manifest(path)
+    if mmap:
+        buffer = np.asarray(np.memmap(path, dtype=np.uint8, mode="r"))
+    else:
+        buffer = np.fromfile(path, dtype=np.uint8)
+
+    def column(key):
+        spec = manifest["columns"][key]
+        dtype = np.dtype(spec["dtype"])
+        start = data_offset + spec["offset"]
+        size = int(np.prod(spec["shape"])) * dtype.itemsize
+        return buffer[start:start + size].view(dtype).reshape(spec["shape"])
+
+    state = SymbolicState()
+    state.time = manifest["time"]
+    state.reflection_drift = manifest["reflection_drift"]
+    state.synthetic_anchors = dict(manifest["synthetic_anchors"])
+    if manifest.get("random_state"):
+        state.rng.set_state(manifest["random_state"])
+
+    intern = state.anchor_ids
+    for name in manifest["names"]:
+        intern.intern(name)
+    n = len(intern)
+    state.anchors.reserve(n)
+    for attr in TABLE_COLUMNS:
+        getattr(state.anchors, attr)[:n] = column(f"anchors/{attr}")
+    state.anchors.invalidate()
+    state.symbol_pair_counter._reserve(n)
+    state.symbol_pair_counter.counts[:n, :n] = column("pairs")
+
+    dropped = manifest.get("dropped", {})
+    for attr, cls in LOGS.items():
+        base = {name: column(f"{attr}/{name}") for name, _ in cls.columns}
+        log = cls.mapped(base, intern=None if cls is NumericHistory else intern, dropped=dropped.get(attr, 0))
+        if attr in manifest.get("rollups", {}):
+            rollups = {name: column(f"{attr}.rollups/{name}") for name, _ in RollupLog.columns}
+            log.rollups = RollupLog.mapped(rollups, dropped=manifest["rollups"][attr])
+        setattr(state, attr, log)
+    if manifest.get("retention"):
+        state.retention = Retention.from_spec(manifest["retention"])
+    state.discovery_log.restore_extras({int(i): extras for i, extras in manifest["discovery_extras"].items()})
+    return state
+
+
+def convert_pickle(source, target):
+    """Convert a pickled braid state (dict or SymbolicState) to a snapshot."""
+    with open(source, "rb") as f:
+        data = pickle.load(f)
+    state = SymbolicState.from_dict(data) if isinstance(data, dict) else data
+    save_snapshot(state, target)
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a pickled braid state to the columnar snapshot format.")
+    parser.add_argument("source", help="Pickled state, e.g. braid_state.pkl")
+    parser.add_argument("target", nargs="?", help="Snapshot to write (default: <source>.snap)")
+    args = parser.parse_args()
+
+    target = args.target or os.path.splitext(args.source)[0] + ".snap"
+    state = convert_pickle(args.source, target)
+    print(f"[BraidSnapshot] {args.source} ({os.path.getsize(args.source)} B) -> "
+          f"{target} ({os.path.getsize(target)} B) | time={state.time} | "
+          f"discoveries={len(state.discovery_log)} | cycles={len(state.symbolic_cycles)}")
+
+
+if __name__ == "__main__":
+    main()
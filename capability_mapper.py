@@ -1,14 +1,141 @@
 # capability_mapper.py
 
+import json
+import os
+import re
+
+from expression_dag import default_dag
+
+# Checked in order; the first matching rule names the capability. "any": some
+# expression contains one of the patterns; "all": every expression does.
+DEFAULT_RULES = [
+    {"capability": "recursive_reasoning", "match": "any", "patterns": ["^", "ε"]},
+    {"capability": "arithmetic_simplification", "match": "all", "patterns": ["+", "-"]},
+    {"capability": "logic_proof", "match": "any", "patterns": ["if"]},
+    {"capability": "logical_consistency", "match": "any", "patterns": ["¬", "∧"]},
+]
+DEFAULT_CAPABILITY = "symbolic_reflection"
+
+
+class CapabilityClassifier:
+    """
+    `map_cluster_to_capability` compiled from a rule table.
+
+    Every pattern of every rule goes into one regex, so an expression is
+    tagged in a single scan: its tags are a bitmask of the patterns it
+    contains (plain substring semantics, as before). Tags are cached per
+    anchor ID, and rules are evaluated on the bitmasks only, so classifying
+    a cluster of already-seen anchors doesn't touch their text.
+
+    Anchors built in the expression DAG (with an "expr_id") are tagged from
+    their nodes instead: a node's tags are folded from its children's, so a
+    fused expression is never rescanned.
+
+    Extra rules can be loaded from JSON (`from_file`, or the
+    BRAID_CAPABILITY_RULES environment variable for the module-level
+    classifier): {"rules": [...], "default": ..., "replace": false}. Rules
+    from a file are checked before the built-in ones unless "replace" is set.
+    """
+
+    def __init__(self, rules=None, default=DEFAULT_CAPABILITY, cache_size=100_000, dag=None):
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self.default = default
+        self.cache_size = cache_size
+        self.dag = dag if dag is not None else default_dag()
+        self._cache = {}
+        self._node_tags = {}
+        patterns = []
+        for rule in self.rules:
+            if rule.get("match", "any") not in ("any", "all"):
+                raise ValueError(f"[CapabilityMapper] Rule {rule['capability']!r}: match must be 'any' or 'all'")
+            for pattern in rule["patterns"]:
+                if pattern not in patterns:
+                    patterns.append(pattern)
+        self.patterns = patterns
+        # Tags fold over DAG children only if no pattern can span a "(" or ")" boundary
+        self._composable = not any("(" in p or ")" in p for p in patterns)
+        bit = {pattern: 1 << i for i, pattern in enumerate(patterns)}
+        # A match of a longer pattern also implies every pattern inside it, so
+        # trying the longest pattern first at each position loses nothing.
+        self._implied = {
+            pattern: sum(bit[other] for other in patterns if other in pattern)
+            for pattern in patterns
+        }
+        by_length = sorted(patterns, key=len, reverse=True)
+        self._regex = re.compile("(?=(" + "|".join(re.escape(p) for p in by_length) + "))") if patterns else None
+        self._compiled = [
+            (rule["capability"], rule.get("match", "any") == "all", sum(bit[p] for p in rule["patterns"]))
+            for rule in self.rules
+        ]
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        rules = spec.get("rules", [])
+        if not spec.get("replace", False):
+            rules = rules + DEFAULT_RULES
+        return cls(rules, default=spec.get("default", DEFAULT_CAPABILITY))
+
+    def tag(self, expression):
+        """Bitmask over `self.patterns` of those contained in `expression`."""
+        mask = 0
+        if self._regex is not None:
+            implied = self._implied
+            for match in self._regex.finditer(expression):
+                mask |= implied[match.group(1)]
+        return mask
+
+    def tags(self, anchor):
+        node = self.dag.find(anchor)
+        if node is not None:
+            if len(self._node_tags) >= self.cache_size:
+                self._node_tags.clear()
+            return self.dag.tags(node, self.tag, self._node_tags, self._composable)
+        key = anchor.get("anchor", anchor["expression"])
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == anchor["expression"]:
+            return cached[1]
+        mask = self.tag(anchor["expression"])
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[key] = (anchor["expression"], mask)
+        return mask
+
+    def classify(self, cluster):
+        if not cluster:
+            return self.default
+        masks = [self.tags(anchor) for anchor in cluster]
+        seen = 0
+        for mask in masks:
+            seen |= mask
+        for capability, match_all, rule_mask in self._compiled:
+            if match_all:
+                if all(mask & rule_mask for mask in masks):
+                    return capability
+            elif seen & rule_mask:
+                return capability
+        return self.default
+
+    def classify_many(self, clusters):
+        return [self.classify(cluster) for cluster in clusters]
+
+
+_classifier = None
+
+
+def default_classifier():
+    global _classifier
+    if _classifier is None:
+        path = os.getenv("BRAID_CAPABILITY_RULES")
+        _classifier = CapabilityClassifier.from_file(path) if path else CapabilityClassifier()
+    return _classifier
+
+
 def map_cluster_to_capability(cluster):
-    anchor_exprs = [a["expression"] for a in cluster]
-    if any("^" in e or "ε" in e for e in anchor_exprs):
-        return "recursive_reasoning"
-    elif all("+" in e or "-" in e for e in anchor_exprs):
-        return "arithmetic_simplification"
-    elif any("if" in e for e in anchor_exprs):
-        return "logic_proof"
-    elif any("¬" in e or "∧" in e for e in anchor_exprs):
-        return "logical_consistency"
-    else:
-        return "symbolic_reflection"
+    return default_classifier().classify(cluster)
+
+
+def map_clusters_to_capabilities(clusters):
+    """Classify a batch of clusters with the compiled classifier."""
+    return default_classifier().classify_many(clusters)
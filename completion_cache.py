@@ -0,0 +1,144 @@
+# completion_cache.py
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+QA_TEMPLATE = "### Question:\n{prompt}\n\n### Answer:\n"
+
+
+def completion_key(model, template, params, prompt):
+    """Content address of one completion: SHA-256 over (model, template, sampling params, prompt)."""
+    payload = json.dumps([model, template, params, prompt], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    Two-tier cache of LLM completions, keyed by `completion_key`.
+
+    The memory tier is an LRU of `memory_entries` completions. With `path`
+    set, completions are also written to one small JSON file each under
+    `path` (atomically: tmp file plus rename), so they survive restarts; the
+    disk tier is bounded to `disk_mb` by evicting the least recently used
+    files (access time is tracked through the file's mtime).
+
+    A cached completion is replayed as is, so with a sampling temperature
+    above zero the first sample for a prompt becomes the answer to it.
+    """
+
+    def __init__(self, path=None, memory_entries=1024, disk_mb=256):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_budget = int(disk_mb * 1024 * 1024)
+        self._memory = OrderedDict()
+        self._disk = OrderedDict()  # key -> file size, least recently used first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._scan()
+
+    def _scan(self):
+        files = []
+        for name in os.listdir(self.path):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self.path, name))
+                files.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key):
+        """The cached completion text, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+            on_disk = key in self._disk
+        if on_disk:
+            try:
+                with open(self._file(key), "r", encoding="utf-8") as f:
+                    text = json.load(f)["text"]
+                os.utime(self._file(key))
+            except (OSError, ValueError, KeyError):
+                text = None
+            if text is not None:
+                with self._lock:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self.disk_hits += 1
+                    self._remember(key, text)
+                return text
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, text):
+        with self._lock:
+            self._remember(key, text)
+        if not self.path:
+            return
+        data = json.dumps({"text": text}).encode("utf-8")
+        tmp_path = f"{self._file(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._file(key))
+        with self._lock:
+            self._disk_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            evicted = []
+            while self._disk_bytes > self.disk_budget and len(self._disk) > 1:
+                old, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self.evictions += 1
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(self._file(old))
+            except FileNotFoundError:
+                pass
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def complete(self, llm, prompt, model="", template=QA_TEMPLATE, **params):
+        """
+        `llm(template.format(prompt=prompt), **params)` (llama.cpp calling
+        convention), answered from the cache when this exact completion was
+        asked for before.
+        """
+        key = completion_key(model, template, params, prompt)
+        text = self.get(key)
+        if text is None:
+            response = llm(template.format(prompt=prompt), **params)
+            text = response["choices"][0]["text"].strip()
+            self.put(key, text)
+        return text
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._disk),
+                "disk_mb": self._disk_bytes / (1024 * 1024),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,457 @@
+# expression_dag.py
+
+import copy
+import hashlib
+import re
+import threading
+from collections import Counter
+
+LEAF, BINARY, EPSILON = 0, 1, 2
+BINARY_OPS = ("<=>", "<drive>")
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")  # The vectorisers' default word tokens
+_EPSILON_SUFFIX = re.compile(r"\) \+ ε\^(\d+)$")
+
+
+class ExpressionDAG:
+    """
+    Hash-consed store of fused and mutated expressions.
+
+    A node is a leaf (plain expression text), a binary fusion
+    "(left) op (right)", or an ε stack "(child) + ε^k". Nodes are interned
+    on their structure, so each distinct subexpression is stored once and
+    fusing fused anchors costs one node, not a copy of both strings. Every
+    node has a structural digest (a hash of its kind and its children's
+    digests, O(1) per node); its hex form is the node's ID in anchors
+    ("expr_id") and stays valid across processes.
+
+    Length, depth and character set are kept per node from the children's;
+    word tokens and capability tags are folded from the children on first
+    use. Strings are rendered only on demand, and renders are cached up to
+    `render_cache_chars` characters; up to `intern_cache_size` parsed
+    expression strings are remembered.
+
+    Generated anchors are LazyAnchors (`anchor()`): they carry the expr_id
+    and render their "expression" only when it is read.
+    """
+
+    def __init__(self, render_cache_chars=1 << 24, intern_cache_size=1 << 16):
+        self._kind = []
+        self._op = []       # Leaf text, fusion operator, or ε power
+        self._left = []
+        self._right = []
+        self.length = []    # Rendered length
+        self.depth = []
+        self.chars = []     # frozenset of the rendered characters
+        self.digest = []
+        self._nodes = {}    # Structural key -> node
+        self._by_id = {}    # Digest hex -> node
+        self._interned = {} # Expression string -> node
+        self._charsets = {}
+        self._tokens = {}
+        self._rendered = {}
+        self._rendered_chars = 0
+        self.render_cache_chars = render_cache_chars
+        self.intern_cache_size = intern_cache_size
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._kind)
+
+    def _node(self, key, length, depth, chars, digest):
+        with self._lock:
+            node = self._nodes.get(key)
+            if node is not None:
+                return node
+            node = len(self._kind)
+            kind, op, left, right = key
+            self._kind.append(kind)
+            self._op.append(op)
+            self._left.append(left)
+            self._right.append(right)
+            self.length.append(length)
+            self.depth.append(depth)
+            self.chars.append(self._charsets.setdefault(chars, chars))
+            self.digest.append(digest)
+            self._nodes[key] = node
+            self._by_id[digest.hex()] = node
+            return node
+
+    # -- Construction --
+
+    def leaf(self, text):
+        key = (LEAF, text, -1, -1)
+        node = self._nodes.get(key)
+        if node is not None:
+            return node
+        digest = hashlib.blake2b(b"\x00" + text.encode(), digest_size=16).digest()
+        return self._node(key, len(text), 0, frozenset(text), digest)
+
+    def fuse(self, left, right, op="<=>"):
+        key = (BINARY, op, left, right)
+        node = self._nodes.get(key)
+        if node is not None:
+            return node
+        digest = hashlib.blake2b(
+            b"\x01" + op.encode() + b"\x00" + self.digest[left] + self.digest[right], digest_size=16
+        ).digest()
+        return self._node(
+            key,
+            self.length[left] + self.length[right] + len(op) + 6,
+            max(self.depth[left], self.depth[right]) + 1,
+            self.chars[left] | self.chars[right] | frozenset(f"() {op}"),
+            digest
+        )
+
+    def epsilon(self, child, k):
+        key = (EPSILON, k, child, -1)
+        node = self._nodes.get(key)
+        if node is not None:
+            return node
+        digest = hashlib.blake2b(b"\x02" + str(k).encode() + b"\x00" + self.digest[child], digest_size=16).digest()
+        return self._node(
+            key,
+            self.length[child] + 7 + len(str(k)),
+            self.depth[child] + 1,
+            self.chars[child] | frozenset(f"() +ε^{k}"),
+            digest
+        )
+
+    def intern(self, expression):
+        """The node for an expression string, recovering the fusion/ε structure it was rendered from."""
+        node = self._interned.get(expression)
+        if node is None:
+            node = self._parse(expression)
+            if self.render(node) != expression:  # Not something this DAG renders; keep it whole
+                node = self.leaf(expression)
+            if len(self._interned) >= self.intern_cache_size:
+                self._interned.clear()
+            self._interned[expression] = node
+        return node
+
+    def _parse(self, text):
+        node = self._interned.get(text)
+        if node is not None:
+            return node
+        if text.startswith("(") and text.endswith(")"):
+            close = _matching(text, 0)
+            if close is not None:
+                for op in BINARY_OPS:
+                    separator = f") {op} ("
+                    if text.startswith(separator, close) and _matching(text, close + len(separator) - 1) == len(text) - 1:
+                        return self.fuse(self._parse(text[1:close]), self._parse(text[close + len(separator):-1]), op)
+        if text.startswith("("):
+            suffix = _EPSILON_SUFFIX.search(text)
+            if suffix is not None and _matching(text, 0) == suffix.start():
+                return self.epsilon(self._parse(text[1:suffix.start()]), int(suffix.group(1)))
+        return self.leaf(text)
+
+    def replace_first(self, node, old, new):
+        """The node for `render(node).replace(old, new, 1)`, sharing every untouched subexpression."""
+        if not self._contains(node, old):
+            return node
+        kind = self._kind[node]
+        if kind != LEAF and "(" not in old and ")" not in old:
+            if kind == BINARY:
+                left, right, op = self._left[node], self._right[node], self._op[node]
+                if self._contains(left, old):
+                    return self.fuse(self.replace_first(left, old, new), right, op)
+                if old not in f" {op} " and self._contains(right, old):
+                    return self.fuse(left, self.replace_first(right, old, new), op)
+            else:
+                child = self._left[node]
+                if self._contains(child, old):
+                    return self.epsilon(self.replace_first(child, old, new), self._op[node])
+        return self.intern(self.render(node).replace(old, new, 1))
+
+    def _contains(self, node, text):
+        if len(text) == 1:
+            return text in self.chars[node]
+        return text in self.render(node)
+
+    # -- Anchors --
+
+    def expr_id(self, node):
+        return self.digest[node].hex()
+
+    def anchor(self, fields, node=None):
+        """A LazyAnchor of `fields` (any stored "expression" dropped), naming `node` if given."""
+        anchor = LazyAnchor(self, {key: value for key, value in fields.items() if key != "expression"})
+        if node is not None:
+            anchor["expr_id"] = self.expr_id(node)
+        return anchor
+
+    def find(self, anchor):
+        """The node an anchor's "expr_id" names, or None if it has none or this DAG doesn't know it."""
+        expr_id = anchor.get("expr_id")
+        return None if expr_id is None else self._by_id.get(expr_id)
+
+    def node_for(self, anchor):
+        """Like `find`, falling back to interning the anchor's expression."""
+        node = self.find(anchor)
+        return node if node is not None else self.intern(anchor.get("expression", ""))
+
+    def pack(self, anchors):
+        """
+        Anchors plus the expression nodes they use, for JSON: DAG-backed
+        anchors drop their "expression" and the nodes go in a table where
+        children are referenced by position.
+        """
+        nodes = sorted({
+            n for anchor in anchors
+            for n in self._reachable(self.find(anchor))
+        })
+        position = {node: i for i, node in enumerate(nodes)}
+        table = [
+            [self._kind[n], self._op[n], position.get(self._left[n], -1), position.get(self._right[n], -1)]
+            for n in nodes
+        ]
+        packed = []
+        for anchor in anchors:
+            if self.find(anchor) is not None:
+                anchor = {key: value for key, value in anchor.items() if key != "expression"}
+            packed.append(anchor)
+        return {"compiled_anchors": packed, "expressions": table}
+
+    def unpack(self, braid):
+        """Load what `pack` wrote (or a plain {"compiled_anchors": [...]}), rendering expressions back in."""
+        nodes = []
+        for kind, op, left, right in braid.get("expressions", []):
+            if kind == LEAF:
+                nodes.append(self.leaf(op))
+            elif kind == BINARY:
+                nodes.append(self.fuse(nodes[left], nodes[right], op))
+            else:
+                nodes.append(self.epsilon(nodes[left], op))
+        anchors = []
+        for anchor in braid.get("compiled_anchors", []):
+            if "expression" not in anchor:
+                node = self.find(anchor)
+                if node is None:
+                    raise ValueError(f"[ExpressionDAG] Anchor {anchor.get('id')} references unknown expression {anchor.get('expr_id')}")
+                anchor = dict(anchor, expression=self.render(node))
+            anchors.append(anchor)
+        unpacked = {key: value for key, value in braid.items() if key != "expressions"}
+        unpacked["compiled_anchors"] = anchors
+        return unpacked
+
+    def rows(self, node, known):
+        """
+        `[expr_id, kind, op, left expr_id, right expr_id]` rows, children
+        first, for the nodes under `node` whose expr_id isn't in `known` (they
+        are added to it): what `load_rows` needs to rebuild `node` elsewhere.
+        """
+        rows = []
+        stack = [(node, False)]
+        while stack:
+            n, expanded = stack.pop()
+            expr_id = self.expr_id(n)
+            if expr_id in known:
+                continue
+            if expanded:
+                known.add(expr_id)
+                left, right = self._left[n], self._right[n]
+                rows.append([
+                    expr_id, self._kind[n], self._op[n],
+                    self.expr_id(left) if left >= 0 else None,
+                    self.expr_id(right) if right >= 0 else None
+                ])
+                continue
+            stack.append((n, True))
+            stack.extend((child, False) for child in (self._right[n], self._left[n]) if child >= 0)
+        return rows
+
+    def load_rows(self, rows):
+        """Intern the nodes `rows` describes; children must come first (or be known already)."""
+        for expr_id, kind, op, left, right in rows:
+            if expr_id in self._by_id:
+                continue
+            if kind == LEAF:
+                self.leaf(op)
+            elif kind == BINARY:
+                self.fuse(self._by_id[left], self._by_id[right], op)
+            else:
+                self.epsilon(self._by_id[left], op)
+
+    def _reachable(self, node):
+        if node is None:
+            return []
+        seen = {node}
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            for child in (self._left[n], self._right[n]):
+                if child >= 0 and child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        return seen
+
+    # -- Features --
+
+    def char_count(self, node):
+        """`len(set(render(node)))` without rendering."""
+        return len(self.chars[node])
+
+    def _fold(self, node, memo, leaf, combine):
+        """Post-order fold over the nodes under `node` missing from `memo` (iterative: chains get deep)."""
+        stack = [node]
+        while stack:
+            n = stack[-1]
+            if n in memo:
+                stack.pop()
+                continue
+            kind = self._kind[n]
+            if kind == LEAF:
+                memo[n] = leaf(self._op[n])
+                stack.pop()
+                continue
+            children = [c for c in (self._left[n], self._right[n]) if c >= 0]
+            missing = [c for c in children if c not in memo]
+            if missing:
+                stack.extend(missing)
+                continue
+            separator = f" {self._op[n]} " if kind == BINARY else f" + ε^{self._op[n]}"
+            memo[n] = combine([memo[c] for c in children], separator)
+            stack.pop()
+        return memo[node]
+
+    def tokens(self, node):
+        """Counter of the lowercased word tokens in `render(node)`, as the vectorisers tokenise it."""
+        def leaf(text):
+            return Counter(TOKEN_PATTERN.findall(text.lower()))
+
+        def combine(parts, separator):
+            total = Counter(TOKEN_PATTERN.findall(separator.lower()))
+            for part in parts:
+                total.update(part)
+            return total
+
+        return self._fold(node, self._tokens, leaf, combine)
+
+    def tags(self, node, tag, memo, composable=True):
+        """
+        OR of `tag` (a substring-pattern bitmask) over `render(node)`, folded
+        from the children when no pattern contains a parenthesis (so none can
+        span a child boundary); `memo` caches it per node.
+        """
+        if not composable:
+            mask = memo.get(node)
+            if mask is None:
+                mask = memo[node] = tag(self.render(node))
+            return mask
+
+        def combine(parts, separator):
+            mask = tag(separator)
+            for part in parts:
+                mask |= part
+            return mask
+
+        return self._fold(node, memo, tag, combine)
+
+    # -- Rendering --
+
+    def render(self, node):
+        cached = self._rendered.get(node)
+        if cached is not None:
+            return cached
+        out = {}
+
+        def leaf(text):
+            return text
+
+        def combine(parts, separator):
+            if len(parts) == 2:
+                return f"({parts[0]}){separator}({parts[1]})"
+            return f"({parts[0]}){separator}"
+
+        # Seed the fold with whatever is cached so shared subtrees render once
+        for n in self._reachable(node):
+            cached = self._rendered.get(n)
+            if cached is not None:
+                out[n] = cached
+        text = self._fold(node, out, leaf, combine)
+        for n, rendered in out.items():
+            if n not in self._rendered:
+                self._cache_render(n, rendered)
+        return text
+
+    def _cache_render(self, node, text):
+        if len(text) > self.render_cache_chars:
+            return
+        if self._rendered_chars + len(text) > self.render_cache_chars:
+            self._rendered.clear()
+            self._rendered_chars = 0
+        self._rendered[node] = text
+        self._rendered_chars += len(text)
+
+    def stats(self):
+        return {
+            "nodes": len(self),
+            "interned_strings": len(self._interned),
+            "rendered_cached": len(self._rendered),
+            "rendered_chars": self._rendered_chars
+        }
+
+
+class LazyAnchor(dict):
+    """
+    An anchor whose "expression" isn't stored: reading it (`anchor["expression"]`
+    or `.get`) renders the node its "expr_id" names in `dag`. JSON of it
+    carries only the expr_id; a pickle of it is a plain dict with the
+    expression rendered in.
+    """
+
+    __slots__ = ("dag",)
+
+    def __init__(self, dag, fields=()):
+        super().__init__(fields)
+        self.dag = dag
+
+    def __missing__(self, key):
+        if key != "expression":
+            raise KeyError(key)
+        node = self.dag.find(self)
+        if node is None:
+            raise KeyError(f"[ExpressionDAG] Anchor {self.get('id')} references unknown expression {self.get('expr_id')}")
+        return self.dag.render(node)
+
+    def get(self, key, default=None):
+        if key == "expression" and not dict.__contains__(self, key) and self.dag.find(self) is not None:
+            return self[key]
+        return super().get(key, default)
+
+    def copy(self):
+        return LazyAnchor(self.dag, self)
+
+    def __deepcopy__(self, memo):
+        return LazyAnchor(self.dag, copy.deepcopy(dict(self), memo))
+
+    def __reduce__(self):
+        return dict, (self.materialized(),)
+
+    def materialized(self):
+        """A plain dict of the anchor, expression included."""
+        return dict(self, expression=self["expression"])
+
+
+def _matching(text, open_index):
+    """Index of the parenthesis closing the one at `open_index`, or None."""
+    depth = 0
+    for i in range(open_index, len(text)):
+        c = text[i]
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+
+_dag = None
+
+
+def default_dag():
+    global _dag
+    if _dag is None:
+        _dag = ExpressionDAG()
+    return _dag
@@ -0,0 +1,94 @@
+# fusion_stage.py
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from capability_mapper import map_clusters_to_capabilities
+from language_fusion import fuse_with_llm
+
+
+class FusionStage:
+    """
+    Background cluster-fusion stage for the braid pipeline.
+
+    `submit(step, clusters)` classifies the clusters in one batch and
+    returns at once: each non-empty cluster is fused with the LLM on a pool of
+    `workers` threads (capped at the backend's `max_concurrency`), and once
+    a checkpoint's clusters are all done their records are appended to the
+    NDJSON run log at `log_path` in one write, in cluster order. Checkpoints are logged in submission
+    order. At most `max_pending` checkpoints are in flight; `submit` blocks
+    beyond that, so a slow model applies backpressure instead of queueing
+    without bound.
+    """
+
+    def __init__(self, llm, log_path, cache=None, model="", workers=4, max_pending=2):
+        self.llm = llm
+        self.cache = cache
+        self.model = model or getattr(llm, "model_path", "") or ""
+        self.log_path = log_path
+        if llm.max_concurrency:
+            workers = min(workers, llm.max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fusion")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fusion-log")
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self.checkpoints = 0
+        self.fusions = 0
+        self.failures = 0
+        log_dir = os.path.dirname(log_path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+
+    def _fuse(self, step, index, cluster, capability):
+        output = fuse_with_llm(capability, cluster, self.llm, cache=self.cache, model=self.model)
+        return {
+            "step": step,
+            "cluster": index + 1,
+            "capability": capability,
+            "anchor_expressions": [a["expression"] for a in cluster],
+            "generated": output
+        }
+
+    def submit(self, step, clusters):
+        """
+        Fuse the non-empty `clusters` in the background; returns a Future of
+        the checkpoint's records.
+        """
+        self._pending.acquire()
+        try:
+            indexed = [(i, cluster) for i, cluster in enumerate(clusters) if cluster]
+            capabilities = map_clusters_to_capabilities([cluster for _, cluster in indexed])
+            fusions = [
+                self._pool.submit(self._fuse, step, i, cluster, capability)
+                for (i, cluster), capability in zip(indexed, capabilities)
+            ]
+            return self._writer.submit(self._write, step, fusions)
+        except BaseException:
+            self._pending.release()
+            raise
+
+    def _write(self, step, fusions):
+        try:
+            records = []
+            for future in fusions:
+                try:
+                    records.append(future.result())
+                except Exception as e:
+                    self.failures += 1
+                    print(f"[FusionStage] Fusion failed at step {step}: {e}")
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+            self.checkpoints += 1
+            self.fusions += len(records)
+            for record in records:
+                print(f"\n[🧠] Step {step} cluster {record['cluster']} capability: {record['capability']}")
+                print(f"[🗣️] Generated Output:\n{record['generated']}")
+            return records
+        finally:
+            self._pending.release()
+
+    def close(self):
+        """Wait for every submitted checkpoint to be fused and logged."""
+        self._pool.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
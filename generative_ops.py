@@ -0,0 +1,105 @@
+# generative_ops.py
+
+import hashlib
+
+import numpy as np
+
+from expression_dag import default_dag
+
+# (name template, fusion operator) for the two kinds of pairwise fusion
+FUSION = ("{}_{}_fusion", "<=>")
+DRIVE_FUSION = ("{}_{}_drivefusion", "<drive>")
+
+
+def fingerprints(digests):
+    """
+    4-value quantized fingerprints in [10, 255] for many expressions at once,
+    taken from the first bytes of each expression node's digest: the same
+    expression always gets the same fingerprint, and no RNG is touched.
+    """
+    if not digests:
+        return np.zeros((0, 4), dtype=np.int64)
+    digests = b"".join(digest[:4] for digest in digests)
+    raw = np.frombuffer(digests, dtype=np.uint8).reshape(-1, 4).astype(np.int64)
+    return 10 + raw % 246
+
+
+class ContentIndex:
+    """
+    IDs of the anchors already emitted. Anchor IDs are content hashes (of
+    name + expression), so a generated anchor whose ID is here is a repeat.
+    """
+
+    def __init__(self, anchors=()):
+        self.ids = {anchor["id"] for anchor in anchors if "id" in anchor}
+
+    @classmethod
+    def from_ids(cls, ids):
+        index = cls()
+        index.ids = set(ids)
+        return index
+
+    def __contains__(self, anchor_id):
+        return anchor_id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, anchor):
+        """Record `anchor`; returns False if its ID was already known."""
+        if anchor["id"] in self.ids:
+            return False
+        self.ids.add(anchor["id"])
+        return True
+
+
+def distinct_pairs(count, n, rng):
+    """`n` random (i, j) index pairs with i != j over `count` items, drawn in two vectorised calls."""
+    i = rng.integers(count, size=n)
+    j = rng.integers(count - 1, size=n)
+    j += j >= i
+    return i, j
+
+
+def _operand(dag, anchor, default):
+    node = dag.find(anchor)
+    return node if node is not None else dag.intern(anchor.get("expression", default))
+
+
+def fuse_pairs(pairs, template=FUSION, index=None, dag=None):
+    """
+    Fuse each (a1, a2) pair. Fusions already in `index` (or repeated within
+    the batch) are skipped, and the new ones are added to it. Expressions
+    are built in `dag` (the process-wide one by default); each fusion is a
+    LazyAnchor carrying its node's "expr_id". Its ID hashes the name and the
+    rendered expression, as stored fusions' IDs always have, so they still
+    dedupe against it; the expression itself is left for the DAG to render.
+    """
+    name_template, op = template
+    dag = dag if dag is not None else default_dag()
+    names = [name_template.format(a1.get("name", "A"), a2.get("name", "B")) for a1, a2 in pairs]
+    nodes = [dag.fuse(_operand(dag, a1, "A"), _operand(dag, a2, "B"), op) for a1, a2 in pairs]
+    prints = fingerprints([dag.digest[node] for node in nodes]).tolist()
+    index = index if index is not None else ContentIndex()
+
+    fused = []
+    for (a1, a2), name, node, fingerprint in zip(pairs, names, nodes, prints):
+        expr_id = dag.expr_id(node)
+        anchor = dag.anchor({
+            "id": hashlib.md5((name + dag.render(node)).encode()).hexdigest()[:12],
+            "name": name,
+            "expr_id": expr_id,
+            "tier": max(a1.get("tier", 1), a2.get("tier", 1)) + 1,
+            "quantized_fingerprint": fingerprint
+        })
+        if index.add(anchor):
+            fused.append(anchor)
+    return fused
+
+
+def fuse_batch(anchors, n, rng, template=FUSION, index=None, dag=None):
+    """Up to `n` new fusions of random distinct anchor pairs (fewer if some are repeats)."""
+    if len(anchors) < 2 or n <= 0:
+        return []
+    i, j = distinct_pairs(len(anchors), n, rng)
+    return fuse_pairs([(anchors[a], anchors[b]) for a, b in zip(i.tolist(), j.tolist())], template, index, dag)
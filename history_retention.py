@@ -0,0 +1,247 @@
+# history_retention.py
+
+from collections import deque
+from collections.abc import Sequence
+from itertools import islice
+
+import numpy as np
+
+from symbolic_arrays import ColumnLog, RollupLog
+
+
+class RetentionPolicy:
+    """How much of one history to keep. `apply` drops whatever falls outside."""
+
+    kind = None
+
+    def apply(self, log, now):
+        raise NotImplementedError
+
+    def check(self, log):
+        """Raise ValueError if this policy can't be applied to `log`."""
+
+    def spec(self):
+        raise NotImplementedError
+
+
+class Ring(RetentionPolicy):
+    """Keep the last `size` entries."""
+
+    kind = "ring"
+
+    def __init__(self, size):
+        self.size = int(size)
+
+    def apply(self, log, now):
+        log.drop(len(log) - self.size)
+
+    def spec(self):
+        return f"ring:{self.size}"
+
+
+class TimeWindow(RetentionPolicy):
+    """
+    Keep entries whose `key` (a column, or a dict key for RetainedLog) is at
+    least `now - window`. Entries must be recorded in time order.
+    """
+
+    kind = "window"
+
+    def __init__(self, window, key="time"):
+        self.window = int(window)
+        self.key = key
+
+    def apply(self, log, now):
+        cutoff = now - self.window
+        if isinstance(log, ColumnLog):
+            log.drop(int(np.searchsorted(log.column(self.key), cutoff, side="left")))
+        else:
+            log.drop(sum(1 for _ in _takewhile_older(log, self.key, cutoff)))
+
+    def check(self, log):
+        _check_column(log, self.key, self)
+
+    def spec(self):
+        return f"window:{self.window}:{self.key}"
+
+
+class Rollup(RetentionPolicy):
+    """
+    Keep the last `keep` entries raw; older ones are summarised every `every`
+    entries (min/max/mean of `column`) into the log's `rollups` before they
+    are dropped. Buckets are aligned to absolute positions, so the rollups
+    don't depend on how often the policy runs. `max_rollups` bounds the
+    summaries themselves.
+    """
+
+    kind = "rollup"
+
+    def __init__(self, every, keep, column="value", max_rollups=None):
+        self.every = int(every)
+        self.keep = int(keep)
+        self.column = column
+        self.max_rollups = max_rollups
+
+    def apply(self, log, now):
+        if not isinstance(log, ColumnLog):
+            raise TypeError("[Retention] Rollup needs a columnar log")
+        excess = len(log) - self.keep
+        if excess < self.every:
+            return
+        end = (log.dropped + excess) // self.every * self.every
+        n = end - log.dropped
+        first = -log.dropped % self.every  # A leading partial bucket (policy changed) is dropped unsummarised
+        values = log.column(self.column)[first:n].astype(float).reshape(-1, self.every)
+        if len(values):
+            if log.rollups is None:
+                log.rollups = RollupLog()
+            log.rollups.record_many(
+                log.dropped + first + self.every * np.arange(len(values)),
+                np.full(len(values), self.every),
+                values.min(axis=1),
+                values.max(axis=1),
+                values.mean(axis=1),
+            )
+            if self.max_rollups is not None:
+                log.rollups.drop(len(log.rollups) - self.max_rollups)
+        log.drop(n)
+
+    def check(self, log):
+        if not isinstance(log, ColumnLog):
+            raise ValueError(f"[Retention] {self.spec()} needs a columnar log")
+        _check_column(log, self.column, self)
+
+    def spec(self):
+        spec = f"rollup:{self.every}:{self.keep}:{self.column}"
+        return spec + (f":{self.max_rollups}" if self.max_rollups is not None else "")
+
+
+POLICIES = {policy.kind: policy for policy in (Ring, TimeWindow, Rollup)}
+
+
+def parse_policy(spec):
+    """'ring:1000', 'window:5000[:key]' or 'rollup:every:keep[:column[:max_rollups]]'."""
+    kind, *args = spec.split(":")
+    if kind not in POLICIES:
+        raise ValueError(f"[Retention] Unknown policy '{kind}' (expected one of {', '.join(POLICIES)})")
+    if kind == "rollup" and len(args) > 3:
+        args[3] = int(args[3])
+    return POLICIES[kind](*args)
+
+
+class Retention:
+    """
+    Retention policies by attribute name, e.g.
+
+        Retention(discovery_log=Ring(100_000), symbolic_memory_depth=Rollup(1000, 50_000))
+
+    `enforce(state)` applies each policy to the matching columnar log of the
+    state; names it doesn't have are skipped, so one Retention can also carry
+    the policies for RetainedLogs elsewhere (`get("mirror_log")`).
+    Structures without a policy grow unbounded as before.
+    """
+
+    def __init__(self, **policies):
+        self.policies = policies
+
+    def get(self, name):
+        return self.policies.get(name)
+
+    def validate(self, state):
+        """
+        Check each policy against the log it names on `state`, raising
+        ValueError (e.g. a window keyed on a column the log doesn't have)
+        before anything is enforced.
+        """
+        for name, policy in self.policies.items():
+            log = getattr(state, name, None)
+            if isinstance(log, ColumnLog):
+                try:
+                    policy.check(log)
+                except ValueError as e:
+                    raise ValueError(f"{e} (for '{name}')") from None
+
+    def enforce(self, state):
+        for name, policy in self.policies.items():
+            log = getattr(state, name, None)
+            if isinstance(log, ColumnLog):
+                policy.apply(log, state.time)
+
+    def spec(self):
+        return ",".join(f"{name}={policy.spec()}" for name, policy in self.policies.items())
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Parse 'name=policy,...' as written by `spec()`; an empty spec retains everything."""
+        policies = {}
+        for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+            name, _, policy = item.partition("=")
+            policies[name.strip()] = parse_policy(policy.strip())
+        return cls(**policies)
+
+    def __repr__(self):
+        return f"Retention({self.spec()})"
+
+
+class RetainedLog(Sequence):
+    """
+    A list-like log of Python objects (e.g. SymbolicSelfLoop.symbolic_log)
+    that applies its policy on every append. Indexing, negative indexing
+    and slicing read the retained window; `dropped` counts what was let go.
+    Ring and TimeWindow policies are supported.
+    """
+
+    def __init__(self, policy=None, entries=()):
+        if isinstance(policy, Rollup):
+            raise TypeError("[Retention] Rollup needs a columnar log")
+        self.policy = policy
+        self.dropped = 0
+        self._entries = deque()
+        self.extend(entries)
+
+    def append(self, entry):
+        self._entries.append(entry)
+        if self.policy is not None:
+            self.policy.apply(self, entry.get(self.policy.key, 0) if isinstance(self.policy, TimeWindow) else 0)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def drop(self, n):
+        for _ in range(max(0, min(n, len(self._entries)))):
+            self._entries.popleft()
+            self.dropped += 1
+
+    def clear(self):
+        self.drop(len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._entries))
+            if step == 1:
+                return list(islice(self._entries, start, stop))
+            return [self._entries[i] for i in range(start, stop, step)]
+        return self._entries[index]
+
+    def __setitem__(self, index, entry):
+        self._entries[index] = entry
+
+    def __repr__(self):
+        return repr(list(self._entries))
+
+
+def _check_column(log, column, policy):
+    if isinstance(log, ColumnLog) and column not in dict(log.columns):
+        names = ", ".join(name for name, _ in log.columns)
+        raise ValueError(f"[Retention] {policy.spec()}: the log has no '{column}' column (it has {names})")
+
+
+def _takewhile_older(log, key, cutoff):
+    for entry in log:
+        if entry.get(key, cutoff) >= cutoff:
+            return
+        yield entry
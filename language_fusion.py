@@ -1,15 +1,15 @@
 # language_fusion.py
 
-def fuse_with_llm(capability, anchor_cluster, llm):
+from completion_cache import CompletionCache
+
+def fuse_with_llm(capability, anchor_cluster, llm, cache: CompletionCache = None, model=""):
     anchor_texts = [a["expression"] for a in anchor_cluster]
     prompt = f"Given the symbolic pattern:\n" + "\n".join(anchor_texts)
     prompt += f"\n\nCan you perform a {capability} based on this?"
 
-    response = llm(
-        f"### Question:\n{prompt}\n\n### Answer:\n",
-        max_tokens=200,
-        stop=["###"],
-        echo=False,
-        temperature=0.7
-    )
+    params = dict(max_tokens=200, stop=["###"], echo=False, temperature=0.7)
+    if cache is not None:
+        # Identical clusters come back every analysis pass; reuse their completion
+        return cache.complete(llm, prompt, model=model, **params)
+    response = llm(f"### Question:\n{prompt}\n\n### Answer:\n", **params)
     return response["choices"][0]["text"].strip()
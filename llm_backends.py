@@ -0,0 +1,75 @@
+# llm_backends.py
+
+import hashlib
+import threading
+
+
+class LLMBackend:
+    """
+    What the braid needs from a language model: `backend(prompt, **params)`
+    with llama.cpp's calling convention and response shape
+    ({"choices": [{"text": ...}]}), a `model_path` naming the model (it keys
+    the completion cache), and `max_concurrency`, how many calls may run at
+    once (None = unbounded). Backends must be safe to call from several
+    threads; ones that aren't serialise themselves.
+    """
+
+    model_path = None
+    max_concurrency = None
+
+    def __call__(self, prompt, **params):
+        raise NotImplementedError
+
+
+class LlamaCppBackend(LLMBackend):
+    """A local GGUF model through llama.cpp. One generation at a time: a Llama is not thread-safe."""
+
+    max_concurrency = 1
+
+    def __init__(self, model_path, n_ctx=2048):
+        from llama_cpp import Llama
+        self.model_path = model_path
+        self.llm = Llama(model_path=model_path, n_ctx=n_ctx)
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, **params):
+        with self._lock:
+            return self.llm(prompt, **params)
+
+
+class StubLLM(LLMBackend):
+    """
+    Stand-in for a llama_cpp.Llama: same call signature and response shape,
+    deterministic text derived from the prompt, no model file. Counts calls,
+    so tests can see what a cache saved.
+    """
+
+    model_path = "stub"
+
+    def __init__(self, answers=None, delay=0.0):
+        self.answers = answers or [
+            "The derivative of x^2 is 2x.",
+            "Within the usual axioms, no; 1 + 1 = 2.",
+            "The square root of 16 is 4.",
+            "Yes, cos(90°) = 0.",
+            "Pi is approximately 3.142.",
+        ]
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, max_tokens=200, stop=None, echo=False, temperature=0.7, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            threading.Event().wait(self.delay)  # Simulated generation time
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        text = self.answers[digest[0] % len(self.answers)]
+        return {"choices": [{"text": (prompt if echo else "") + " " + text[:max_tokens * 4]}]}
+
+
+def load_backend(spec, n_ctx=2048):
+    """'stub' for the StubLLM, anything else is a GGUF model path for llama.cpp."""
+    if spec == "stub":
+        return StubLLM()
+    return LlamaCppBackend(spec, n_ctx=n_ctx)
@@ -0,0 +1,113 @@
+# request_coalescer.py
+
+import asyncio
+import time
+
+
+class RequestCoalescer:
+    """
+    Collects requests that arrive within `max_wait` seconds of each other (up
+    to `max_batch` of them) and hands them to `handler` as one list. The
+    handler runs in a worker thread, so it may block (simulate, persist), and
+    must return one result per item, in order. Each caller awaits its own
+    result; an exception from the handler fails every request in the batch.
+    """
+
+    def __init__(self, handler, max_batch=32, max_wait=0.005, name="coalescer"):
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.name = name
+        self._queue = None
+        self._worker = None
+        self._closed = False
+        self.stats_counters = {
+            "requests": 0,
+            "batches": 0,
+            "max_queue_depth": 0,
+            "max_batch_seen": 0,
+            "handler_seconds": 0.0,
+        }
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item):
+        """Queue one request and wait for its result."""
+        if self._closed:
+            raise RuntimeError(f"[{self.name}] Coalescer is closed")
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        depth = self._queue.qsize()
+        if depth > self.stats_counters["max_queue_depth"]:
+            self.stats_counters["max_queue_depth"] = depth
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            items = [item for item, _ in batch]
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(None, self.handler, items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"[{self.name}] Handler returned {len(results)} results for {len(items)} requests")
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                counters = self.stats_counters
+                counters["handler_seconds"] += time.perf_counter() - started
+                counters["requests"] += len(batch)
+                counters["batches"] += 1
+                counters["max_batch_seen"] = max(counters["max_batch_seen"], len(batch))
+
+    def stats(self):
+        counters = self.stats_counters
+        return {
+            "name": self.name,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": counters["max_queue_depth"],
+            "requests": counters["requests"],
+            "batches": counters["batches"],
+            "mean_batch_size": counters["requests"] / counters["batches"] if counters["batches"] else 0.0,
+            "max_batch_seen": counters["max_batch_seen"],
+            "mean_handler_ms": 1000 * counters["handler_seconds"] / counters["batches"] if counters["batches"] else 0.0,
+        }
+
+    async def close(self):
+        """Stop the worker; requests still queued fail with RuntimeError."""
+        self._closed = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError(f"[{self.name}] Coalescer closed"))
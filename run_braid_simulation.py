@@ -1,14 +1,25 @@
 # run_braid_simulation.py
 
 import argparse
+import json
 import os
-from symbolic_braid_simulation import SymbolicState, simulate_step, save_state, load_state
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import Manager
+
+import numpy as np
+
+from symbolic_braid_simulation import STATE_PATH, SymbolicState, migration_source, simulate_step, save_state, load_state
 from truth_anchors import truth_anchors_scaffold, anchor_tiers, symbolic_environment, observe_environment
+from state_journal import atomic_write
 
 def run_simulation(steps, state_path):
-    if os.path.exists(state_path):
-        print(f"[INFO] Loading existing simulation state from: {state_path}")
-        state = load_state(state_path)
+    source = migration_source(state_path)
+    if source is not None:
+        print(f"[INFO] Loading existing simulation state from: {source}")
+        state = load_state(source)
     else:
         print("[INFO] Initializing new simulation state.")
         state = SymbolicState()
@@ -21,10 +32,7 @@ def run_simulation(steps, state_path):
         observe_environment(state, symbolic_environment, truth_anchors_scaffold)
 
         current_depth = state.symbolic_memory_depth[-1] if state.symbolic_memory_depth else 0
-        most_resilient = (
-            max(state.symbolic_resilience.items(), key=lambda x: x[1])
-            if state.symbolic_resilience else (None, 0)
-        )
+        most_resilient = _most_resilient(state)
 
         print(f"[STEP {state.time}] ➤ Symbols: {len(state.discovered_anchors)} | "
               f"Cycles: {len(state.symbolic_cycles)} | Depth: {current_depth} | "
@@ -38,10 +46,225 @@ def run_simulation(steps, state_path):
     print(f"[INFO] Simulation complete. State saved to: {state_path}")
 
 
+def _most_resilient(state):
+    strongest = state.anchors.index.top(1)
+    return strongest[0] if strongest else (None, 0)
+
+
+def _load_checkpoint(shard_path, seed, steps):
+    """A shard checkpoint written for this seed and step count, or None (a mismatched one is discarded)."""
+    if not os.path.exists(shard_path):
+        return None
+    with open(shard_path, "rb") as f:
+        checkpoint = pickle.load(f)
+    if checkpoint.get("seed") != seed or checkpoint.get("steps") != steps:
+        print(f"[WARN] Discarding checkpoint {shard_path}: written for another seed or step count")
+        os.remove(shard_path)
+        return None
+    return checkpoint
+
+
+def _run_shard(shard, seed, steps, shard_path, base_path, progress, running, interval=500):
+    """
+    Worker: advance one braid by `steps` steps on its own random stream,
+    checkpointing to `shard_path` after every interval so a restarted worker
+    resumes where the last one stopped. `running` (a shared dict) marks the
+    shard as in flight until it returns or fails, so a crash can be pinned on it.
+    """
+    running[shard] = os.getpid()
+    try:
+        checkpoint = _load_checkpoint(shard_path, seed, steps)
+        base_source = migration_source(base_path) if base_path else None
+        if checkpoint is not None:
+            state, done = checkpoint["state"], checkpoint["steps_done"]
+        elif base_source is not None:
+            state, done = load_state(base_source), 0
+        else:
+            state, done = SymbolicState(), 0
+
+        if done == 0:
+            state.reseed(seed)
+
+        while done < steps:
+            chunk = min(interval, steps - done)
+            simulate_step(state, truth_anchors_scaffold, anchor_tiers, steps=chunk)
+            observe_environment(state, symbolic_environment, truth_anchors_scaffold)
+            done += chunk
+            atomic_write(shard_path, pickle.dumps({"steps_done": done, "seed": seed, "steps": steps, "state": state}))
+
+            most_resilient = _most_resilient(state)
+            progress.put({
+                "shard": shard,
+                "time": state.time,
+                "steps_done": done,
+                "symbols": len(state.discovered_anchors),
+                "cycles": len(state.symbolic_cycles),
+                "depth": state.symbolic_memory_depth[-1] if state.symbolic_memory_depth else 0,
+                "most_stable": most_resilient,
+            })
+
+        result = {
+            "shard": shard,
+            "seed": seed,
+            "time": state.time,
+            "resilience": state.symbolic_resilience.copy(),
+            "discovered": sorted(state.discovered_anchors),
+            "discoveries": len(state.discovery_log),
+            "cycles": [(cycle["pair"], cycle["cycle_detected_at"]) for cycle in state.symbolic_cycles],
+            "depth": np.asarray(state.symbolic_memory_depth.column("value", max(0, len(state.symbolic_memory_depth) - steps))),
+        }
+        return result
+    finally:
+        running.pop(shard, None)
+
+
+def _report_progress(progress, total_steps):
+    done = {}  # Shard -> steps done; absolute, so a retried shard isn't counted twice
+    while True:
+        update = progress.get()
+        if update is None:
+            return
+        done[update["shard"]] = update["steps_done"]
+        completed = sum(done.values())
+        name, value = update["most_stable"]
+        print(f"[STEP {update['time']}] [SHARD {update['shard']}] ➤ Symbols: {update['symbols']} | "
+              f"Cycles: {update['cycles']} | Depth: {update['depth']} | "
+              f"Most Stable: {name} ({value}) | Total: {completed}/{total_steps}")
+
+
+def merge_shard_results(results):
+    """Aggregate per-shard outcomes into one report."""
+    shards = len(results)
+    resilience = {}
+    for result in results:
+        for anchor, value in result["resilience"].items():
+            resilience.setdefault(anchor, []).append(value)
+    discovered = {}
+    for result in results:
+        for anchor in result["discovered"]:
+            discovered[anchor] = discovered.get(anchor, 0) + 1
+    cycles = {}
+    for result in results:
+        for pair, detected_at in result["cycles"]:
+            entry = cycles.setdefault(" <-> ".join(pair), {"shards": 0, "first_detected_at": detected_at})
+            entry["shards"] += 1
+            entry["first_detected_at"] = min(entry["first_detected_at"], detected_at)
+
+    length = min((len(result["depth"]) for result in results), default=0)
+    depth = np.vstack([result["depth"][-length:] for result in results]) if length else np.zeros((0, 0))
+
+    return {
+        "shards": shards,
+        "seeds": {result["shard"]: result["seed"] for result in results},
+        "resilience": {
+            anchor: {
+                "mean": float(np.sum(values)) / shards,
+                "max": int(max(values)),
+                "alive_in": len(values),
+            } for anchor, values in sorted(resilience.items())
+        },
+        "discovered_in": dict(sorted(discovered.items(), key=lambda x: -x[1])),
+        "discovery_events": int(sum(result["discoveries"] for result in results)),
+        "cycles": dict(sorted(cycles.items(), key=lambda x: -x[1]["shards"])),
+        "depth": {
+            "mean": depth.mean(axis=0).tolist() if length else [],
+            "min": depth.min(axis=0).tolist() if length else [],
+            "max": depth.max(axis=0).tolist() if length else [],
+        },
+    }
+
+
+def run_sharded(steps, shards, state_path=None, workers=None, seed=0, shard_dir="braid_shards",
+                max_retries=2, report_path=None):
+    """
+    Run `shards` independent braids for `steps` steps each on a process pool.
+
+    Every shard starts from `state_path` when it exists (many seeds of one
+    configuration), or from scratch, and gets its own seed spawned from
+    `seed`. Shards checkpoint as they go; a failed shard is retried up to
+    `max_retries` times and a crashed pool is rebuilt, with unfinished
+    shards resuming from their last checkpoint. When the pool dies, only
+    the shards that were running count a retry. Checkpoints are named for
+    the run's seed and step count, so another run never resumes them, and
+    are deleted once the shards are merged.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(shards)]
+    paths = [os.path.join(shard_dir, f"shard_{k:04d}_seed{seeds[k]}_steps{steps}.pkl") for k in range(shards)]
+    attempts = {k: 0 for k in range(shards)}
+    pending = set(range(shards))
+    results, failed = {}, {}
+
+    def give_up_or_retry(k, error):
+        attempts[k] += 1
+        if attempts[k] > max_retries:
+            print(f"[ERROR] Shard {k} failed {attempts[k]} times, giving up: {error}")
+            failed[k] = error
+            pending.discard(k)
+        else:
+            print(f"[WARN] Shard {k} failed ({error}); retrying from checkpoint ({attempts[k]}/{max_retries})")
+
+    print(f"[INFO] Running {shards} shards x {steps} steps on {workers or os.cpu_count()} workers...")
+    with Manager() as manager:
+        progress = manager.Queue()
+        running = manager.dict()
+        reporter = threading.Thread(target=_report_progress, args=(progress, shards * steps), daemon=True)
+        reporter.start()
+
+        while pending:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = {
+                        pool.submit(_run_shard, k, seeds[k], steps, paths[k], state_path, progress, running): k
+                        for k in sorted(pending)
+                    }
+                    for future in as_completed(futures):
+                        k = futures[future]
+                        try:
+                            results[k] = future.result()
+                            pending.discard(k)
+                        except BrokenProcessPool:
+                            raise
+                        except Exception as e:
+                            give_up_or_retry(k, repr(e))
+            except BrokenProcessPool as e:
+                print("[WARN] Worker process died; rebuilding the pool for unfinished shards.")
+                crashed = sorted(k for k in running.keys() if k in pending)
+                running.clear()
+                for k in crashed:
+                    give_up_or_retry(k, repr(e))
+
+        progress.put(None)
+        reporter.join()
+
+    report = merge_shard_results([results[k] for k in sorted(results)])
+    report["failed_shards"] = failed
+    for k in results:
+        if os.path.exists(paths[k]):
+            os.remove(paths[k])
+    print(f"[INFO] Sharded run complete: {len(results)}/{shards} shards | "
+          f"Discovery events: {report['discovery_events']} | Distinct cycles: {len(report['cycles'])}")
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] Aggregate report written to: {report_path}")
+    return report
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run persistent symbolic braid simulation.")
     parser.add_argument("--steps", type=int, default=1000, help="Number of steps to simulate")
-    parser.add_argument("--state", type=str, default="braid_state.pkl", help="Path to save/load state")
+    parser.add_argument("--state", type=str, default=STATE_PATH,
+                        help="Path to save/load state (a legacy .pkl next to it is loaded if it is missing)")
+    parser.add_argument("--shards", type=int, default=0, help="Run this many independent braids on a process pool")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --shards (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0, help="Root seed the shard streams are spawned from")
+    parser.add_argument("--shard-dir", type=str, default="braid_shards", help="Directory for shard checkpoints")
+    parser.add_argument("--report", type=str, default=None, help="Write the aggregate shard report to this JSON file")
     args = parser.parse_args()
 
-    run_simulation(args.steps, args.state)
+    if args.shards:
+        run_sharded(args.steps, args.shards, state_path=args.state, workers=args.workers, seed=args.seed,
+                    shard_dir=args.shard_dir, report_path=args.report)
+    else:
+        run_simulation(args.steps, args.state)
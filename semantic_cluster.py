@@ -1,7 +1,14 @@
 # semantic_cluster.py
 
-from sklearn.feature_extraction.text import TfidfVectorizer
+from collections import Counter
+
+import numpy as np
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
 from sklearn.cluster import KMeans
+from sklearn.preprocessing import normalize
+
+from expression_dag import TOKEN_PATTERN, default_dag
 
 def cluster_anchors(anchor_list, k=5):
     texts = [a["expression"] for a in anchor_list]
@@ -15,3 +22,147 @@ def cluster_anchors(anchor_list, k=5):
     for idx, label in enumerate(kmeans.labels_):
         clusters[label].append(anchor_list[idx])
     return clusters
+
+
+class IncrementalClusterer:
+    """
+    Stateful replacement for `cluster_anchors` across checkpoints.
+
+    Expressions are vectorised with a fixed HashingVectorizer (no vocabulary
+    to refit), and only anchors not seen before are vectorised. Centroids
+    are running means updated in mini-batches of `batch_size` (mini-batch
+    k-means): new anchors join their nearest centroid and pull it along, and
+    a removed anchor is subtracted from its centroid exactly. Anchors keep their cluster once
+    assigned, so cluster IDs are stable between calls; each call also
+    re-checks a random sample of `refine` existing anchors and moves those
+    that have a nearer centroid now. The cost per call scales with the
+    number of anchors added and removed, not with the total.
+
+    Anchors are keyed by their "anchor" field (falling back to the
+    expression). Initial centroids come from k-means++ seeding with `seed`.
+    Anchors built in the expression DAG are vectorised from their nodes'
+    token counts, which are folded from the children's, so fused
+    expressions are not re-tokenised.
+    """
+
+    def __init__(self, k=5, n_features=2 ** 12, batch_size=256, refine=32, seed=0, dag=None):
+        self.k = k
+        self.batch_size = batch_size
+        self.refine = refine
+        self.rng = np.random.default_rng(seed)
+        self.vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm="l2")
+        self.hasher = FeatureHasher(n_features=n_features, input_type="dict", alternate_sign=False)
+        self.dag = dag if dag is not None else default_dag()
+        self.centroids = np.zeros((0, n_features))
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.anchors = {}      # key -> anchor dict, in insertion order
+        self.vectors = {}      # key -> (feature indices, values) of its sparse vector
+        self.assignment = {}   # key -> cluster ID
+
+    @staticmethod
+    def _key(anchor):
+        if "anchor" in anchor:
+            return anchor["anchor"]
+        return anchor.get("expr_id") or anchor["expression"]
+
+    def _vectorize(self, anchors):
+        """Rows of `self.vectorizer.transform` over the anchors' expressions."""
+        nodes = [self.dag.find(a) for a in anchors]
+        if all(node is None for node in nodes):
+            return self.vectorizer.transform([a["expression"] for a in anchors])
+        counts = [
+            self.dag.tokens(node) if node is not None else Counter(TOKEN_PATTERN.findall(a["expression"].lower()))
+            for a, node in zip(anchors, nodes)
+        ]
+        return normalize(self.hasher.transform(counts), norm="l2")
+
+    def _dense(self, key):
+        indices, values = self.vectors[key]
+        x = np.zeros(self.centroids.shape[1])
+        x[indices] = values
+        return x
+
+    def _nearest(self, x):
+        distances = ((self.centroids - x) ** 2).sum(axis=1)
+        return int(np.argmin(distances))
+
+    def _join(self, c, x):
+        self.counts[c] += 1
+        self.centroids[c] += (x - self.centroids[c]) / self.counts[c]
+
+    def _leave(self, c, x):
+        self.counts[c] -= 1
+        if self.counts[c]:
+            self.centroids[c] += (self.centroids[c] - x) / self.counts[c]
+
+    def _seed(self, vectors):
+        """k-means++ seeding of the missing centroids from `vectors`."""
+        chosen = list(self.centroids)
+        norms = (vectors ** 2).sum(axis=1)
+        distances = np.full(len(vectors), np.inf)
+        for c in chosen:
+            distances = np.minimum(distances, norms - 2 * vectors @ c + c @ c)
+        while len(chosen) < self.k and len(chosen) - len(self.centroids) < len(vectors):
+            if chosen:
+                weights = np.maximum(distances, 0)
+                total = weights.sum()
+                if total <= 0:
+                    break
+                index = self.rng.choice(len(vectors), p=weights / total)
+            else:
+                index = self.rng.integers(len(vectors))
+            c = vectors[index].copy()
+            chosen.append(c)
+            distances = np.minimum(distances, norms - 2 * vectors @ c + c @ c)
+        added = len(chosen) - len(self.centroids)
+        if added:
+            self.centroids = np.array(chosen)
+            self.counts = np.concatenate([self.counts, np.zeros(added, dtype=np.int64)])
+
+    def update(self, anchor_list):
+        """Bring the clustering in line with `anchor_list`; returns the clusters like `cluster_anchors`."""
+        current = {self._key(a): a for a in anchor_list}
+        for key in [key for key in self.anchors if key not in current]:
+            self._leave(self.assignment.pop(key), self._dense(key))
+            del self.vectors[key]
+            del self.anchors[key]
+
+        new_keys = [key for key in current if key not in self.anchors]
+        if new_keys:
+            rows = self._vectorize([current[key] for key in new_keys])
+            vectors = rows.toarray()
+            if len(self.centroids) < self.k:
+                self._seed(vectors)
+            for start in range(0, len(new_keys), self.batch_size):
+                batch = vectors[start:start + self.batch_size]
+                distances = (batch ** 2).sum(axis=1)[:, None] - 2 * batch @ self.centroids.T \
+                    + (self.centroids ** 2).sum(axis=1)[None, :]
+                nearest = distances.argmin(axis=1)
+                for c in np.unique(nearest):
+                    members = batch[nearest == c]
+                    self.counts[c] += len(members)
+                    self.centroids[c] += (members.sum(axis=0) - len(members) * self.centroids[c]) / self.counts[c]
+                for i, c in enumerate(nearest, start):
+                    row = slice(rows.indptr[i], rows.indptr[i + 1])
+                    self.vectors[new_keys[i]] = (rows.indices[row].copy(), rows.data[row].copy())
+                    self.assignment[new_keys[i]] = int(c)
+        for key in current:
+            self.anchors[key] = current[key]
+
+        if self.refine and len(self.anchors) > len(new_keys):
+            keys = list(self.anchors)
+            for i in self.rng.choice(len(keys), size=min(self.refine, len(keys)), replace=False):
+                key = keys[i]
+                x, c = self._dense(key), self.assignment[key]
+                best = self._nearest(x)
+                if best != c and self.counts[c] > 1:
+                    self._leave(c, x)
+                    self._join(best, x)
+                    self.assignment[key] = best
+        return self.clusters()
+
+    def clusters(self):
+        clusters = [[] for _ in range(self.k)]
+        for key, anchor in self.anchors.items():
+            clusters[self.assignment[key]].append(anchor)
+        return clusters
@@ -0,0 +1,130 @@
+# state_actor.py
+
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class StateActor:
+    """
+    Single-writer owner of a SymbolicState.
+
+    Mutations are functions of the state, submitted from any thread and
+    applied in submission order by one writer thread. The writer drains up
+    to `max_batch` queued mutations at a time, applies them, calls `persist`
+    once for the batch, and then atomically publishes a new immutable
+    StateSnapshot (version + 1) before resolving the mutations' futures; a
+    caller that waits on its mutation therefore sees it in `snapshot()`.
+    A batch that fails to persist is still applied and published, so its
+    mutations' futures still resolve with their results; the failure is
+    reported on its own, counted in `persist_failures` with the latest
+    exception in `persist_error`.
+    `on_publish(snapshot, changes)`, if given, is told about every published
+    snapshot that persisting mutations went into, and how many (e.g. to hand
+    it to a BackgroundPersister instead of saving inline).
+
+    Readers call `snapshot()` and never take a lock or wait on the writer.
+    `lock` is held while a batch is applied and persisted, for collaborators
+    that touch the state from their own threads (e.g. a journal compactor).
+    """
+
+    def __init__(self, state, persist=None, lock=None, max_batch=64, name="StateActor", on_publish=None):
+        self.state = state
+        self.persist = persist
+        self.on_publish = on_publish
+        self.lock = lock or threading.RLock()
+        self.max_batch = max_batch
+        self.name = name
+        self.version = 0
+        self.batches = 0
+        self.mutations = 0
+        self.persist_failures = 0
+        self.persist_error = None
+        self._snapshot = state.snapshot(self.version)
+        self._commands = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name=name, daemon=True)
+        self._writer.start()
+
+    def snapshot(self):
+        """The latest published snapshot. Never blocks."""
+        return self._snapshot
+
+    def submit(self, mutation, persist=True):
+        """
+        Queue `mutation(state)` for the writer; returns a Future of its result.
+        With `persist=False` the mutation doesn't by itself trigger a save.
+        """
+        if self._closed:
+            raise RuntimeError(f"[{self.name}] Actor is closed")
+        future = Future()
+        self._commands.put((mutation, persist, future))
+        return future
+
+    def mutate(self, mutation, persist=True):
+        """Apply `mutation(state)` through the writer and wait for its result."""
+        return self.submit(mutation, persist).result()
+
+    def queue_depth(self):
+        return self._commands.qsize()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._commands.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._commands.get_nowait())
+                except queue.Empty:
+                    break
+
+            outcomes = []
+            stop = False
+            with self.lock:
+                dirty = 0
+                for command in batch:
+                    if command is None:
+                        stop = True
+                        continue
+                    mutation, persist, future = command
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        outcomes.append((future, True, mutation(self.state)))
+                        dirty += bool(persist)
+                    except BaseException as e:
+                        outcomes.append((future, False, e))
+                    self.state.revision += 1  # Even a failed mutation may have written part of its change
+                if dirty and self.persist is not None:
+                    try:
+                        self.persist(self.state)
+                    except Exception as e:
+                        self.persist_failures += 1
+                        self.persist_error = e
+                        print(f"[{self.name}] Persisting the batch failed (it is applied and published): {e}")
+                if outcomes:
+                    self.version += 1
+                    self._snapshot = self.state.snapshot(self.version)
+                    self.batches += 1
+                    self.mutations += len(outcomes)
+                    if dirty and self.on_publish is not None:
+                        self.on_publish(self._snapshot, dirty)
+
+            for future, ok, value in outcomes:
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+            if stop:
+                return
+
+    def close(self):
+        """Apply everything already queued, then stop the writer."""
+        if self._closed:
+            return
+        self._closed = True
+        self._commands.put(None)
+        self._writer.join()
+        while not self._commands.empty():
+            command = self._commands.get_nowait()
+            if command is not None and command[2].set_running_or_notify_cancel():
+                command[2].set_exception(RuntimeError(f"[{self.name}] Actor closed before applying this mutation"))
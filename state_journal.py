@@ -0,0 +1,299 @@
+# state_journal.py
+
+import glob
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+from braid_snapshot import encode_snapshot, write_snapshot
+from symbolic_braid_simulation import SymbolicState, load_state, migration_source
+
+RECORD_HEADER = struct.Struct("<II")  # payload length, crc32
+TABLE_COLUMNS = ("resilience", "curvature", "alive", "curved", "discovered")
+LOGS = ("discovery_log", "symbolic_cycles", "symbol_chain", "symbolic_memory_depth")
+
+
+class _Cursor:
+    """How much of one state the journal has already recorded."""
+
+    def __init__(self, state):
+        self.names = len(state.anchor_ids)
+        self.table = {attr: getattr(state.anchors, attr).copy() for attr in TABLE_COLUMNS}
+        self.logs = {name: getattr(state, name).position for name in LOGS}
+        self.synthetic = dict(state.synthetic_anchors)
+        self.reflection_drift = state.reflection_drift
+        state.symbol_pair_counter.touched.clear()
+
+    def capture(self, state):
+        """Everything that changed since the last capture, as absolute values."""
+        delta = {"time": state.time}
+        names = state.anchor_ids.names
+        if len(names) > self.names:
+            delta["names"] = (self.names, names[self.names:])
+            self.names = len(names)
+
+        table = state.anchors
+        changed = None
+        for attr in TABLE_COLUMNS:
+            current, shadow = getattr(table, attr), self.table[attr]
+            if len(shadow) < len(current):
+                shadow = self.table[attr] = _padded(shadow, len(current))
+            diff = current != shadow[:len(current)]
+            changed = diff if changed is None else changed | diff
+        ids = changed.nonzero()[0]
+        if len(ids):
+            delta["anchors"] = (ids, {attr: getattr(table, attr)[ids] for attr in TABLE_COLUMNS})
+            for attr in TABLE_COLUMNS:
+                self.table[attr][ids] = getattr(table, attr)[ids]
+
+        counter = state.symbol_pair_counter
+        if counter.touched:
+            rows = sorted(counter.touched)
+            delta["pairs"] = (rows, counter.counts[rows, :len(names)].copy())
+            counter.touched.clear()
+
+        for name in LOGS:
+            log = getattr(state, name)
+            start = max(self.logs[name], log.dropped)  # Retention may have dropped entries before they were journaled
+            if log.position > start:
+                columns = [log.column(column, start - log.dropped).copy() for column, _ in log.columns]
+                extras = log.extras_since(start) if hasattr(log, "extras_since") else {}
+                delta[name] = (start, columns, extras)
+                self.logs[name] = log.position
+
+        if state.synthetic_anchors != self.synthetic:
+            self.synthetic = dict(state.synthetic_anchors)
+            delta["synthetic_anchors"] = self.synthetic
+        if state.reflection_drift != self.reflection_drift:
+            self.reflection_drift = delta["reflection_drift"] = state.reflection_drift
+        delta["random_state"] = state.rng.get_state()
+        return delta
+
+
+def _padded(array, size):
+    grown = array.copy()
+    grown.resize(size, refcheck=False)
+    return grown
+
+
+def apply_delta(state, delta):
+    """
+    Replay one journal record onto `state`. Records hold absolute values and
+    log positions, so replaying a record the snapshot already contains is a no-op.
+    """
+    state.time = delta["time"]
+    intern = state.anchor_ids
+    if "names" in delta:
+        start, names = delta["names"]
+        for name in names[max(0, len(intern) - start):]:
+            intern.intern(name)
+
+    if "anchors" in delta:
+        ids, columns = delta["anchors"]
+        state.anchors.reserve(max(len(intern), int(ids.max()) + 1))
+        for attr, values in columns.items():
+            getattr(state.anchors, attr)[ids] = values
+        state.anchors.invalidate()
+
+    if "pairs" in delta:
+        rows, values = delta["pairs"]
+        counter = state.symbol_pair_counter
+        counter._reserve(len(intern))
+        width = values.shape[1]
+        counter.counts[rows, :width] = values
+        counter.counts[:width, rows] = values.T
+
+    for name in LOGS:
+        if name not in delta:
+            continue
+        log = getattr(state, name)
+        start, columns, extras = delta[name]
+        if log.position < start:
+            log.advance(start)  # The entries in between were dropped by retention before being journaled
+        skip = log.position - start
+        if skip < len(columns[0]):
+            log.record_many(*[column[skip:] for column in columns])
+            if extras:
+                log.restore_extras(extras)
+
+    if "synthetic_anchors" in delta:
+        state.synthetic_anchors = dict(delta["synthetic_anchors"])
+    if "reflection_drift" in delta:
+        state.reflection_drift = delta["reflection_drift"]
+    if "random_state" in delta:
+        state.rng.set_state(delta["random_state"])
+    if state.retention is not None:
+        state.retention.enforce(state)
+
+
+def atomic_write(path, blob):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class StateJournal:
+    """
+    Write-ahead journal for a SymbolicState.
+
+    `append` writes only what changed since the previous append (resilience
+    deltas, new discoveries, deaths, cycles, time), so persistence cost
+    follows the size of the change, not of the state. A background compactor
+    folds the journal into the snapshot at `state_path` every
+    `compact_every` records or `compact_interval` seconds. Recovery loads the
+    snapshot and replays the journal segments over it; a torn record at the
+    tail of the last segment is dropped.
+
+    Records are fsynced every `fsync_every` appends (0 leaves it to the OS)
+    and at least every `fsync_interval` seconds when set.
+    """
+
+    def __init__(self, state_path, lock=None, fsync_every=1, fsync_interval=None,
+                 compact_every=1000, compact_interval=60.0):
+        self.state_path = state_path
+        self.directory = f"{state_path}.journal"
+        self.lock = lock or threading.RLock()
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self.state = None
+        self._cursor = None
+        self._segment = None
+        self._generation = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._pending = 0
+        self._wake = threading.Event()
+        self._closed = False
+        self._compactor = None
+        self._compacting = threading.Lock()  # One snapshot write at a time, in order
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, "segment-*.wal")))
+
+    def _open_segment(self):
+        self._generation += 1
+        path = os.path.join(self.directory, f"segment-{self._generation:08d}.wal")
+        self._segment = open(path, "ab")
+
+    def recover(self):
+        """Load the snapshot, replay the journal over it, and start journaling."""
+        os.makedirs(self.directory, exist_ok=True)
+        source = migration_source(self.state_path)
+        if source is not None:
+            state = load_state(source)
+        else:
+            state = SymbolicState()
+
+        segments = self._segments()
+        replayed = 0
+        for path in segments:
+            for delta in _read_records(path):
+                apply_delta(state, delta)
+                replayed += 1
+        if segments:
+            self._generation = int(os.path.basename(segments[-1])[8:16])
+            print(f"[StateJournal] Replayed {replayed} records from {len(segments)} segments.")
+
+        self.state = state
+        self._cursor = _Cursor(state)
+        self._pending = replayed
+        self._open_segment()
+        if self._compactor is None:
+            self._compactor = threading.Thread(target=self._compact_loop, name="StateJournalCompactor", daemon=True)
+            self._compactor.start()
+        return state
+
+    def append(self, state):
+        """Journal everything that changed in `state` since the last append."""
+        with self.lock:
+            delta = self._cursor.capture(state)
+            payload = pickle.dumps(delta, protocol=pickle.HIGHEST_PROTOCOL)
+            self._segment.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._segment.flush()
+            self._unsynced += 1
+            now = time.monotonic()
+            if (self.fsync_every and self._unsynced >= self.fsync_every) or (
+                self.fsync_interval is not None and now - self._last_sync >= self.fsync_interval
+            ):
+                os.fsync(self._segment.fileno())
+                self._unsynced = 0
+                self._last_sync = now
+            self._pending += 1
+            if self._pending >= self.compact_every:
+                self._wake.set()
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot and drop the folded segments."""
+        with self._compacting:
+            with self.lock:
+                if self.state is None:
+                    return
+                encoded = encode_snapshot(self.state)
+                folded = self._segments()
+                self._segment.close()
+                self._open_segment()
+                self._pending = 0
+            write_snapshot(self.state_path, encoded)
+            for path in folded:
+                os.remove(path)
+
+    def reset(self, state):
+        """Start over from `state`: write it as the snapshot and discard the journal."""
+        with self._compacting, self.lock:
+            self.state = state
+            self._cursor = _Cursor(state)
+            folded = self._segments()
+            self._segment.close()
+            self._open_segment()
+            self._pending = 0
+            write_snapshot(self.state_path, encode_snapshot(state))
+            for path in folded:
+                os.remove(path)
+
+    def _compact_loop(self):
+        while not self._closed:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            if self._closed:
+                break
+            if self._pending:
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"[StateJournal] Compaction failed: {e}")
+
+    def close(self, compact=True):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._compactor is not None:
+            self._compactor.join()  # It may be mid-compaction, writing the same snapshot file
+        if compact and self._pending:
+            self.compact()
+        with self.lock:
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+            self._segment.close()
+
+
+def _read_records(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, offset)
+        payload = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            print(f"[StateJournal] Dropping torn record at {path}:{offset}")
+            return
+        yield pickle.loads(payload)
+        offset += RECORD_HEADER.size + length
@@ -0,0 +1,242 @@
+# state_overlay.py
+
+from collections import ChainMap
+from collections.abc import Sequence
+
+import numpy as np
+
+from symbolic_arrays import AnchorIntern, SymbolPairCounter
+from symbolic_braid_simulation import SymbolicState
+
+
+class OverlayLog(Sequence):
+    """
+    A log that reads through to a frozen prefix of `base` and keeps its own
+    appends in `local`, a fresh log of the same type.
+    """
+
+    def __init__(self, base, intern):
+        self.base = base
+        self.base_size = len(base)
+        self.local = type(base)(intern=intern)
+        self.columns = self.local.columns
+
+    def __len__(self):
+        return self.base_size + len(self.local)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("log index out of range")
+        if index < self.base_size:
+            return self.base[index]
+        return self.local[index - self.base_size]
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def column(self, name):
+        return np.concatenate([self.base.column(name)[:self.base_size], self.local.column(name)])
+
+    def record(self, *values):
+        self.local.record(*values)
+
+    def record_many(self, *arrays):
+        self.local.record_many(*arrays)
+
+    def append(self, entry):
+        self.local.append(entry)
+
+    def extend(self, entries):
+        self.local.extend(entries)
+
+    @property
+    def nbytes(self):
+        return self.local.nbytes
+
+    def commit(self):
+        self.base.record_many(*[self.local.column(name) for name, _ in self.columns])
+        if hasattr(self.local, "extras_since"):
+            self.base.restore_extras({
+                self.base.position - len(self.local) + i: extras
+                for i, extras in self.local.extras_since(0).items()
+            })
+
+
+class OverlayPairCounter(SymbolPairCounter):
+    """
+    Pair counts read through to `base`; speculative increments are kept per
+    touched row, so a dry-run step costs O(hits x anchors), not a matrix copy.
+    """
+
+    def __init__(self, base, intern):
+        self.base = base
+        self.intern = intern
+        self.delta = {}
+        self.touched = set()
+
+    @property
+    def counts(self):
+        # Only for whole-matrix readers (mapping iteration, nbytes); materialises a copy
+        size = self._capacity()
+        counts = np.zeros((size, size), dtype=np.int64)
+        base = self.base.counts[:size, :size]
+        counts[:len(base), :len(base)] = base
+        for i, row in self.delta.items():
+            counts[i, :len(row)] += row
+            counts[:len(row), i] += row
+        return counts
+
+    def _reserve(self, n):
+        pass
+
+    def _capacity(self):
+        return max(len(self.base.counts), len(self.intern))
+
+    def _ids(self, pair, create=False):
+        a, b = pair
+        if create:
+            return self.intern.intern(a), self.intern.intern(b)
+        i, j = self.intern.lookup(a), self.intern.lookup(b)
+        if i is None or j is None or i == j:
+            raise KeyError(pair)
+        return i, j
+
+    def _row_delta(self, i):
+        size = self._capacity()
+        row = self.delta.get(i)
+        if row is None:
+            row = self.delta[i] = np.zeros(size, dtype=np.int64)
+        elif len(row) < size:
+            row = self.delta[i] = np.concatenate([row, np.zeros(size - len(row), dtype=np.int64)])
+        return row
+
+    def rows(self, ids):
+        size = self._capacity()
+        result = np.zeros((len(ids), size), dtype=np.int64)
+        base = self.base.counts
+        for r, i in enumerate(ids):
+            if i < len(base):
+                result[r, :len(base)] = base[i]
+            row = self.delta.get(i)
+            if row is not None:
+                result[r, :len(row)] += row
+            for j, other in self.delta.items():
+                if i < len(other):
+                    result[r, j] += other[i]
+        return result
+
+    def _add(self, rows, increments):
+        self.touched.update(rows)
+        for i, row in zip(rows, increments):
+            self._row_delta(i)[:len(row)] += row
+
+    def __getitem__(self, pair):
+        i, j = self._ids(pair)
+        count = int(self.rows([i])[0, j]) if j < self._capacity() else 0
+        if not count:
+            raise KeyError(pair)
+        return count
+
+    def __setitem__(self, pair, count):
+        i, j = self._ids(pair, create=True)
+        self._row_delta(i)[j] += count - int(self.rows([i])[0, j])
+        self.touched.update((i, j))
+
+    def __delitem__(self, pair):
+        self[pair]
+        self[pair] = 0
+
+    def commit(self):
+        base = self.base
+        base._reserve(len(base.intern))
+        for i, row in self.delta.items():
+            increments = np.zeros((1, len(base.counts)), dtype=np.int64)
+            increments[0, :len(row)] = row[:len(base.counts)]
+            base._add([i], increments)
+
+
+class StateOverlay(SymbolicState):
+    """
+    Copy-on-write view of a SymbolicState for speculative runs.
+
+    Reads fall through to the base state; writes stay in the overlay. History
+    logs and the pair counter only hold what the overlay appended or touched,
+    so a dry run costs memory in proportion to the steps it simulates rather
+    than to the base state's history. The per-anchor arrays and the intern
+    table are copied up front (they scale with the anchor count, and every
+    step's decay writes all of them anyway).
+
+    `simulate_step` runs on an overlay exactly as on a state. Afterwards,
+    `commit()` folds the writes into the base; dropping the overlay (or
+    `discard()`) leaves the base untouched. Commit requires that the base
+    has not moved on since the overlay was opened: its `revision` must be
+    the one the overlay saw.
+    """
+
+    __slots__ = ("base", "_base_revision", "_base_names")
+
+    def __init__(self, base):
+        self.base = base
+        self._base_revision = base.revision
+        self._base_names = len(base.anchor_ids)
+        self.revision = base.revision
+        self.time = base.time
+        self.anchor_ids = AnchorIntern(base.anchor_ids.names)
+        self.anchors = base.anchors.copy(self.anchor_ids)
+        self.symbol_pair_counter = OverlayPairCounter(base.symbol_pair_counter, self.anchor_ids)
+        self.symbolic_cycles = OverlayLog(base.symbolic_cycles, self.anchor_ids)
+        self.discovery_log = OverlayLog(base.discovery_log, self.anchor_ids)
+        self.symbolic_memory_depth = OverlayLog(base.symbolic_memory_depth, None)
+        self.symbol_chain = OverlayLog(base.symbol_chain, self.anchor_ids)
+        self.synthetic_anchors = ChainMap({}, base.synthetic_anchors)
+        self.reflection_drift = base.reflection_drift
+        self.rng = base.rng.fork()  # Speculate on exactly the draws the base would see next
+        self.retention = None  # Trimming is the base's business, on commit
+
+    def __reduce__(self):
+        raise TypeError("StateOverlay is a transient view; commit it or pickle its base state")
+
+    def commit(self):
+        """Apply every speculative write to the base state."""
+        base = self.base
+        if base.revision != self._base_revision:
+            raise RuntimeError("[StateOverlay] Base state changed since the overlay was opened; cannot commit")
+
+        for name in self.anchor_ids.names[self._base_names:]:
+            base.anchor_ids.intern(name)
+        size = len(base.anchor_ids)
+        base.anchors.reserve(size)
+        for attr in ("resilience", "curvature", "alive", "curved", "discovered"):
+            getattr(base.anchors, attr)[:size] = getattr(self.anchors, attr)[:size]
+        base.anchors.invalidate()
+        self.symbol_pair_counter.commit()
+        for log in (self.symbolic_cycles, self.discovery_log, self.symbolic_memory_depth, self.symbol_chain):
+            log.commit()
+        base.synthetic_anchors.update(self.synthetic_anchors.maps[0])
+        base.reflection_drift = self.reflection_drift
+        base.rng = self.rng
+        base.time = self.time
+        base.revision += 1
+        if base.retention is not None:
+            base.retention.enforce(base)
+        self.discard()
+
+    def rebase(self, state):
+        """
+        Point the overlay at `state`, which must hold exactly what the current
+        base holds -- e.g. the live state a StateSnapshot base was taken from,
+        as long as it hasn't been written since (`commit` checks its revision
+        against the snapshot's). `commit` then writes there.
+        """
+        self.base = state
+        self.symbol_pair_counter.base = state.symbol_pair_counter
+        for name in ("symbolic_cycles", "discovery_log", "symbolic_memory_depth", "symbol_chain"):
+            getattr(self, name).base = getattr(state, name)
+
+    def discard(self):
+        """Drop the speculative writes; the overlay must not be used afterwards."""
+        self.base = None
@@ -0,0 +1,141 @@
+# streaming_metrics.py
+
+import numpy as np
+
+
+class _Window:
+    """Running sums over the last `size` values of a RingSeries, for O(1) mean, variance and slope."""
+
+    __slots__ = ("size", "sum", "sumsq", "sumty")
+
+    def __init__(self, size):
+        self.size = size
+        self.sum = self.sumsq = self.sumty = 0.0
+
+
+class RingSeries:
+    """
+    A metric series on a fixed-capacity NumPy ring buffer.
+
+    Appending is O(1) and memory stays at `capacity` values however long the
+    series runs. For each size in `windows` the series keeps running sums,
+    so the windowed mean, variance and least-squares slope are O(1) too;
+    `ewma` is an exponentially weighted mean with weight `alpha`.
+
+    Every value is written twice, `capacity` apart, so the retained values
+    are always one contiguous slice: `values()` and `last(k)` are read-only
+    views, not copies. Indexing and slicing read the retained values like a
+    list. Running sums are recomputed from the buffer every so often, which
+    bounds floating-point drift.
+    """
+
+    def __init__(self, capacity=1024, windows=(3,), alpha=0.2, dtype=float):
+        if capacity < max(windows, default=1):
+            raise ValueError("[RingSeries] capacity must be at least the largest window")
+        self.capacity = capacity
+        self.alpha = alpha
+        self._buffer = np.zeros(2 * capacity, dtype=dtype)
+        self._windows = {size: _Window(size) for size in windows}
+        self.total = 0        # Values ever appended
+        self._base = 0        # Absolute index that slope sums are relative to
+        self._refresh_every = max(1024, 16 * max(windows, default=1))
+        self.ewma = None
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def values(self):
+        """The retained values, oldest first, as a read-only view."""
+        end = self.total % self.capacity + self.capacity if self.total >= self.capacity else self.total
+        view = self._buffer[end - len(self):end]
+        view.flags.writeable = False
+        return view
+
+    def last(self, k):
+        """The last `k` values (or fewer) as a read-only view."""
+        values = self.values()
+        return values[max(0, len(values) - k):]
+
+    def __getitem__(self, index):
+        return self.values()[index]
+
+    def __iter__(self):
+        return iter(self.values().tolist())
+
+    def __repr__(self):
+        return f"RingSeries({self.values().tolist()!r})"
+
+    def append(self, value):
+        t = self.total - self._base
+        slot = self.total % self.capacity
+        for window in self._windows.values():
+            if self.total >= window.size:
+                old = float(self._buffer[(self.total - window.size) % self.capacity])
+                window.sum -= old
+                window.sumsq -= old * old
+                window.sumty -= (t - window.size) * old
+            window.sum += value
+            window.sumsq += value * value
+            window.sumty += t * value
+        self._buffer[slot] = value
+        self._buffer[slot + self.capacity] = value
+        self.total += 1
+        self.ewma = value if self.ewma is None else self.alpha * value + (1 - self.alpha) * self.ewma
+        if self.total - self._base >= self._refresh_every:
+            self._refresh()
+
+    def extend(self, values):
+        """Append a batch of values with a few vectorised writes."""
+        values = np.asarray(values, dtype=self._buffer.dtype).ravel()
+        if not len(values):
+            return
+        kept = values[-self.capacity:]
+        start = (self.total + len(values) - len(kept)) % self.capacity
+        first = min(len(kept), self.capacity - start)
+        for offset in (0, self.capacity):
+            self._buffer[start + offset:start + offset + first] = kept[:first]
+            self._buffer[offset:offset + len(kept) - first] = kept[first:]
+        decay = (1 - self.alpha) ** np.arange(len(values) - 1, -1, -1)
+        if self.ewma is None:
+            self.ewma = float(values[0])
+        self.ewma = float((1 - self.alpha) ** len(values) * self.ewma + self.alpha * (decay * values).sum())
+        self.total += len(values)
+        self._refresh()
+
+    def _refresh(self):
+        """Recompute every window's sums from the buffer, relative to a fresh base index."""
+        self._base = self.total
+        for window in self._windows.values():
+            tail = self.last(window.size).astype(float)
+            t = np.arange(-len(tail), 0, dtype=float)
+            window.sum = float(tail.sum())
+            window.sumsq = float((tail * tail).sum())
+            window.sumty = float((t * tail).sum())
+
+    def _window(self, size):
+        window = self._windows.get(size)
+        if window is None:
+            raise KeyError(f"[RingSeries] No running window of size {size} (have {sorted(self._windows)})")
+        return window, min(self.total, size)
+
+    def mean(self, size):
+        window, n = self._window(size)
+        return window.sum / n if n else None
+
+    def variance(self, size):
+        """Population variance over the window."""
+        window, n = self._window(size)
+        if not n:
+            return None
+        mean = window.sum / n
+        return max(0.0, window.sumsq / n - mean * mean)
+
+    def slope(self, size):
+        """Least-squares slope per step over the window (0 with fewer than two values)."""
+        window, n = self._window(size)
+        if n < 2:
+            return 0.0
+        t0 = self.total - n - self._base  # Index of the oldest value in the window
+        sum_t = n * t0 + n * (n - 1) / 2
+        sum_tt = n * t0 * t0 + t0 * n * (n - 1) + (n - 1) * n * (2 * n - 1) / 6
+        return (n * window.sumty - sum_t * window.sum) / (n * sum_tt - sum_t * sum_t)
@@ -0,0 +1,756 @@
+# symbolic_arrays.py
+
+import copy
+from bisect import bisect_left, insort
+from collections.abc import MutableMapping, MutableSet, Sequence
+
+import numpy as np
+
+
+class AnchorIntern:
+    """Two-way table between anchor names and small dense integer IDs."""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name):
+        anchor_id = self.ids.get(name)
+        if anchor_id is None:
+            anchor_id = len(self.names)
+            self.ids[name] = anchor_id
+            self.names.append(name)
+        return anchor_id
+
+    def lookup(self, name):
+        return self.ids.get(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+
+class SymbolPairCounter(MutableMapping):
+    """
+    Co-occurrence counts for anchor pairs, held in a symmetric integer matrix
+    indexed by interned anchor ID.
+
+    Reads like the old dict keyed by `tuple(sorted((a, b)))`; pairs that have
+    never co-occurred are absent. Simulation updates go through `record_hits`,
+    which applies a whole step at once.
+    """
+
+    def __init__(self, intern, pairs=None):
+        self.intern = intern
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.touched = set()  # Rows changed since a consumer last drained this set
+        if pairs:
+            self.update(pairs)
+
+    def frozen(self, intern):
+        """A read-only copy of the counts, bound to `intern`."""
+        counter = SymbolPairCounter(intern)
+        n = min(len(intern), len(self.counts))
+        counter.counts = self.counts[:n, :n].copy()
+        counter.counts.flags.writeable = False
+        return counter
+
+    def __setstate__(self, attrs):
+        self.__dict__.update(attrs)
+        self.__dict__.setdefault("touched", set())
+
+    def _reserve(self, n):
+        capacity = len(self.counts)
+        if n <= capacity:
+            return
+        grown = np.zeros((max(n, 2 * capacity, 16),) * 2, dtype=np.int64)
+        grown[:capacity, :capacity] = self.counts
+        self.counts = grown
+
+    def _ids(self, pair, create=False):
+        a, b = pair
+        if create:
+            i, j = self.intern.intern(a), self.intern.intern(b)
+            self._reserve(len(self.intern))
+            return i, j
+        i, j = self.intern.lookup(a), self.intern.lookup(b)
+        if i is None or j is None or i == j or max(i, j) >= len(self.counts):
+            raise KeyError(pair)
+        return i, j
+
+    def _key(self, i, j):
+        return tuple(sorted((self.intern.names[i], self.intern.names[j])))
+
+    def __getitem__(self, pair):
+        i, j = self._ids(pair)
+        count = self.counts[i, j]
+        if not count:
+            raise KeyError(pair)
+        return int(count)
+
+    def __setitem__(self, pair, count):
+        i, j = self._ids(pair, create=True)
+        self.counts[i, j] = self.counts[j, i] = count
+        self.touched.update((i, j))
+
+    def __delitem__(self, pair):
+        i, j = self._ids(pair)
+        if not self.counts[i, j]:
+            raise KeyError(pair)
+        self.counts[i, j] = self.counts[j, i] = 0
+        self.touched.update((i, j))
+
+    def __iter__(self):
+        for i, j in np.argwhere(np.triu(self.counts, 1)):
+            yield self._key(i, j)
+
+    def __len__(self):
+        return int(np.count_nonzero(np.triu(self.counts, 1)))
+
+    def record_hits(self, hit_ids, discovered, threshold):
+        """
+        Count one step of co-occurrences in bulk.
+
+        `hit_ids` are the anchors hit this step, in draw order, and
+        `discovered` a boolean mask of anchors discovered before the step.
+        Each hit pairs with every anchor discovered up to and including its
+        own draw. Returns the (i, j) ID pairs whose count reached `threshold`
+        during this step, each exactly once.
+        """
+        if not hit_ids:
+            return []
+        self._reserve(len(self.intern))
+        mask = np.zeros(self._capacity(), dtype=bool)
+        n = min(len(mask), len(discovered))
+        mask[:n] = discovered[:n]
+
+        rows = list(dict.fromkeys(hit_ids))
+        slot = {anchor_id: r for r, anchor_id in enumerate(rows)}
+        increments = np.zeros((len(rows), len(mask)), dtype=np.int64)
+        for anchor_id in hit_ids:
+            mask[anchor_id] = True
+            increments[slot[anchor_id]] += mask
+        increments[np.arange(len(rows)), rows] = 0
+
+        before = self.rows(rows)
+        self._add(rows, increments)
+        crossed = (before < threshold) & (self.rows(rows) >= threshold)
+
+        pairs = []
+        seen = set()
+        for r, j in zip(*np.nonzero(crossed)):
+            i = rows[r]
+            key = (min(i, j), max(i, j))
+            if key not in seen:
+                seen.add(key)
+                pairs.append((i, int(j)))
+        return pairs
+
+    def _capacity(self):
+        return len(self.counts)
+
+    def rows(self, ids):
+        """Current counts of the given anchors against every other anchor."""
+        return self.counts[ids]
+
+    def _add(self, rows, increments):
+        """Add per-row increments, keeping the matrix symmetric."""
+        self.touched.update(rows)
+        self.counts[rows] += increments
+        self.counts[:, rows] += increments.T
+
+
+class ResilienceTable:
+    """
+    Per-anchor resilience, phase curvature and liveness held in dense arrays
+    indexed by interned anchor ID, so a simulation step can hit, decay and
+    bury anchors with a handful of masked array operations.
+
+    An anchor is alive while it holds a resilience entry. The dict- and
+    set-shaped views keep `state.symbolic_resilience`,
+    `state.symbolic_phase_curvature` and `state.discovered_anchors` usable
+    exactly as before.
+
+    `index` orders the live anchors by resilience (a ResilienceIndex); `hit`
+    and `decay` keep it current, and any other write to the arrays must
+    call `invalidate()` so it is rebuilt on next use.
+    """
+
+    _index = None
+
+    def __init__(self, intern):
+        self.intern = intern
+        self.resilience = np.zeros(0, dtype=np.int64)
+        self.curvature = np.zeros(0, dtype=float)
+        self.alive = np.zeros(0, dtype=bool)
+        self.curved = np.zeros(0, dtype=bool)
+        self.discovered = np.zeros(0, dtype=bool)
+        self.resilience_view = AnchorArrayView(self, "resilience", "alive", int)
+        self.curvature_view = AnchorArrayView(self, "curvature", "curved", float)
+        self.discovered_view = DiscoveredView(self)
+
+    def copy(self, intern, writeable=True):
+        """An independent copy of the arrays, bound to `intern`."""
+        table = ResilienceTable(intern)
+        for attr in ("resilience", "curvature", "alive", "curved", "discovered"):
+            array = getattr(self, attr).copy()
+            array.flags.writeable = writeable
+            setattr(table, attr, array)
+        table._index = self.index.copy(table)  # From here on the source keeps its index current too
+        return table
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = ResilienceIndex(self)
+        return self._index
+
+    def invalidate(self):
+        """Drop the resilience index after writing the arrays directly."""
+        self._index = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("_index", None)
+        return state
+
+    def reserve(self, n):
+        capacity = len(self.alive)
+        if n <= capacity:
+            return
+        size = max(n, 2 * capacity, 16)
+        for attr in ("resilience", "curvature", "alive", "curved", "discovered"):
+            old = getattr(self, attr)
+            grown = np.zeros(size, dtype=old.dtype)
+            grown[:capacity] = old
+            setattr(self, attr, grown)
+
+    def hit(self, hit_ids):
+        """
+        Apply one step's successful draws (IDs in draw order). Returns the
+        IDs discovered by this step, in the order they were first hit.
+        """
+        self.reserve(len(self.intern))
+        unique = np.fromiter(dict.fromkeys(hit_ids), dtype=np.intp)
+        counts = np.bincount(hit_ids, minlength=len(self.alive))[unique]
+
+        self.resilience[unique] = np.where(self.alive[unique], self.resilience[unique], 0) + counts
+        self.alive[unique] = True
+        # k successive max(0, c - 0.5) updates collapse to max(0, c - 0.5k)
+        self.curvature[unique] = np.maximum(0, np.where(self.curved[unique], self.curvature[unique], 0) - 0.5 * counts)
+        self.curved[unique] = True
+
+        discovered = unique[~self.discovered[unique]]
+        self.discovered[discovered] = True
+        if self._index is not None:
+            self._index.update(unique)
+        return discovered
+
+    def decay(self, hit_ids, decay_rate, decay_threshold):
+        """Decay every live anchor not hit this step; return the IDs that died."""
+        decaying = self.alive.copy()
+        decaying[hit_ids] = False
+        self.resilience[decaying] -= decay_rate
+        dead = np.flatnonzero(decaying & (self.resilience < decay_threshold))
+        self.alive[dead] = False
+        self.discovered[dead] = False
+        self.resilience[dead] = 0
+        if self._index is not None:
+            self._index.decay(decay_rate, hit_ids, dead)
+        return dead
+
+
+class ResilienceIndex:
+    """
+    Live anchors of a ResilienceTable kept sorted by resilience, for
+    weakest/strongest/rank queries without scanning the table.
+
+    Entries are (key, anchor ID) pairs in a sorted list, where the key is
+    resilience plus the total decay applied so far (`offset`). The step-wide
+    decay of every unhit anchor therefore only bumps `offset`; a step costs
+    O(log n) searches (and a C-level memmove) per anchor hit or buried, or
+    one re-sort when it touches more than an eighth of the entries, and
+    queries cost O(log n + k). Ties are broken by anchor ID, which matches
+    min/max/sorted over `symbolic_resilience.items()`.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.offset = 0
+        live = np.flatnonzero(table.alive)
+        self.keys = dict(zip(live.tolist(), table.resilience[live].tolist()))
+        self.entries = sorted((key, anchor_id) for anchor_id, key in self.keys.items())
+
+    def copy(self, table):
+        index = ResilienceIndex.__new__(ResilienceIndex)
+        index.table = table
+        index.offset = self.offset
+        index.keys = dict(self.keys)
+        index.entries = list(self.entries)
+        return index
+
+    def _remove(self, anchor_id):
+        key = self.keys.pop(anchor_id, None)
+        if key is not None:
+            del self.entries[bisect_left(self.entries, (key, anchor_id))]
+
+    def update(self, anchor_ids, dead=()):
+        """Re-place anchors whose resilience was set (and which are alive); drop `dead` ones."""
+        anchor_ids = np.asarray(anchor_ids, dtype=np.intp)
+        keys = (self.table.resilience[anchor_ids] + self.offset).tolist()
+        alive = self.table.alive[anchor_ids].tolist()
+        changed = len(anchor_ids) + len(dead)
+        if 8 * changed < len(self.entries):
+            for anchor_id in dead:
+                self._remove(anchor_id)
+            for anchor_id, key, live in zip(anchor_ids.tolist(), keys, alive):
+                self._remove(anchor_id)
+                if live:
+                    self.keys[anchor_id] = key
+                    insort(self.entries, (key, anchor_id))
+            return
+        # Touching a good share of the entries: re-sorting them is cheaper
+        for anchor_id in dead:
+            self.keys.pop(anchor_id, None)
+        for anchor_id, key, live in zip(anchor_ids.tolist(), keys, alive):
+            if live:
+                self.keys[anchor_id] = key
+            else:
+                self.keys.pop(anchor_id, None)
+        self.entries = sorted((key, anchor_id) for anchor_id, key in self.keys.items())
+
+    def decay(self, decay_rate, hit_ids, dead):
+        """Mirror ResilienceTable.decay: every live anchor but the hit ones lost `decay_rate`."""
+        self.offset += int(decay_rate)
+        self.update(list(dict.fromkeys(hit_ids)), dead.tolist())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _named(self, entries):
+        names = self.table.intern.names
+        return [(names[anchor_id], key - self.offset) for key, anchor_id in entries]
+
+    def bottom(self, k=1):
+        """The `k` least resilient anchors as (name, resilience), weakest first."""
+        return self._named(self.entries[:k])
+
+    def top(self, k=1):
+        """The `k` most resilient anchors as (name, resilience), strongest first."""
+        entries = self.entries
+        if k <= 0 or not entries:
+            return []
+        # Take every entry tied with the k-th from the top, then order ties by ID
+        start = max(0, len(entries) - k)
+        start = bisect_left(entries, (entries[start][0], -1))
+        best = sorted(entries[start:], key=lambda entry: (-entry[0], entry[1]))[:k]
+        return self._named(best)
+
+    def rank(self, name):
+        """How many live anchors are less resilient than `name` (0 = weakest); None if not live."""
+        anchor_id = self.table.intern.lookup(name)
+        key = self.keys.get(anchor_id) if anchor_id is not None else None
+        if key is None:
+            return None
+        return bisect_left(self.entries, (key, -1))
+
+
+class AnchorArrayView(MutableMapping):
+    """Dict view of one ResilienceTable column, keyed by anchor name."""
+
+    def __init__(self, table, values, mask, cast):
+        self.table = table
+        self._values = values
+        self._mask = mask
+        self._cast = cast
+
+    def _id(self, name):
+        anchor_id = self.table.intern.lookup(name)
+        mask = getattr(self.table, self._mask)
+        if anchor_id is None or anchor_id >= len(mask) or not mask[anchor_id]:
+            raise KeyError(name)
+        return anchor_id
+
+    def __getitem__(self, name):
+        return self._cast(getattr(self.table, self._values)[self._id(name)])
+
+    def __setitem__(self, name, value):
+        anchor_id = self.table.intern.intern(name)
+        self.table.reserve(len(self.table.intern))
+        getattr(self.table, self._values)[anchor_id] = value
+        getattr(self.table, self._mask)[anchor_id] = True
+        self.table.invalidate()
+
+    def __delitem__(self, name):
+        anchor_id = self._id(name)
+        getattr(self.table, self._mask)[anchor_id] = False
+        getattr(self.table, self._values)[anchor_id] = 0
+        self.table.invalidate()
+
+    def __iter__(self):
+        names = self.table.intern.names
+        for anchor_id in np.flatnonzero(getattr(self.table, self._mask)):
+            yield names[anchor_id]
+
+    def __len__(self):
+        return int(np.count_nonzero(getattr(self.table, self._mask)))
+
+    def __repr__(self):
+        return repr(self.copy())
+
+    def items(self):
+        names = self.table.intern.names
+        values = getattr(self.table, self._values)
+        live = np.flatnonzero(getattr(self.table, self._mask))
+        return [(names[i], self._cast(v)) for i, v in zip(live, values[live])]
+
+    def values(self):
+        values = getattr(self.table, self._values)
+        return [self._cast(v) for v in values[getattr(self.table, self._mask)]]
+
+    def clear(self):
+        getattr(self.table, self._mask)[:] = False
+        getattr(self.table, self._values)[:] = 0
+        self.table.invalidate()
+
+    def replace(self, mapping):
+        self.clear()
+        self.update(mapping)
+
+    def copy(self):
+        return dict(self.items())
+
+
+class DiscoveredView(MutableSet):
+    """Set view of the discovered-anchor mask, holding anchor names."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __contains__(self, name):
+        anchor_id = self.table.intern.lookup(name)
+        return anchor_id is not None and anchor_id < len(self.table.discovered) and bool(self.table.discovered[anchor_id])
+
+    def __iter__(self):
+        names = self.table.intern.names
+        for anchor_id in np.flatnonzero(self.table.discovered):
+            yield names[anchor_id]
+
+    def __len__(self):
+        return int(np.count_nonzero(self.table.discovered))
+
+    def __repr__(self):
+        return repr(set(self))
+
+    def add(self, name):
+        anchor_id = self.table.intern.intern(name)
+        self.table.reserve(len(self.table.intern))
+        self.table.discovered[anchor_id] = True
+
+    def discard(self, name):
+        anchor_id = self.table.intern.lookup(name)
+        if anchor_id is not None and anchor_id < len(self.table.discovered):
+            self.table.discovered[anchor_id] = False
+
+    def clear(self):
+        self.table.discovered[:] = False
+
+    def replace(self, names):
+        self.clear()
+        for name in names:
+            self.add(name)
+
+
+class ColumnLog(Sequence):
+    """
+    Append-only event log stored as one growable NumPy array per field
+    (struct of arrays). Reads return the same dicts/tuples/ints the old
+    Python lists held; subclasses define the columns and the conversion.
+
+    A log opened from a snapshot keeps the snapshot's entries as read-only
+    (typically memory-mapped) `_base` columns and appends after them, so
+    history is only paged in where it is read.
+
+    Retention (see history_retention) can `drop` the oldest entries; the log
+    then reads as the retained window. `dropped` counts the entries dropped
+    so far and `position` the entries ever recorded, so absolute positions
+    stay stable across drops.
+    """
+
+    columns = ()
+
+    def __init__(self, entries=(), intern=None):
+        self.intern = intern
+        self._base = None
+        self._base_size = 0
+        self._size = 0
+        self._start = 0
+        self.dropped = 0
+        self.rollups = None
+        self._frozen = False
+        self._data = {name: np.zeros(16, dtype=dtype) for name, dtype in self.columns}
+        self.extend(entries)
+
+    def __setstate__(self, attrs):
+        self.__dict__.update(attrs)
+        self.__dict__.setdefault("_base", None)
+        self.__dict__.setdefault("_base_size", 0)
+        self.__dict__.setdefault("_start", 0)
+        self.__dict__.setdefault("dropped", 0)
+        self.__dict__.setdefault("rollups", None)
+        self.__dict__.setdefault("_frozen", False)
+
+    @classmethod
+    def mapped(cls, base, intern=None, dropped=0):
+        """A log whose first entries are the given read-only columns."""
+        log = cls(intern=intern)
+        log._base = base
+        log._base_size = log._size = len(base[cls.columns[0][0]])
+        log.dropped = dropped
+        return log
+
+    def frozen(self):
+        """
+        A read-only view of the log as it is now, in O(1): it shares the
+        column arrays, which are only ever written past the view's end or
+        replaced wholesale, so later appends and drops never show through.
+        """
+        log = copy.copy(self)
+        log._data = dict(self._data)
+        log._frozen = True
+        if self.rollups is not None:
+            log.rollups = self.rollups.frozen()
+        return log
+
+    def _check_writable(self):
+        if self._frozen:
+            raise TypeError(f"[{type(self).__name__}] This is a read-only snapshot of the log")
+
+    @property
+    def position(self):
+        """Absolute position of the next entry: every entry ever recorded, dropped or not."""
+        return self.dropped + self._size - self._start
+
+    def _reserve(self, n):
+        n -= self._base_size
+        capacity = len(self._data[self.columns[0][0]])
+        if n <= capacity:
+            return
+        size = max(n, 2 * capacity)
+        filled = self._size - self._base_size
+        for name, column in self._data.items():
+            grown = np.zeros(size, dtype=column.dtype)
+            grown[:filled] = column[:filled]
+            self._data[name] = grown
+
+    def column(self, name, start=0):
+        """The retained part of one field from `start` on, as an array (a view when possible)."""
+        start += self._start
+        tail = self._data[name][max(0, start - self._base_size):self._size - self._base_size]
+        if start >= self._base_size:
+            return tail
+        return np.concatenate([self._base[name][start:], tail])
+
+    def _value(self, name, i):
+        i += self._start
+        if i < self._base_size:
+            return self._base[name][i]
+        return self._data[name][i - self._base_size]
+
+    def record(self, *values):
+        self._check_writable()
+        self._reserve(self._size + 1)
+        for (name, _), value in zip(self.columns, values):
+            self._data[name][self._size - self._base_size] = value
+        self._size += 1
+
+    def record_many(self, *arrays):
+        self._check_writable()
+        n = len(arrays[0])
+        self._reserve(self._size + n)
+        offset = self._size - self._base_size
+        for (name, _), values in zip(self.columns, arrays):
+            self._data[name][offset:offset + n] = values
+        self._size += n
+
+    def append(self, entry):
+        self._check_writable()
+        self.record(*self._encode(entry))
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def drop(self, n):
+        """Forget the oldest `n` retained entries."""
+        self._check_writable()
+        n = min(n, len(self))
+        if n <= 0:
+            return
+        self._start += n
+        self.dropped += n
+        if 2 * self._start >= self._size:
+            self._compact()
+
+    def advance(self, position):
+        """Drop everything and continue at absolute `position` (entries in between are lost)."""
+        self.drop(len(self))
+        self.dropped = max(self.dropped, position)
+
+    def _compact(self):
+        # Fresh arrays rather than shifting in place: anyone still holding the
+        # old ones (an encoded snapshot, a mapped base) keeps a consistent copy
+        keep = len(self)
+        data = {}
+        for name, dtype in self.columns:
+            column = np.zeros(max(16, 2 * keep), dtype=dtype)
+            column[:keep] = self.column(name)
+            data[name] = column
+        self._data = data
+        self._base = None
+        self._base_size = 0
+        self._size = keep
+        self._start = 0
+
+    def __len__(self):
+        return self._size - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("log index out of range")
+        return self._decode(index)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory; a mapped base is not counted."""
+        total = sum(column.nbytes for column in self._data.values())
+        if self.rollups is not None:
+            total += self.rollups.nbytes
+        return total
+
+    def _encode(self, entry):
+        raise NotImplementedError
+
+    def _decode(self, i):
+        raise NotImplementedError
+
+
+class NumericHistory(ColumnLog):
+    """One int64 value per entry; behaves like the old list of ints."""
+
+    columns = (("value", np.int64),)
+
+    def _encode(self, value):
+        return (value,)
+
+    def _decode(self, i):
+        return int(self._value("value", i))
+
+
+class DiscoveryLog(ColumnLog):
+    """
+    Discovery events as (time, anchor ID, tier) columns. Entries read back as
+    {"time", "anchor", "tier"} dicts; a missing tier is stored as -1 and any
+    other keys are kept aside per entry.
+    """
+
+    columns = (("time", np.int64), ("anchor", np.int32), ("tier", np.int16))
+
+    def __init__(self, entries=(), intern=None):
+        self._extras = {}  # Keyed by absolute position
+        super().__init__(entries, intern)
+
+    def _encode(self, entry):
+        extras = {k: v for k, v in entry.items() if k not in ("time", "anchor", "tier")}
+        if extras:
+            self._extras[self.position] = extras
+        return entry["time"], self.intern.intern(entry["anchor"]), entry.get("tier", -1)
+
+    def extras_since(self, start):
+        """Extra (non-column) keys of entries from absolute position `start` on."""
+        return {i: extras for i, extras in self._extras.items() if i >= start}
+
+    def restore_extras(self, extras):
+        self._check_writable()
+        self._extras.update(extras)
+
+    def frozen(self):
+        log = super().frozen()
+        log._extras = dict(self._extras)
+        return log
+
+    def drop(self, n):
+        super().drop(n)
+        if self._extras:
+            self._extras = self.extras_since(self.dropped)
+
+    def _decode(self, i):
+        entry = {"time": int(self._value("time", i)), "anchor": self.intern.names[self._value("anchor", i)]}
+        tier = int(self._value("tier", i))
+        if tier >= 0:
+            entry["tier"] = tier
+        entry.update(self._extras.get(self.dropped + i, {}))
+        return entry
+
+
+class CycleLog(ColumnLog):
+    """Detected symbolic cycles as (anchor ID, anchor ID, time) columns."""
+
+    columns = (("first", np.int32), ("second", np.int32), ("time", np.int64))
+
+    def _encode(self, entry):
+        a, b = entry["pair"]
+        return self.intern.intern(a), self.intern.intern(b), entry["cycle_detected_at"]
+
+    def _decode(self, i):
+        names = self.intern.names
+        return {
+            "pair": (names[self._value("first", i)], names[self._value("second", i)]),
+            "cycle_detected_at": int(self._value("time", i))
+        }
+
+
+class SymbolChain(ColumnLog):
+    """Symbol chain links (death signatures are (a, a)) as two anchor ID columns."""
+
+    columns = (("source", np.int32), ("target", np.int32))
+
+    def _encode(self, link):
+        a, b = link
+        return self.intern.intern(a), self.intern.intern(b)
+
+    def _decode(self, i):
+        names = self.intern.names
+        return names[self._value("source", i)], names[self._value("target", i)]
+
+
+class RollupLog(ColumnLog):
+    """
+    Downsampled summaries of dropped history: one (start, count, min, max,
+    mean) row per bucket, where `start` is the bucket's first absolute position.
+    """
+
+    columns = (("start", np.int64), ("count", np.int64), ("min", float), ("max", float), ("mean", float))
+
+    def _encode(self, entry):
+        return entry["start"], entry["count"], entry["min"], entry["max"], entry["mean"]
+
+    def _decode(self, i):
+        return {
+            "start": int(self._value("start", i)),
+            "count": int(self._value("count", i)),
+            "min": float(self._value("min", i)),
+            "max": float(self._value("max", i)),
+            "mean": float(self._value("mean", i)),
+        }
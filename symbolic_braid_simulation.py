@@ -1,67 +1,271 @@
-import random
+import os
 import pickle
-import numpy as np
+
+from batch_anchor_engine import BLOCK_STEPS, DrawStream, engine_for
+from symbolic_arrays import (
+    AnchorIntern,
+    CycleLog,
+    DiscoveryLog,
+    NumericHistory,
+    ResilienceTable,
+    SymbolChain,
+    SymbolPairCounter,
+)
 
 
 class SymbolicState:
+    """
+    The braid's full symbolic memory, held compactly.
+
+    Anchor names are interned once (`anchor_ids`) and every structure refers
+    to them by small integer ID: per-anchor values live in dense arrays
+    (`anchors`), pair counts in an ID-indexed matrix, and the histories in
+    struct-of-arrays logs. The familiar attributes still read as sets, dicts
+    and lists of dicts, and `to_dict`/`from_dict` keep the plain layout.
+
+    Memory footprint, for capacity planning (arrays grow by doubling, so
+    allow up to 2x for spare capacity):
+
+        per step          8 B   symbolic_memory_depth
+        per discovery    14 B   discovery_log (time, anchor, tier)
+        per death         8 B   symbol_chain (two anchor IDs)
+        per cycle        16 B   symbolic_cycles, at most N*(N-1)/2 in total
+        per anchor       19 B   resilience, curvature and flags
+                       + 8N B   pair counter row (N = interned anchors)
+
+    The shipped braid_state.pkl history averages ~5 discoveries and ~5
+    deaths per step, i.e. roughly 120 B per simulated step. `nbytes()`
+    reports the live figure.
+
+    `retention` (a history_retention.Retention, or None to keep everything)
+    bounds the history logs; simulate_step enforces it after every block.
+
+    All simulation randomness comes from the state's own DrawStream (`rng`),
+    so a braid seeded with `seed` replays bit for bit, including across
+    save/load, and nothing else in the process can disturb it.
+
+    `revision` counts writes: simulate_step, each mutation a StateActor
+    applies and each StateOverlay commit bump it, and snapshots carry it,
+    so an overlay can tell whether its base moved on before it commits.
+    """
+
     signature = "braid_aa5c1fc06e"  # Self-referential identity
 
-    def __init__(self):
+    __slots__ = (
+        "time",
+        "anchor_ids",
+        "anchors",
+        "symbol_pair_counter",
+        "symbolic_cycles",
+        "discovery_log",
+        "symbolic_memory_depth",
+        "synthetic_anchors",
+        "symbol_chain",
+        "reflection_drift",
+        "rng",
+        "retention",
+        "revision",
+    )
+
+    def __init__(self, seed=None, retention=None):
+        self.rng = DrawStream(seed)
+        self.retention = retention
+        self.revision = 0
         self.time = 0
-        self.discovered_anchors = set()
-        self.symbolic_resilience = {}
-        self.symbol_pair_counter = {}
-        self.symbolic_cycles = []
-        self.discovery_log = []
-        self.symbolic_memory_depth = []
-        self.symbolic_phase_curvature = {}
+        self.anchor_ids = AnchorIntern()
+        self.anchors = ResilienceTable(self.anchor_ids)
+        self.symbol_pair_counter = SymbolPairCounter(self.anchor_ids)
+        self.symbolic_cycles = CycleLog(intern=self.anchor_ids)
+        self.discovery_log = DiscoveryLog(intern=self.anchor_ids)
+        self.symbolic_memory_depth = NumericHistory()
         self.synthetic_anchors = {}
-        self.symbol_chain = []
+        self.symbol_chain = SymbolChain(intern=self.anchor_ids)
         self.reflection_drift = 0
+        if retention is not None:
+            retention.validate(self)
+
+    # Dict- and set-shaped views over the dense per-anchor arrays
+    @property
+    def discovered_anchors(self):
+        return self.anchors.discovered_view
+
+    @discovered_anchors.setter
+    def discovered_anchors(self, names):
+        self.anchors.discovered_view.replace(names)
+
+    @property
+    def symbolic_resilience(self):
+        return self.anchors.resilience_view
+
+    @symbolic_resilience.setter
+    def symbolic_resilience(self, values):
+        self.anchors.resilience_view.replace(values)
+
+    @property
+    def symbolic_phase_curvature(self):
+        return self.anchors.curvature_view
+
+    @symbolic_phase_curvature.setter
+    def symbolic_phase_curvature(self, values):
+        self.anchors.curvature_view.replace(values)
+
+    def reseed(self, seed):
+        """Restart the simulation's random stream from `seed`."""
+        self.rng = DrawStream(seed)
+
+    def snapshot(self, version=0):
+        """An immutable StateSnapshot of the state as it is now."""
+        return StateSnapshot(self, version)
+
+    def nbytes(self):
+        """Bytes held by the state's arrays, including spare capacity."""
+        table = self.anchors
+        return (
+            table.resilience.nbytes + table.curvature.nbytes + table.alive.nbytes
+            + table.curved.nbytes + table.discovered.nbytes
+            + self.symbol_pair_counter.counts.nbytes
+            + self.symbolic_cycles.nbytes + self.discovery_log.nbytes
+            + self.symbolic_memory_depth.nbytes + self.symbol_chain.nbytes
+        )
 
     def to_dict(self):
         return {
             "time": self.time,
             "discovered_anchors": list(self.discovered_anchors),
-            "symbolic_resilience": self.symbolic_resilience,
-            "symbol_pair_counter": self.symbol_pair_counter,
-            "symbolic_cycles": self.symbolic_cycles,
-            "discovery_log": self.discovery_log,
-            "symbolic_memory_depth": self.symbolic_memory_depth,
-            "symbolic_phase_curvature": self.symbolic_phase_curvature,
+            "symbolic_resilience": self.symbolic_resilience.copy(),
+            "symbol_pair_counter": dict(self.symbol_pair_counter),
+            "symbolic_cycles": list(self.symbolic_cycles),
+            "discovery_log": list(self.discovery_log),
+            "symbolic_memory_depth": list(self.symbolic_memory_depth),
+            "symbolic_phase_curvature": self.symbolic_phase_curvature.copy(),
             "synthetic_anchors": self.synthetic_anchors,
-            "symbol_chain": self.symbol_chain,
-            "reflection_drift": self.reflection_drift
+            "symbol_chain": list(self.symbol_chain),
+            "reflection_drift": self.reflection_drift,
+            "random_state": self.rng.get_state()
         }
 
     @staticmethod
     def from_dict(data):
         state = SymbolicState()
+        if "random_state" in data:
+            state.rng.set_state(data["random_state"])
         state.time = data.get("time", 0)
-        state.discovered_anchors = set(data.get("discovered_anchors", []))
+        state.discovered_anchors = data.get("discovered_anchors", [])
         state.symbolic_resilience = data.get("symbolic_resilience", {})
-        state.symbol_pair_counter = data.get("symbol_pair_counter", {})
-        state.symbolic_cycles = data.get("symbolic_cycles", [])
-        state.discovery_log = data.get("discovery_log", [])
-        state.symbolic_memory_depth = data.get("symbolic_memory_depth", [])
+        state.symbol_pair_counter.update(data.get("symbol_pair_counter", {}))
+        state.symbolic_cycles.extend(data.get("symbolic_cycles", []))
+        state.discovery_log.extend(data.get("discovery_log", []))
+        state.symbolic_memory_depth.extend(data.get("symbolic_memory_depth", []))
         state.symbolic_phase_curvature = data.get("symbolic_phase_curvature", {})
         state.synthetic_anchors = data.get("synthetic_anchors", {})
-        state.symbol_chain = data.get("symbol_chain", [])
+        state.symbol_chain.extend(data.get("symbol_chain", []))
         state.reflection_drift = data.get("reflection_drift", 0)
         return state
 
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, attrs):
+        if isinstance(attrs, tuple):
+            attrs = attrs[1]
+        if isinstance(attrs.get("discovery_log"), DiscoveryLog):
+            for name, value in attrs.items():
+                setattr(self, name, value)
+            if "rng" not in attrs:
+                self.rng = DrawStream()
+            if "retention" not in attrs:
+                self.retention = None
+            if "revision" not in attrs:
+                self.revision = 0
+            return
+        # Pickled from an older, list-based SymbolicState
+        if "anchors" in attrs:
+            table = attrs["anchors"]
+            attrs = dict(
+                attrs,
+                discovered_anchors=list(table.discovered_view),
+                symbolic_resilience=table.resilience_view.copy(),
+                symbolic_phase_curvature=table.curvature_view.copy(),
+            )
+        restored = SymbolicState.from_dict(attrs)
+        for name in self.__slots__:
+            setattr(self, name, getattr(restored, name))
+
+
+class StateSnapshot(SymbolicState):
+    """
+    Immutable, versioned copy of a SymbolicState for concurrent readers.
+
+    Taking one costs O(anchors^2) for the per-anchor arrays and the pair
+    matrix (all small) and O(1) per history log: logs are frozen views that
+    share storage with the live state, which only ever appends past them.
+    Every array is read-only and the logs refuse writes; speculate on a
+    snapshot through a StateOverlay, which copies what it writes.
+    """
+
+    __slots__ = ("version",)
+
+    def __init__(self, state, version=0):
+        self.version = version
+        self.time = state.time
+        self.anchor_ids = AnchorIntern(state.anchor_ids.names)
+        self.anchors = state.anchors.copy(self.anchor_ids, writeable=False)
+        self.symbol_pair_counter = state.symbol_pair_counter.frozen(self.anchor_ids)
+        self.symbolic_cycles = state.symbolic_cycles.frozen()
+        self.discovery_log = state.discovery_log.frozen()
+        self.symbolic_memory_depth = state.symbolic_memory_depth.frozen()
+        self.symbol_chain = state.symbol_chain.frozen()
+        for log in (self.symbolic_cycles, self.discovery_log, self.symbol_chain):
+            log.intern = self.anchor_ids
+        self.synthetic_anchors = dict(state.synthetic_anchors)
+        self.reflection_drift = state.reflection_drift
+        self.rng = state.rng.fork()
+        self.retention = state.retention  # Recorded when the snapshot is saved; never enforced on it
+        self.revision = state.revision
+
+    def __reduce__(self):
+        raise TypeError("StateSnapshot is a read-only view; pickle the live state (or its to_dict())")
+
+
+STATE_PATH = "braid_state.snap"
+
+
+def migration_source(path):
+    """
+    The file to load the state at `path` from: `path` itself, or when it
+    doesn't exist yet the legacy pickle next to it (same name, .pkl), such
+    as the shipped braid_state.pkl. Saves always go to `path`, so the pickle
+    is only ever read. None if there is neither.
+    """
+    if os.path.exists(path):
+        return path
+    legacy = os.path.splitext(path)[0] + ".pkl"
+    if legacy != path and os.path.exists(legacy):
+        return legacy
+    return None
+
 
 def save_state(state, path):
-    with open(path, "wb") as f:
-        pickle.dump(state.to_dict(), f)
+    from braid_snapshot import save_snapshot
+    save_snapshot(state, path)
     print(f"[💾] State saved to {path}")
 
 
-def load_state(path):
-    with open(path, "rb") as f:
-        data = pickle.load(f)
+def load_state(path, mmap=True):
+    """
+    Load a state saved in either format: a columnar snapshot (histories
+    memory-mapped unless `mmap=False`) or a legacy pickle of a dict or a
+    SymbolicState.
+    """
+    from braid_snapshot import is_snapshot, load_snapshot
+    if is_snapshot(path):
+        state = load_snapshot(path, mmap=mmap)
+    else:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        state = SymbolicState.from_dict(data) if isinstance(data, dict) else data
     print(f"[📂] State loaded from {path}")
-    return SymbolicState.from_dict(data)
+    return state
 
 
 def simulate_step(
@@ -71,67 +275,71 @@ def simulate_step(
     steps=100,
     threshold=10,
     decay_rate=3,
-    decay_threshold=20
+    decay_threshold=20,
+    vectorized=True,
+    verify=False
 ):
-    for _ in range(steps):
-        successful = 0
-        recent_hits = set()
-
-        for _ in range(10):
-            anchor = random.choice(list(truth_anchors_scaffold.keys()))
-            fn = truth_anchors_scaffold[anchor]
-            tier = anchor_tiers.get(anchor, 8)
-
-            a, b, c = np.random.uniform(-5, 5, 3)
-            x, y = np.random.uniform(-5, 5, 2)
-            p, q = bool(random.getrandbits(1)), bool(random.getrandbits(1))
-
-            try:
-                args = fn.__code__.co_argcount
-                result = fn(*[a, b, c, x, y, p, q][:args])
-            except Exception:
-                result = False
-
-            if result:
-                recent_hits.add(anchor)
-                state.symbolic_resilience[anchor] = state.symbolic_resilience.get(anchor, 0) + 1
-                state.symbolic_phase_curvature[anchor] = max(0, state.symbolic_phase_curvature.get(anchor, 0) - 0.5)
-
-                if anchor not in state.discovered_anchors:
-                    state.discovered_anchors.add(anchor)
-                    state.discovery_log.append({
-                        "time": state.time,
-                        "anchor": anchor,
-                        "tier": tier
-                    })
-
-                for other in state.discovered_anchors:
-                    if other != anchor:
-                        pair = tuple(sorted((anchor, other)))
-                        state.symbol_pair_counter[pair] = state.symbol_pair_counter.get(pair, 0) + 1
-                        if state.symbol_pair_counter[pair] == threshold:
-                            state.symbolic_cycles.append({
-                                "pair": pair,
-                                "cycle_detected_at": state.time
-                            })
-
-        for anchor in list(state.symbolic_resilience.keys()):
-            if anchor not in recent_hits:
-                state.symbolic_resilience[anchor] -= decay_rate
-                if state.symbolic_resilience[anchor] < decay_threshold:
-                    state.discovered_anchors.discard(anchor)
-                    del state.symbolic_resilience[anchor]
-                    state.symbol_chain.append((anchor, anchor))  # symbolic death signature
-
-        if successful > 0:
-            prev_depth = state.symbolic_memory_depth[-1] if state.symbolic_memory_depth else 0
-            depth = prev_depth + successful
+    """
+    Advance the braid by `steps` steps of DRAWS_PER_STEP anchor evaluations each.
+
+    Draws are taken in blocks of BLOCK_STEPS and evaluated by the batch engine;
+    `vectorized=False` evaluates each draw with its scalar lambda instead, and
+    `verify=True` cross-checks every vectorized block against the scalar path.
+    """
+    engine = engine_for(truth_anchors_scaffold)
+    state.revision += 1
+    for start in range(0, steps, BLOCK_STEPS):
+        draws = state.rng.take(min(BLOCK_STEPS, steps - start))
+        block = engine.block(draws)
+        if vectorized:
+            hits = engine.evaluate(block, verify=verify)
         else:
-            decay = random.randint(0, 2)
-            prev_depth = state.symbolic_memory_depth[-1] if state.symbolic_memory_depth else 0
-            depth = max(0, prev_depth - decay)
+            hits = engine.evaluate_scalar(block)
 
-        state.symbolic_memory_depth.append(depth)
-        state.time += 1
+        for chosen, hit, depth_decay in zip(block[0], hits, draws["depth_decay"]):
+            _advance(
+                state,
+                [engine.names[k] for k in chosen[hit]],
+                anchor_tiers,
+                threshold,
+                decay_rate,
+                decay_threshold,
+                int(depth_decay)
+            )
+        if state.retention is not None:
+            state.retention.enforce(state)
 
     return state
+
+
+def _advance(state, hit_anchors, anchor_tiers, threshold, decay_rate, decay_threshold, depth_decay):
+    """Apply one step's successful anchor evaluations, in draw order, then decay."""
+    successful = 0
+    ids = state.anchor_ids
+    table = state.anchors
+    hit_ids = [ids.intern(a) for a in hit_anchors]
+    table.reserve(len(ids))
+
+    if hit_ids:
+        discovered = table.discovered.copy()
+        for anchor_id in table.hit(hit_ids):
+            state.discovery_log.record(state.time, anchor_id, anchor_tiers.get(ids.names[anchor_id], 8))
+
+        for i, j in state.symbol_pair_counter.record_hits(hit_ids, discovered, threshold):
+            if ids.names[j] < ids.names[i]:
+                i, j = j, i
+            state.symbolic_cycles.record(i, j, state.time)
+
+    dead = table.decay(hit_ids, decay_rate, decay_threshold)
+    state.symbol_chain.record_many(dead, dead)  # symbolic death signatures
+
+    if successful > 0:
+        prev_depth = state.symbolic_memory_depth[-1] if state.symbolic_memory_depth else 0
+        depth = prev_depth + successful
+    else:
+        decay = depth_decay
+        prev_depth = state.symbolic_memory_depth[-1] if state.symbolic_memory_depth else 0
+        depth = max(0, prev_depth - decay)
+
+    state.symbolic_memory_depth.append(depth)
+    state.time += 1
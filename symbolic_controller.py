@@ -1,11 +1,15 @@
 # symbolic_controller.py
 
 import hashlib
-import random
 import time
 
+import numpy as np
+
+from generative_ops import DRIVE_FUSION, ContentIndex, fuse_batch
+
 class SymbolicController:
-    def __init__(self):
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)  # Local stream for drive fusions
         self.last_drift = None
         self.curiosity_threshold = 0.9          # Below this: curiosity triggered
         self.divergence_trigger = 0.98          # Above this: symbolic forking triggered
@@ -44,25 +48,19 @@ class SymbolicController:
 
     def generate_drive_signal(self, compiled_anchors, mirror_log):
         """Produces symbolic fusion if drift is detected but diversity is low"""
-        if self.evaluate_drift(compiled_anchors) and len(compiled_anchors) > 1:
-            a1, a2 = random.sample(compiled_anchors, 2)
+        signals = self.generate_drive_signals(compiled_anchors, mirror_log, 1, index=ContentIndex())
+        return signals[0].materialized() if signals else None
 
-            fused_name = f"{a1['name']}_{a2['name']}_drivefusion"
-            fused_expr = f"({a1['expression']}) <drive> ({a2['expression']})"
-            fused_id = hashlib.md5((fused_name + fused_expr).encode()).hexdigest()[:12]
-
-            seed = int(hashlib.sha256(fused_expr.encode()).hexdigest(), 16)
-            random.seed(seed)
-            fused_fp = [random.randint(10, 255) for _ in range(4)]
-
-            return {
-                "id": fused_id,
-                "name": fused_name,
-                "expression": fused_expr,
-                "tier": max(a1["tier"], a2["tier"]) + 1,
-                "quantized_fingerprint": fused_fp
-            }
-        return None
+    def generate_drive_signals(self, compiled_anchors, mirror_log, n, index=None):
+        """
+        Up to `n` drive fusions at once when drift calls for them. Pass a
+        ContentIndex of the known anchors to drop fusions that already exist
+        (by default, those in `compiled_anchors`).
+        """
+        if self.evaluate_drift(compiled_anchors) and len(compiled_anchors) > 1:
+            index = index if index is not None else ContentIndex(compiled_anchors)
+            return fuse_batch(compiled_anchors, n, self.rng, DRIVE_FUSION, index)
+        return []
 
     def annotate_mirror(self, mirror_log, drift):
         """Attach recursive metadata to mirror log entry"""
@@ -1,103 +1,374 @@
 # symbolic_filter_wrapper.py
 
 import os
-import pickle
+import json
+import asyncio
 import argparse
+import atexit
+import threading
+from contextlib import asynccontextmanager
 import numpy as np
 from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import uvicorn
 
 from truth_anchors import truth_anchors_scaffold
-from symbolic_braid_simulation import SymbolicState, simulate_step
+from batch_anchor_engine import DrawStream
+from symbolic_braid_simulation import STATE_PATH, SymbolicState, migration_source, simulate_step, load_state
+from braid_snapshot import save_snapshot
+from background_persister import BackgroundPersister
+from state_journal import StateJournal
+from state_overlay import StateOverlay
+from history_retention import Retention
+from request_coalescer import RequestCoalescer
+from state_actor import StateActor
+from braid_pool import BraidPool
 
 
 class SymbolicFilter:
-    def __init__(self, state_path="braid_state.pkl"):
+    def __init__(self, state_path=STATE_PATH, journal=False, fsync_every=1, fsync_interval=None,
+                 compact_every=1000, retention=None, flush_interval=1.0, flush_every=100):
+        """
+        With `journal=True`, each mutation appends a compact delta record to a
+        write-ahead journal next to `state_path` instead of re-pickling the
+        whole state; a background compactor folds it back into the snapshot.
+
+        `retention` (a history_retention.Retention) bounds the state's history
+        logs; when omitted, whatever policy the saved state carries is kept.
+
+        The state is owned by a single writer thread (a StateActor): every
+        mutation goes through it in order, one save per write batch, and
+        readers work from the immutable snapshot it publishes after each
+        batch, so reads never wait on writes.
+
+        Without a journal, saving is debounced off the request path: each
+        published snapshot just marks the state dirty, and a background
+        BackgroundPersister writes the newest one atomically once
+        `flush_interval` seconds have passed or `flush_every` changes are
+        pending. `close()` forces a final flush; it also runs at interpreter
+        exit for filters that were never closed.
+        """
         self.state_path = state_path
-        self.state = self._load_or_initialize_state()
+        self._lock = threading.RLock()
+        self.journal = None
+        if journal:
+            self.journal = StateJournal(
+                state_path,
+                lock=self._lock,
+                fsync_every=fsync_every,
+                fsync_interval=fsync_interval,
+                compact_every=compact_every
+            )
+            state = self.journal.recover()
+            print("[SymbolicFilter] Recovered symbolic state from snapshot + journal.")
+        else:
+            state = self._load_or_initialize_state()
+        if retention is not None:
+            retention.validate(state)
+            state.retention = retention
+            retention.enforce(state)
+        self.persister = None
+        if self.journal:
+            self.actor = StateActor(state, persist=self._save_state, lock=self._lock, name="SymbolicFilterWriter")
+        else:
+            self.persister = BackgroundPersister(
+                self._save_state,
+                interval=flush_interval,
+                every=flush_every,
+                name="SymbolicFilterPersister"
+            )
+            self.actor = StateActor(state, lock=self._lock, name="SymbolicFilterWriter",
+                                    on_publish=self.persister.mark_dirty)
+        # Validation speculates on its own draws, so a rejected prompt doesn't doom the next one
+        self._validations = 0
+        self._validation_lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+
+    @property
+    def state(self):
+        """The live state. It belongs to the writer thread; read `snapshot()` from anywhere else."""
+        return self.actor.state
+
+    def snapshot(self):
+        """The latest immutable StateSnapshot; never blocks."""
+        return self.actor.snapshot()
+
+    def mutate(self, mutation):
+        """Apply `mutation(state)` on the writer thread, mark it for saving, and return its result."""
+        return self.actor.mutate(mutation)
 
     def _load_or_initialize_state(self):
-        if os.path.exists(self.state_path):
-            with open(self.state_path, 'rb') as f:
+        source = migration_source(self.state_path)
+        if source is not None:
+            if source != self.state_path:
+                print(f"[SymbolicFilter] Migrating legacy state from {source}; it will be saved to {self.state_path}.")
+            else:
                 print("[SymbolicFilter] Loaded existing symbolic state.")
-                return pickle.load(f)
+            return load_state(source)
         print("[SymbolicFilter] Created new symbolic state.")
         return SymbolicState()
 
-    def _save_state(self):
-        with open(self.state_path, 'wb') as f:
-            pickle.dump(self.state, f)
+    def _save_state(self, state):
+        """Journal the live state's changes (writer thread), or save a published snapshot (persister thread)."""
+        if self.journal:
+            self.journal.append(state)
+            return
+        save_snapshot(state, self.state_path)
 
-    def simulate_symbolic_response(self, prompt: str):
+    def speculate(self):
+        """
+        Open a copy-on-write overlay over the current snapshot for what-if runs.
+        Pass it to `commit` to keep its changes; otherwise just drop it.
+        """
+        return StateOverlay(self.snapshot())
+
+    def commit(self, overlay):
+        """Fold a speculative overlay into the live state and persist it."""
+        def apply(state):
+            if overlay.base is not state:
+                overlay.rebase(state)  # Commit refuses unless the live state is still at the snapshot's revision
+            overlay.commit()
+        self.actor.mutate(apply)
+
+    def simulate_symbolic_response(self, prompt: str, snapshot=None):
         """
         Simulates the symbolic output of a prompt to evaluate its impact on anchor growth.
-        This creates a temporary state for evaluation purposes without modifying the actual state.
+        This runs on a copy-on-write overlay of a snapshot, so the actual state is not modified.
+        Each call draws from a fresh stream (the state's seed plus a validation count)
+        rather than replaying the live state's next draws, which a rejection would never move past.
         """
-        import copy
-        simulated_state = copy.deepcopy(self.state)
+        snapshot = snapshot or self.snapshot()
+        with self._validation_lock:
+            count = self._validations
+            self._validations += 1
+        simulated_state = StateOverlay(snapshot)
+        seed = snapshot.rng.seed
+        simulated_state.rng = DrawStream(None if seed is None else [seed, count])
         simulate_step(simulated_state, truth_anchors_scaffold, {"user_prompt": prompt}, steps=1)
         return simulated_state
 
     def validate_prompt(self, prompt):
         """Validate if the generated prompt introduces novelty."""
-        if not prompt:
-            return False
+        return self.validate_prompts([prompt])[0]
+
+    def validate_prompts(self, prompts):
+        """
+        Validate a batch of prompts. The speculative step's draws don't
+        depend on what the prompt says, so one overlay step answers every
+        prompt in the batch.
+        """
+        results = [False] * len(prompts)
+        pending = [i for i, prompt in enumerate(prompts) if prompt]
+        if not pending:
+            return results
 
+        snapshot = self.snapshot()
         try:
-            original_depth = len(self.state.get("discovered_anchors", {}))
+            original_depth = len(snapshot.discovered_anchors)
         except Exception as e:
             print(f"⚠️ Error accessing discovered_anchors: {e}")
-            return False
+            return results
 
-        simulated = self.simulate_symbolic_response(prompt)
-        new_depth = len(simulated.get("discovered_anchors", {}))
+        simulated = self.simulate_symbolic_response(prompts[pending[0]], snapshot)
+        new_depth = len(simulated.discovered_anchors)
 
         delta = new_depth - original_depth
-        print(f"📈 Prompt validation: symbolic delta = {delta}")
-        return delta > 0
+        if len(pending) == 1:
+            print(f"📈 Prompt validation: symbolic delta = {delta}")
+        else:
+            print(f"📈 Prompt validation: symbolic delta = {delta} ({len(pending)} prompts)")
+        for i in pending:
+            results[i] = delta > 0
+        return results
 
     def score_output(self, output: str) -> float:
         """Runs a simulation step, then returns average symbolic resilience as a score."""
-        simulate_step(self.state, truth_anchors_scaffold, {}, steps=1)
-        self._save_state()
-        resilience = list(self.state.symbolic_resilience.values())
-        if resilience:
-            return float(np.mean(resilience))
-        return 0.0
+        return self.score_outputs([output])[0]
+
+    def score_outputs(self, outputs):
+        """Score a batch of outputs: one simulation step each, in order; saving happens in the background."""
+        if not outputs:
+            return []
+
+        def step_and_score(state):
+            scores = []
+            for _ in outputs:
+                simulate_step(state, truth_anchors_scaffold, {}, steps=1)
+                resilience = list(state.symbolic_resilience.values())
+                scores.append(float(np.mean(resilience)) if resilience else 0.0)
+            return scores
+        return self.actor.mutate(step_and_score)
 
     def reset(self):
-        self.state = SymbolicState()
-        self._save_state()
+        def replace(old):
+            state = SymbolicState(retention=old.retention)
+            state.revision = old.revision  # Overlays opened before the reset must not commit into it
+            self.actor.state = state
+            if self.journal:
+                self.journal.reset(state)
+        self.actor.mutate(replace, persist=not self.journal)
         print("[SymbolicFilter] Symbolic state has been reset.")
 
+    def stats(self):
+        return {
+            "version": self.actor.version,
+            "write_batches": self.actor.batches,
+            "mutations": self.actor.mutations,
+            "write_queue_depth": self.actor.queue_depth(),
+            "persist_failures": self.actor.persist_failures,
+        }
+
+    def persistence_stats(self):
+        """Flush latency and lag of the background persister (None in journal mode)."""
+        return self.persister.stats() if self.persister else None
+
+    def close(self):
+        """Drain pending writes, then flush the last snapshot or fold the journal into it."""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self.actor.close()
+        if self.persister:
+            self.persister.close()
+        if self.journal:
+            self.journal.close()
+
 
 # ---------- API MODE ----------
-app = FastAPI()
-symbolic_filter = SymbolicFilter()
+# One process hosts many braids, picked by `braid_id` in each request (none
+# means the default braid in braid_state.snap). Cold braids are evicted to
+# disk, least recently used first, to stay within BRAID_BUDGET_MB.
+retention = Retention.from_spec(os.getenv("BRAID_RETENTION")) if os.getenv("BRAID_RETENTION") else None
+if retention is not None:
+    retention.validate(SymbolicState())  # Fail at startup, not on the first request
+pool = BraidPool(
+    SymbolicFilter,
+    state_dir=os.getenv("BRAID_STATE_DIR", "braids"),
+    budget_mb=float(os.getenv("BRAID_BUDGET_MB", "512")),
+    journal=os.getenv("BRAID_JOURNAL", "0") == "1",
+    fsync_every=int(os.getenv("BRAID_FSYNC_EVERY", "1")),
+    retention=retention,
+    flush_interval=float(os.getenv("BRAID_FLUSH_INTERVAL", "1.0")),
+    flush_every=int(os.getenv("BRAID_FLUSH_EVERY", "100"))
+)
+
+# Concurrent /score and /validate requests are coalesced into batches: one
+# simulation pass per braid per batch instead of one per request.
+MAX_BATCH = int(os.getenv("BRAID_MAX_BATCH", "32"))
+MAX_WAIT = float(os.getenv("BRAID_MAX_WAIT_MS", "5")) / 1000
+score_coalescer = RequestCoalescer(pool.score_outputs, MAX_BATCH, MAX_WAIT, name="score")
+validate_coalescer = RequestCoalescer(pool.validate_prompts, MAX_BATCH, MAX_WAIT, name="validate")
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await score_coalescer.close()
+    await validate_coalescer.close()
+    pool.close()
+
+app = FastAPI(lifespan=lifespan)
 
 class InputPayload(BaseModel):
     prompt: Optional[str] = None
     output: Optional[str] = None
+    braid_id: Optional[str] = None
+
+def _braid_error(braid_id):
+    try:
+        pool.path_for(braid_id)
+    except ValueError:
+        return {"error": "Invalid braid_id"}
+    return None
 
 @app.post("/validate")
-def validate(input: InputPayload):
+async def validate(input: InputPayload):
     if not input.prompt:
         return {"error": "Missing prompt"}
-    result = symbolic_filter.validate_prompt(input.prompt)
+    error = _braid_error(input.braid_id)
+    if error:
+        return error
+    result = await validate_coalescer.submit((input.braid_id, input.prompt))
     return {"valid": result}
 
 @app.post("/score")
-def score(input: InputPayload):
+async def score(input: InputPayload):
     if not input.output:
         return {"error": "Missing output"}
-    score = symbolic_filter.score_output(input.output)
+    error = _braid_error(input.braid_id)
+    if error:
+        return error
+    score = await score_coalescer.submit((input.braid_id, input.output))
     return {"score": score}
 
+async def _read_ndjson(request: Request, field):
+    """(braid_id, value of `field`) per NDJSON line of the body; None marks a bad line."""
+    items = []
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        items.extend(_ndjson_item(line, field) for line in lines if line.strip())
+    if buffer.strip():
+        items.append(_ndjson_item(buffer, field))
+    return items
+
+def _ndjson_item(line, field):
+    try:
+        record = json.loads(line)
+        value, braid_id = record.get(field), record.get("braid_id")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(value, str) or not value or not (braid_id is None or isinstance(braid_id, str)):
+        return None
+    return None if _braid_error(braid_id) else (braid_id, value)
+
+def _ndjson_response(results):
+    return StreamingResponse(
+        (json.dumps(result) + "\n" for result in results),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/score_batch")
+async def score_batch(request: Request):
+    """NDJSON in ({"output": ..., "braid_id": ...} per line), NDJSON out ({"score": ...} per line, same order)."""
+    items = await _read_ndjson(request, "output")
+    valid = [item for item in items if item is not None]
+    scores = iter(await asyncio.get_running_loop().run_in_executor(None, pool.score_outputs, valid))
+    return _ndjson_response({"score": next(scores)} if item is not None else {"error": "Missing output or invalid braid_id"}
+                            for item in items)
+
+@app.post("/validate_batch")
+async def validate_batch(request: Request):
+    """NDJSON in ({"prompt": ..., "braid_id": ...} per line), NDJSON out ({"valid": ...} per line, same order)."""
+    items = await _read_ndjson(request, "prompt")
+    valid = [item for item in items if item is not None]
+    results = iter(await asyncio.get_running_loop().run_in_executor(None, pool.validate_prompts, valid))
+    return _ndjson_response({"valid": next(results)} if item is not None else {"error": "Missing prompt or invalid braid_id"}
+                            for item in items)
+
+@app.get("/stats")
+def stats(braid_id: Optional[str] = None):
+    result = {
+        "score": score_coalescer.stats(),
+        "validate": validate_coalescer.stats(),
+        "pool": pool.stats(),
+    }
+    braid_filter = pool.resident(braid_id)
+    if braid_filter is not None:
+        result["writer"] = braid_filter.stats()
+        result["persistence"] = braid_filter.persistence_stats()
+    return result
+
 @app.post("/reset")
-def reset():
-    symbolic_filter.reset()
+def reset(braid_id: Optional[str] = None):
+    error = _braid_error(braid_id)
+    if error:
+        return error
+    pool.reset(braid_id)
     return {"status": "reset complete"}
 
 
@@ -105,8 +376,28 @@ def reset():
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--serve", action="store_true", help="Run as REST API service")
+    parser.add_argument("--journal", action="store_true", help="Persist through a write-ahead journal")
+    parser.add_argument("--fsync-every", type=int, default=1, help="Journal records per fsync (0 = leave to OS)")
+    parser.add_argument("--state-dir", type=str, default="braids", help="Where braids other than the default are stored")
+    parser.add_argument("--budget-mb", type=float, default=512, help="Memory budget for resident braids before LRU eviction")
+    parser.add_argument("--flush-interval", type=float, default=1.0, help="Seconds a change may wait before it is saved")
+    parser.add_argument("--flush-every", type=int, default=100, help="Save as soon as this many changes are pending (0 = interval only)")
+    parser.add_argument("--max-batch", type=int, default=32, help="Most /score or /validate requests coalesced per batch")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="How long a batch waits for more requests")
+    parser.add_argument("--retention", type=str, default="",
+                        help="History retention, e.g. 'discovery_log=ring:100000,symbolic_memory_depth=rollup:1000:50000'")
     args = parser.parse_args()
 
     if args.serve:
+        # uvicorn re-imports this module, so hand the settings over via the environment
+        os.environ["BRAID_JOURNAL"] = "1" if args.journal else "0"
+        os.environ["BRAID_FSYNC_EVERY"] = str(args.fsync_every)
+        os.environ["BRAID_RETENTION"] = args.retention
+        os.environ["BRAID_STATE_DIR"] = args.state_dir
+        os.environ["BRAID_BUDGET_MB"] = str(args.budget_mb)
+        os.environ["BRAID_FLUSH_INTERVAL"] = str(args.flush_interval)
+        os.environ["BRAID_FLUSH_EVERY"] = str(args.flush_every)
+        os.environ["BRAID_MAX_BATCH"] = str(args.max_batch)
+        os.environ["BRAID_MAX_WAIT_MS"] = str(args.max_wait_ms)
         print("[SymbolicFilter] Starting REST API server on http://localhost:8000")
         uvicorn.run("symbolic_filter_wrapper:app", host="0.0.0.0", port=8000, reload=False)
@@ -4,36 +4,84 @@ from hashlib import sha256
 import random
 import copy
 
+import numpy as np
+
+from expression_dag import default_dag
+from generative_ops import ContentIndex
+
 def mutate_anchor(anchor, step_seed):
     """Apply symbolic mutation to a given anchor based on a deterministic seed."""
-    mutation = copy.deepcopy(anchor)
-    random.seed(step_seed)
+    dag = default_dag()
+    node = dag.node_for(anchor)
+    mutation = copy.deepcopy(dag.anchor(anchor))
+    rng = random.Random(step_seed)
 
     ops = ["+", "-", "*", "/", "^", "ε"]
-    expression = mutation["expression"]
 
     # Recursive epsilon stacking or operator mutation
-    if random.random() < 0.5:
+    if rng.random() < 0.5:
         # ε stack scaling
-        mutation["expression"] = f"({expression}) + ε^{mutation['tier'] + 1}"
+        node = dag.epsilon(node, mutation['tier'] + 1)
     else:
         # Swap one operator
-        op_to_replace = random.choice(ops[:4])  # Avoid ε and ^ for base replacements
-        op_new = random.choice([op for op in ops if op != op_to_replace])
-        mutation["expression"] = expression.replace(op_to_replace, op_new, 1)
+        op_to_replace = rng.choice(ops[:4])  # Avoid ε and ^ for base replacements
+        op_new = rng.choice([op for op in ops if op != op_to_replace])
+        node = dag.replace_first(node, op_to_replace, op_new)
+    mutation["expr_id"] = dag.expr_id(node)
 
     # Update fingerprint with bounded entropy
     mutation["quantized_fingerprint"] = [
-        max(0, min(255, v + random.randint(-15, 15))) for v in mutation["quantized_fingerprint"]
+        max(0, min(255, v + rng.randint(-15, 15))) for v in mutation["quantized_fingerprint"]
     ]
 
     # Rename and re-ID the mutation
     mutation["name"] = f"{anchor['name']}_mut_{step_seed}"
-    combined_str = mutation["name"] + mutation["expression"]
+    combined_str = mutation["name"] + dag.render(node)
     mutation["id"] = sha256(combined_str.encode()).hexdigest()[:12]
     mutation["tier"] = anchor["tier"] + 1
 
-    return mutation
+    return mutation.materialized()
+
+def mutate_batch(anchors, step, rng, index=None, dag=None):
+    """
+    Mutate every anchor in `anchors` at once, drawing all choices and
+    fingerprint jitter from the Generator `rng` in a few vectorised calls.
+    Mutations are shallow LazyAnchor copies (the fields they change are
+    replaced); those whose ID is already in `index` are dropped, new ones
+    added to it. Expressions are edited in `dag` (the process-wide one by
+    default), so a mutation shares every subexpression it leaves alone; its
+    ID still hashes the name and rendered expression, like stored anchors'.
+    """
+    n = len(anchors)
+    if not n:
+        return []
+    ops = ["+", "-", "*", "/", "^", "ε"]
+    stack = rng.random(n) < 0.5
+    replace = rng.integers(4, size=n)       # Avoid ε and ^ for base replacements
+    new = rng.integers(len(ops) - 1, size=n)
+    new += new >= replace                   # Any operator but the one replaced
+    width = max(len(anchor["quantized_fingerprint"]) for anchor in anchors)
+    jitter = rng.integers(-15, 16, size=(n, width))
+    index = index if index is not None else ContentIndex()
+    dag = dag if dag is not None else default_dag()
+
+    mutations = []
+    for k, anchor in enumerate(anchors):
+        mutation = dag.anchor(anchor)
+        node = dag.node_for(anchor)
+        if stack[k]:
+            node = dag.epsilon(node, anchor["tier"] + 1)
+        else:
+            node = dag.replace_first(node, ops[replace[k]], ops[new[k]])
+        mutation["expr_id"] = dag.expr_id(node)
+        fingerprint = np.asarray(anchor["quantized_fingerprint"], dtype=np.int64)
+        mutation["quantized_fingerprint"] = np.clip(fingerprint + jitter[k, :len(fingerprint)], 0, 255).tolist()
+        mutation["name"] = f"{anchor['name']}_mut_{step}"
+        mutation["id"] = sha256((mutation["name"] + dag.render(node)).encode()).hexdigest()[:12]
+        mutation["tier"] = anchor["tier"] + 1
+        if index.add(mutation):
+            mutations.append(mutation)
+    return mutations
 
 def apply_stability_pressure(anchors, stability_index, step):
     """Return a mutated anchor if symbolic stasis exceeds the threshold."""
@@ -2,24 +2,85 @@
 
 import random
 import argparse
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from symbolic_filter_wrapper import SymbolicFilter
-from llama_cpp import Llama
+from symbolic_braid_simulation import simulate_step
+from truth_anchors import truth_anchors_scaffold, anchor_tiers
+from history_retention import Retention, RetainedLog
+from completion_cache import CompletionCache
+from llm_backends import LlamaCppBackend, StubLLM
+
+
+class StageTimings:
+    """Wall time spent per loop stage (and waiting between stages), thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = {}
+        self.counts = {}
+        self.max_seconds = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.max_seconds[name] = max(self.max_seconds.get(name, 0.0), seconds)
+
+    def summary(self):
+        with self._lock:
+            return {
+                name: {
+                    "count": self.counts[name],
+                    "total_s": self.seconds[name],
+                    "mean_ms": 1000 * self.seconds[name] / self.counts[name],
+                    "max_ms": 1000 * self.max_seconds[name],
+                }
+                for name in self.seconds
+            }
+
+    def report(self):
+        for name, row in self.summary().items():
+            print(f"[⏱️] {name:<12} n={row['count']:<5} total={row['total_s']:.3f}s "
+                  f"mean={row['mean_ms']:.1f}ms max={row['max_ms']:.1f}ms")
 
 
 class SymbolicSelfLoop:
-    def __init__(self, model_path: str, n_ctx: int = 2048):
+    def __init__(self, model_path: str, n_ctx: int = 2048, retention: Retention = None,
+                 llm=None, cache: CompletionCache = None):
+        """
+        `llm` (an llm_backends.LLMBackend) replaces the llama.cpp model,
+        e.g. with a StubLLM; completions go through `cache`, by default an
+        in-memory CompletionCache.
+        """
         print("[🧠] Initializing symbolic memory and local LLM...")
-        self.filter = SymbolicFilter()
-        self.llm = Llama(model_path=model_path, n_ctx=n_ctx)
-        self.symbolic_log = []   # Log of symbolic state
-        self.mirror_log = []     # Log of reflections/self-identity updates
+        self.filter = SymbolicFilter(retention=retention)
+        if llm is None:
+            llm = LlamaCppBackend(model_path, n_ctx=n_ctx)
+        self.llm = llm
+        self.model_name = getattr(llm, "model_path", None) or model_path
+        self.cache = cache if cache is not None else CompletionCache()
+        retention = retention or Retention()
+        self.symbolic_log = RetainedLog(retention.get("symbolic_log"))   # Log of symbolic state
+        self.mirror_log = RetainedLog(retention.get("mirror_log"))       # Log of reflections/self-identity updates
+        self.timings = StageTimings()
         print("[✅] Symbolic self-loop with evolution ready.")
 
     def get_weakest_anchor(self):
-        sr = self.filter.state.get("symbolic_resilience", {})
-        if not sr:
+        weakest = self.filter.snapshot().anchors.index.bottom(1)
+        if not weakest:
             return None
-        return min(sr.items(), key=lambda x: x[1])[0]
+        return weakest[0][0]
 
     def generate_question(self) -> str:
         """Formulates a symbolic prompt for the model to reflect on."""
@@ -36,19 +97,23 @@ class SymbolicSelfLoop:
         return random.choice(seed)
 
     def complete(self, prompt: str) -> str:
-        """Use Mistral model to generate symbolic output."""
-        response = self.llm(
-            f"### Question:\n{prompt}\n\n### Answer:\n",
+        """Use Mistral model to generate symbolic output (cached per model, template, params and prompt)."""
+        return self.cache.complete(
+            self.llm,
+            prompt,
+            model=self.model_name,
             max_tokens=200,
             stop=["###"],
             echo=False,
             temperature=0.7
         )
-        return response["choices"][0]["text"].strip()
 
     def evolve_symbolic_truths(self):
         """Promote strong anchors and prune weak ones."""
-        state = self.filter.state
+        self.filter.mutate(self._evolve)
+
+    @staticmethod
+    def _evolve(state):
         for anchor, resilience in state.symbolic_resilience.items():
             if resilience > 8 and anchor not in state.synthetic_anchors:
                 state.synthetic_anchors[anchor] = "promoted"
@@ -58,15 +123,16 @@ class SymbolicSelfLoop:
 
     def symbolic_mirror_reflection(self, step: int):
         """Produce a symbolic self-reflection summary."""
-        sr = self.filter.state.symbolic_resilience
-        anchors = self.filter.state.discovered_anchors
-        synthetic = self.filter.state.synthetic_anchors
+        state = self.filter.snapshot()
+        sr = state.symbolic_resilience
+        anchors = state.discovered_anchors
+        synthetic = state.synthetic_anchors
 
         if not sr:
             return {"step": step, "self_statement": "I do not yet know anything about symbolic stability."}
 
-        strongest = sorted(sr.items(), key=lambda x: -x[1])[:3]
-        weakest = sorted(sr.items(), key=lambda x: x[1])[:3]
+        strongest = state.anchors.index.top(3)
+        weakest = state.anchors.index.bottom(3)
         contradiction_probe = None
 
         if "commutativity_add" in anchors and "associativity_add" not in anchors:
@@ -77,7 +143,7 @@ class SymbolicSelfLoop:
             "strongest_truths": [k for k, _ in strongest],
             "weakest_truths": [k for k, _ in weakest],
             "synthetic_identity": list(synthetic.keys()),
-            "recurring_patterns": [cycle["pair"] for cycle in self.filter.state.symbolic_cycles[-3:]],
+            "recurring_patterns": [cycle["pair"] for cycle in state.symbolic_cycles[-3:]],
             "contradiction_probe": contradiction_probe or "None detected",
             "stability_trend": (
                 "increasing" if sum(sr.values()) / len(sr) > 5 else "fluctuating"
@@ -85,30 +151,59 @@ class SymbolicSelfLoop:
             "self_statement": f"I am currently defined by {strongest[0][0]} and {len(anchors)} active truths."
         }
 
+    def what_if(self, steps: int = 1, commit: bool = False):
+        """
+        Run `steps` speculative simulation steps on a copy-on-write overlay and
+        return it for inspection. The live state only changes if `commit` is set.
+        """
+        overlay = self.filter.speculate()
+        simulate_step(overlay, truth_anchors_scaffold, anchor_tiers, steps=steps)
+        if commit:
+            self.filter.commit(overlay)
+        return overlay
+
     def log_state(self, step: int):
         """Store current symbolic state for history and replay."""
+        state = self.filter.snapshot()
         self.symbolic_log.append({
             "step": step,
-            "time": self.filter.state.time,
-            "anchors": list(self.filter.state.discovered_anchors),
-            "resilience": self.filter.state.symbolic_resilience.copy(),
-            "cycles": self.filter.state.symbolic_cycles[-3:],
-            "promoted": list(self.filter.state.synthetic_anchors.keys())
+            "time": state.time,
+            "anchors": list(state.discovered_anchors),
+            "resilience": state.symbolic_resilience.copy(),
+            "cycles": state.symbolic_cycles[-3:],
+            "promoted": list(state.synthetic_anchors.keys())
         })
 
     def loop_once(self, step: int):
         """Run a single symbolic evolution loop iteration."""
-        prompt = self.generate_question()
+        prompt, valid = self._ask(step)
+        if not valid:
+            return False
+        return self._finish(step, self._answer(prompt))
+
+    def _ask(self, step):
+        """Stage 1: generate a question and validate it."""
+        with self.timings.stage("generate"):
+            prompt = self.generate_question()
         print(f"🌀 [Step {step}] Question: {prompt}")
 
-        if not self.filter.validate_prompt(prompt):
+        with self.timings.stage("validate"):
+            valid = self.filter.validate_prompt(prompt)
+        if not valid:
             print("⚠️ Rejected: Question violates symbolic integrity.")
-            return False
+        return prompt, valid
 
-        answer = self.complete(prompt)
+    def _answer(self, prompt):
+        """Stage 2: LLM completion."""
+        with self.timings.stage("complete"):
+            answer = self.complete(prompt)
         print(f"💬 Answer: {answer}")
+        return answer
 
-        score = self.filter.score_output(answer)
+    def _finish(self, step, answer):
+        """Stage 3: score the answer, log, evolve and reflect."""
+        with self.timings.stage("score"):
+            score = self.filter.score_output(answer)
         print(f"🧠 Symbolic alignment score: {score:.2f}")
 
         if score < 0.5:
@@ -116,13 +211,14 @@ class SymbolicSelfLoop:
         else:
             print("✅ Response retained.")
 
-        self.log_state(step)
-        self.evolve_symbolic_truths()
+        with self.timings.stage("log"):
+            self.log_state(step)
+            self.evolve_symbolic_truths()
 
-        if step % 100 == 0:
-            reflection = self.symbolic_mirror_reflection(step)
-            self.mirror_log.append(reflection)
-            print(f"🪞 Reflection: {reflection['self_statement']}")
+            if step % 100 == 0:
+                reflection = self.symbolic_mirror_reflection(step)
+                self.mirror_log.append(reflection)
+                print(f"🪞 Reflection: {reflection['self_statement']}")
 
         return True
 
@@ -130,13 +226,153 @@ class SymbolicSelfLoop:
         for i in range(steps):
             print(f"\n--- [Symbolic Step {i + 1}/{steps}] ---")
             self.loop_once(i + 1)
+        self.timings.report()
+
+    def run_pipelined(self, steps: int = 10, depth: int = 2, complete_workers: int = 1, ordered: bool = True):
+        """
+        Run `steps` iterations as a three-stage pipeline: question + validate,
+        LLM completion, then score + log + evolve, each on its own thread(s)
+        with bounded queues (`depth` items) in between. Step N+1's question
+        is validated while step N's completion is in flight, and step N is
+        scored while later steps generate.
+
+        Questions for the next `depth` steps are drawn before the current
+        step evolves the state, so they can target a slightly older weakest
+        anchor than `run` would. With `complete_workers` > 1 completions run
+        concurrently (up to the backend's `max_concurrency`) and may finish
+        out of order; `ordered=True` scores them in step order, otherwise
+        as they arrive. Returns the number of accepted steps; per-stage
+        times, including queue waits ("wait:*"), are in `self.timings`.
+        """
+        max_concurrency = getattr(self.llm, "max_concurrency", None)
+        if max_concurrency:
+            complete_workers = max(1, min(complete_workers, max_concurrency))
+        asked = queue.Queue(maxsize=depth)
+        answered = queue.Queue(maxsize=depth)
+        stop = threading.Event()
+        errors = []
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def get(q, wait_stage):
+            started = time.perf_counter()
+            while not stop.is_set():
+                try:
+                    item = q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                self.timings.add(wait_stage, time.perf_counter() - started)
+                return item
+            return None
+
+        def guarded(fn):
+            def run():
+                try:
+                    fn()
+                except BaseException as e:
+                    errors.append(e)
+                    stop.set()
+            return run
+
+        def ask_stage():
+            for step in range(1, steps + 1):
+                prompt, valid = self._ask(step)
+                if not put(asked, (step, prompt, valid)):
+                    return
+            for _ in range(complete_workers):
+                put(asked, None)
+
+        def complete_stage():
+            while True:
+                item = get(asked, "wait:ask")
+                if item is None:
+                    put(answered, None)
+                    return
+                step, prompt, valid = item
+                if not put(answered, (step, self._answer(prompt) if valid else None)):
+                    return
+
+        accepted = []
+
+        def finish_stage():
+            finished = 0
+            held = {}
+            next_step = 1
+            while finished < complete_workers:
+                item = get(answered, "wait:answer")
+                if item is None:
+                    if stop.is_set():
+                        return
+                    finished += 1
+                    continue
+                ready = [item]
+                if ordered:
+                    held[item[0]] = item
+                    ready = []
+                    while next_step in held:
+                        ready.append(held.pop(next_step))
+                        next_step += 1
+                for step, answer in ready:
+                    if answer is not None:
+                        self._finish(step, answer)
+                        accepted.append(step)
+
+        threads = [threading.Thread(target=guarded(ask_stage), name="loop-ask", daemon=True)]
+        threads += [threading.Thread(target=guarded(complete_stage), name=f"loop-complete-{i}", daemon=True)
+                    for i in range(complete_workers)]
+        threads.append(threading.Thread(target=guarded(finish_stage), name="loop-finish", daemon=True))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.timings.add("pipeline", time.perf_counter() - started)
+        if errors:
+            raise errors[0]
+        self.timings.report()
+        return len(accepted)
+
+    def close(self):
+        """Flush the symbolic state to disk and stop its writer threads."""
+        self.filter.close()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--model", type=str, required=True, help="Path to local Mistral GGUF model")
+    parser.add_argument("--model", type=str, help="Path to local Mistral GGUF model")
+    parser.add_argument("--stub", action="store_true", help="Use a deterministic stub instead of a model")
+    parser.add_argument("--cache-dir", type=str, default="", help="Persist LLM completions here (default: memory only)")
+    parser.add_argument("--cache-mb", type=float, default=256, help="Disk budget for cached completions")
+    parser.add_argument("--pipelined", action="store_true", help="Overlap questioning, completion and scoring")
+    parser.add_argument("--depth", type=int, default=2, help="Queue depth between pipeline stages")
+    parser.add_argument("--complete-workers", type=int, default=1, help="Concurrent completions in pipelined mode")
+    parser.add_argument("--unordered", action="store_true", help="Score completions as they finish, not in step order")
     parser.add_argument("--steps", type=int, default=10, help="Number of self-loop steps")
+    parser.add_argument("--retention", type=str, default="",
+                        help="History retention, e.g. 'symbolic_log=ring:1000,discovery_log=window:50000'")
     args = parser.parse_args()
+    if not args.model and not args.stub:
+        parser.error("--model is required unless --stub is given")
 
-    loop = SymbolicSelfLoop(model_path=args.model)
-    loop.run(steps=args.steps)
+    loop = SymbolicSelfLoop(
+        model_path=args.model or "stub",
+        retention=Retention.from_spec(args.retention) if args.retention else None,
+        llm=StubLLM() if args.stub else None,
+        cache=CompletionCache(args.cache_dir or None, disk_mb=args.cache_mb)
+    )
+    try:
+        if args.pipelined:
+            loop.run_pipelined(steps=args.steps, depth=args.depth,
+                               complete_workers=args.complete_workers, ordered=not args.unordered)
+        else:
+            loop.run(steps=args.steps)
+    finally:
+        loop.close()
+    print(f"[💾] Completion cache: {loop.cache.stats()}")
@@ -0,0 +1,106 @@
+# test_anchor_store.py
+
+import glob
+import json
+import multiprocessing
+import os
+import zlib
+
+from anchor_store import RECORD_HEADER, AnchorStore
+
+
+def anchor(anchor_id, tier=1, version=0):
+    return {"id": anchor_id, "name": f"anchor_{anchor_id}", "expression": f"a + {version} = {version} + a", "tier": tier}
+
+
+def frame(record):
+    payload = json.dumps(record).encode()
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def open_store(path, **options):
+    return AnchorStore(str(path), fsync=False, compact_interval=None, **options)
+
+
+def test_next_appender_repairs_a_torn_tail(tmp_path):
+    store = open_store(tmp_path)
+    store.append_many(anchor(f"a{i}") for i in range(10))
+    store.close()
+
+    # A crashed appender wrote one whole record, half of the next and a torn index line
+    segment = sorted(glob.glob(str(tmp_path / "segment-*.sbr")))[-1]
+    whole, torn = frame(anchor("whole")), frame(anchor("torn"))
+    with open(segment, "ab") as f:
+        f.write(whole + torn[:len(torn) // 2])
+    with open(segment[:-len(".sbr")] + ".idx", "ab") as f:
+        f.write(b'["whole", 1, ')
+
+    store = open_store(tmp_path)
+    assert len(store) == 10  # Readers leave the tail alone
+    assert store.append(anchor("after"))
+    assert "whole" in store and "torn" not in store
+    assert store.get("whole") == anchor("whole")
+    assert store.get("after") == anchor("after")
+    assert os.path.getsize(segment) == store.stats()["bytes"]
+    store.close()
+
+    reopened = open_store(tmp_path)
+    assert reopened.ids() == [f"a{i}" for i in range(10)] + ["whole", "after"]
+    reopened.close()
+
+
+def test_compaction_drops_superseded_records(tmp_path):
+    store = open_store(tmp_path, segment_bytes=512)
+    for version in range(3):
+        for start in range(0, 30, 5):
+            store.append_many((anchor(f"a{i}", tier=i % 3, version=version) for i in range(start, start + 5)),
+                              replace=True)
+    before = store.stats()
+    assert before["segments"] > 2 and before["records"] == 90
+
+    assert store.compaction_due()
+    assert store.compact()
+    after = store.stats()
+    assert after["segments"] == 2  # The compacted one plus the active one
+    assert after["anchors"] == 30
+    assert after["records"] < before["records"]
+    assert not store.compact()  # One clean sealed segment: nothing left to do
+
+    expected = {f"a{i}": anchor(f"a{i}", tier=i % 3, version=2) for i in range(30)}
+    assert {a["id"]: a for a in store} == expected
+    assert sorted(a["id"] for a in store.by_tier(1)) == sorted(f"a{i}" for i in range(30) if i % 3 == 1)
+    store.close()
+
+    reopened = open_store(tmp_path)
+    assert {a["id"]: a for a in reopened} == expected
+    reopened.close()
+
+
+def append_from_worker(path, worker, compact):
+    store = open_store(path, segment_bytes=1024)
+    for start in range(0, 40, 4):
+        ids = [f"w{worker}-{i}" for i in range(start, start + 4)] + [f"shared-{start // 2}"]
+        store.append_many(anchor(anchor_id, tier=worker) for anchor_id in ids)
+        if compact and start % 12 == 0:
+            store.compact()
+    store.close()
+
+
+def test_concurrent_appenders_share_one_store(tmp_path):
+    workers = [
+        multiprocessing.Process(target=append_from_worker, args=(str(tmp_path), worker, worker == 0))
+        for worker in range(4)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    assert [process.exitcode for process in workers] == [0] * 4
+
+    store = open_store(tmp_path)
+    expected = {f"w{worker}-{i}" for worker in range(4) for i in range(40)} | {f"shared-{k}" for k in range(0, 20, 2)}
+    assert set(store.ids()) == expected
+    assert len(store) == len(expected)
+    assert all(store.get(anchor_id)["id"] == anchor_id for anchor_id in expected)
+    assert store.stats()["garbage"] == 0  # Each shared ID was written once, by whichever worker got there first
+    store.close()
@@ -0,0 +1,83 @@
+# test_braid_pool.py
+
+import threading
+import time
+
+from braid_pool import BraidPool
+
+MB = 1024 * 1024
+
+
+class FakeSnapshot:
+    def __init__(self, nbytes):
+        self._nbytes = nbytes
+
+    def nbytes(self):
+        return self._nbytes
+
+
+class FakeFilter:
+    """Just enough of a SymbolicFilter for the pool: a size and a close."""
+
+    def __init__(self, state_path, nbytes=MB, gate=None):
+        if gate is not None:
+            gate.wait()
+        self.state_path = state_path
+        self._nbytes = nbytes
+        self.closed = False
+
+    def snapshot(self):
+        return FakeSnapshot(self._nbytes)
+
+    def close(self):
+        self.closed = True
+
+
+def test_leased_braids_are_not_evicted(tmp_path):
+    pool = BraidPool(FakeFilter, state_dir=str(tmp_path), budget_mb=1.5)
+    with pool.braid("a") as a:
+        with pool.braid("b") as b:
+            assert pool.stats()["resident_mb"] == 2  # Over budget, but both are in use
+            assert pool.stats()["evictions"] == 0
+        # b is idle now, but a is the least recently used and still leased
+        assert pool.resident("b") is None and b.closed
+        assert pool.resident("a") is a and not a.closed
+    assert pool.stats()["evictions"] == 1
+
+    with pool.braid("c"):
+        pass
+    assert a.closed and pool.resident("a") is None
+    assert pool.stats()["resident_braids"] == 1
+    pool.close()
+
+
+def test_waiter_keeps_its_lease_when_the_loader_releases_first(tmp_path):
+    for _ in range(20):
+        gate = threading.Event()
+        pool = BraidPool(FakeFilter, state_dir=str(tmp_path), budget_mb=0, gate=gate)
+        seen = {}
+
+        def wait_for_braid():
+            with pool.braid("x") as braid_filter:
+                seen["closed"] = braid_filter.closed
+                seen["resident"] = pool.resident("x") is braid_filter
+
+        def load_braid():
+            with pool.braid("x"):
+                pass  # Releases, with a budget of 0, the moment the load finishes
+
+        loader = threading.Thread(target=load_braid)
+        loader.start()
+        while pool.stats()["loading"] == 0:
+            time.sleep(0.001)
+        waiter = threading.Thread(target=wait_for_braid)
+        waiter.start()
+        while pool.stats()["misses"] < 2:
+            time.sleep(0.001)  # The waiter has joined the load
+        gate.set()
+        loader.join()
+        waiter.join()
+
+        assert seen == {"closed": False, "resident": True}
+        assert pool.stats()["evictions"] == 1  # Evicted once the waiter was done with it
+        pool.close()
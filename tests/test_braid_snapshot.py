@@ -0,0 +1,78 @@
+# test_braid_snapshot.py
+
+import pickle
+from collections import Counter
+
+import pytest
+
+from braid_snapshot import convert_pickle, is_snapshot, load_snapshot, save_snapshot
+from symbolic_braid_simulation import SymbolicState, load_state, migration_source, simulate_step
+from truth_anchors import anchor_tiers, truth_anchors_scaffold
+
+
+def summary(state):
+    return (
+        state.time,
+        set(state.discovered_anchors),
+        dict(state.symbolic_resilience),
+        {name: float(value) for name, value in state.symbolic_phase_curvature.items()},
+        {pair: count for pair, count in state.symbol_pair_counter.items() if count},
+        list(state.discovery_log),
+        list(state.symbol_chain),
+        list(state.symbolic_cycles),
+        list(state.symbolic_memory_depth),
+    )
+
+
+def unordered_deaths(state):
+    """`summary`, but deaths within a step may come in any order (they follow intern order)."""
+    fields = list(summary(state))
+    fields[6] = Counter(fields[6])
+    return fields
+
+
+def simulated(steps=1500, seed=5):
+    return simulate_step(SymbolicState(seed=seed), truth_anchors_scaffold, anchor_tiers, steps=steps)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_snapshot_round_trip_resumes_the_run(tmp_path, mmap):
+    path = str(tmp_path / "braid.snap")
+    state = simulated()
+    save_snapshot(state, path)
+    loaded = load_snapshot(path, mmap=mmap)
+    assert is_snapshot(path)
+    assert summary(loaded) == summary(state)
+
+    # The random stream is saved too, so both carry on identically
+    simulate_step(state, truth_anchors_scaffold, anchor_tiers, steps=700)
+    simulate_step(loaded, truth_anchors_scaffold, anchor_tiers, steps=700)
+    assert summary(loaded) == summary(state)
+
+    # Appends land after the mapped history and survive another save
+    save_snapshot(loaded, path)
+    assert summary(load_snapshot(path, mmap=mmap)) == summary(state)
+
+
+@pytest.mark.parametrize("legacy", ["dict", "state"])
+def test_pickled_state_converts_to_a_snapshot(tmp_path, legacy):
+    state = simulated()
+    source = tmp_path / "braid_state.pkl"
+    with open(source, "wb") as f:
+        pickle.dump(state.to_dict() if legacy == "dict" else state, f)
+
+    # Until a snapshot exists, loads fall back to the pickle next to it
+    target = str(tmp_path / "braid_state.snap")
+    assert migration_source(target) == str(source)
+    assert not is_snapshot(str(source))
+    assert summary(load_state(str(source))) == summary(state)
+
+    convert_pickle(str(source), target)
+    assert migration_source(target) == target
+    converted = load_state(target)
+    assert summary(converted) == summary(state)
+
+    # A dict pickle is re-interned in its own order, which only reorders same-step deaths
+    simulate_step(state, truth_anchors_scaffold, anchor_tiers, steps=300)
+    simulate_step(converted, truth_anchors_scaffold, anchor_tiers, steps=300)
+    assert unordered_deaths(converted) == unordered_deaths(state)
@@ -0,0 +1,89 @@
+# test_capability_mapper.py
+
+import random
+
+from capability_mapper import CapabilityClassifier
+from expression_dag import ExpressionDAG
+from generative_ops import fuse_pairs
+
+TOKENS = ["a", "b", "i", "f", "if", "^", "ε", "+", "-", "¬", "∧", "=", " ", "(", ")"]
+
+
+def legacy_map_cluster_to_capability(cluster):
+    """The original rule loop, before the rules were compiled."""
+    anchor_exprs = [a["expression"] for a in cluster]
+    if any("^" in e or "ε" in e for e in anchor_exprs):
+        return "recursive_reasoning"
+    elif all("+" in e or "-" in e for e in anchor_exprs):
+        return "arithmetic_simplification"
+    elif any("if" in e for e in anchor_exprs):
+        return "logic_proof"
+    elif any("¬" in e or "∧" in e for e in anchor_exprs):
+        return "logical_consistency"
+    else:
+        return "symbolic_reflection"
+
+
+def naive_classify(rules, default, cluster):
+    """A rule table evaluated directly on the expression strings."""
+    expressions = [anchor["expression"] for anchor in cluster]
+    for rule in rules:
+        hit = [any(pattern in e for pattern in rule["patterns"]) for e in expressions]
+        if (all(hit) if rule.get("match", "any") == "all" else any(hit)):
+            return rule["capability"]
+    return default
+
+
+def random_clusters(rng, count, tokens=TOKENS):
+    clusters = []
+    for c in range(count):
+        clusters.append([
+            {"id": f"{c}-{k}", "anchor": f"anchor_{c}_{k}",
+             "expression": "".join(rng.choice(tokens) for _ in range(rng.randint(0, 8)))}
+            for k in range(rng.randint(1, 4))
+        ])
+    return clusters
+
+
+def test_compiled_rules_match_the_legacy_loop():
+    classifier = CapabilityClassifier(dag=ExpressionDAG())
+    clusters = random_clusters(random.Random(0), 2000)
+    assert [classifier.classify(cluster) for cluster in clusters] == [
+        legacy_map_cluster_to_capability(cluster) for cluster in clusters
+    ]
+    # Second pass is answered from the tag cache
+    assert classifier.classify_many(clusters) == [legacy_map_cluster_to_capability(cluster) for cluster in clusters]
+
+
+def test_cached_tags_follow_a_changed_expression():
+    classifier = CapabilityClassifier(dag=ExpressionDAG())
+    anchor = {"anchor": "growth", "expression": "a + b"}
+    assert classifier.classify([anchor]) == "arithmetic_simplification"
+    anchor["expression"] = "a ^ b"
+    assert classifier.classify([anchor]) == "recursive_reasoning"
+
+
+def test_dag_anchors_fold_tags_like_their_rendered_text():
+    dag = ExpressionDAG()
+    classifier = CapabilityClassifier(dag=dag)
+    rng = random.Random(1)
+    leaves = [anchor for cluster in random_clusters(rng, 60) for anchor in cluster]
+    fused = fuse_pairs([tuple(rng.sample(leaves, 2)) for _ in range(300)], dag=dag)
+    fused += fuse_pairs([tuple(rng.sample(fused, 2)) for _ in range(300)], dag=dag)
+    clusters = [rng.sample(fused, rng.randint(1, 3)) for _ in range(500)]
+    assert [classifier.classify(cluster) for cluster in clusters] == [
+        legacy_map_cluster_to_capability([anchor.materialized() for anchor in cluster]) for cluster in clusters
+    ]
+
+
+def test_overlapping_custom_patterns_match_substring_semantics():
+    rules = [
+        {"capability": "long", "match": "all", "patterns": ["abc", "ca"]},
+        {"capability": "short", "match": "any", "patterns": ["bc"]},
+        {"capability": "either", "match": "all", "patterns": ["b", "c"]},
+    ]
+    classifier = CapabilityClassifier(rules, default="none", dag=ExpressionDAG())
+    clusters = random_clusters(random.Random(2), 2000, tokens=["a", "b", "c", "ab", "bca"])
+    assert [classifier.classify(cluster) for cluster in clusters] == [
+        naive_classify(rules, "none", cluster) for cluster in clusters
+    ]
@@ -0,0 +1,56 @@
+# test_completion_cache.py
+
+import os
+
+from completion_cache import CompletionCache
+from llm_backends import StubLLM
+
+
+def test_memory_hit_skips_the_model():
+    llm = StubLLM()
+    cache = CompletionCache()
+    first = cache.complete(llm, "What is 2 + 2?", model="stub", max_tokens=50)
+    second = cache.complete(llm, "What is 2 + 2?", model="stub", max_tokens=50)
+    assert first == second
+    assert llm.calls == 1
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    cache.complete(llm, "What is 2 + 2?", model="stub", max_tokens=60)  # Other params, other completion
+    assert llm.calls == 2
+
+
+def test_disk_hit_survives_a_restart(tmp_path):
+    llm = StubLLM()
+    text = CompletionCache(str(tmp_path)).complete(llm, "Is pi rational?", model="stub")
+
+    restarted = CompletionCache(str(tmp_path))
+    assert restarted.complete(llm, "Is pi rational?", model="stub") == text
+    assert llm.calls == 1
+    assert restarted.stats()["disk_hits"] == 1
+    assert restarted.stats()["memory_entries"] == 1  # Promoted to the memory tier
+
+    restarted.complete(llm, "Is pi rational?", model="stub")
+    assert restarted.stats()["memory_hits"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    llm = StubLLM()
+    cache = CompletionCache(str(tmp_path), memory_entries=1, disk_mb=200 / (1024 * 1024))
+    prompts = [f"Question {i}?" for i in range(10)]
+    for prompt in prompts:
+        cache.complete(llm, prompt, model="stub")
+
+    stats = cache.stats()
+    assert stats["evictions"] > 0
+    assert stats["disk_mb"] * 1024 * 1024 <= 200
+    files = [name for name in os.listdir(tmp_path) if name.endswith(".json")]
+    assert len(files) == stats["disk_entries"] < len(prompts)
+
+    # The newest completion is still on disk; the oldest went to the model again
+    fresh = CompletionCache(str(tmp_path), memory_entries=1)
+    calls = llm.calls
+    fresh.complete(llm, prompts[-1], model="stub")
+    assert llm.calls == calls
+    fresh.complete(llm, prompts[0], model="stub")
+    assert llm.calls == calls + 1
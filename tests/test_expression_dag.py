@@ -0,0 +1,88 @@
+# test_expression_dag.py
+
+import json
+import random
+
+from braid_self_directed_fusion import BraidSelfDirectedFusion
+from expression_dag import BINARY_OPS, ExpressionDAG
+from symbolic_controller import SymbolicController
+from symbolic_mutation import mutate_anchor
+
+ANCHORS = [
+    {"id": "a", "name": "commutativity_add", "expression": "a + b = b + a", "tier": 1,
+     "quantized_fingerprint": [10, 20, 30, 40]},
+    {"id": "b", "name": "identity_mul", "expression": "a * 1 = a", "tier": 1,
+     "quantized_fingerprint": [90, 100, 110, 120]},
+]
+
+PIECES = ["a", "b", "+", "-", "*", "^", "ε", "(", ")", " ", "<=>", ") <=> (", " + ε^2", "1", "=", "<"]
+REPLACEMENTS = ["+", "-", "*", "/", "^", "ε", "a", "(", ")", " ", "<", "b)", "a + ", ") <", "=> (", " + ε", "ε^2", ""]
+
+
+def random_text(rng, pieces=PIECES):
+    return "".join(rng.choice(pieces) for _ in range(rng.randint(0, 6)))
+
+
+def random_node(dag, rng, depth=4, pieces=PIECES):
+    """A random fusion/ε tree over random leaves."""
+    roll = rng.random()
+    if depth == 0 or roll < 0.3:
+        return dag.leaf(random_text(rng, pieces))
+    if roll < 0.5:
+        return dag.epsilon(random_node(dag, rng, depth - 1, pieces), rng.randint(1, 12))
+    return dag.fuse(random_node(dag, rng, depth - 1, pieces), random_node(dag, rng, depth - 1, pieces),
+                    rng.choice(BINARY_OPS))
+
+
+def test_intern_recovers_the_rendered_text_and_structure():
+    dag = ExpressionDAG(intern_cache_size=64)  # Small, so the cache is cleared along the way
+    rng = random.Random(0)
+    for _ in range(3000):
+        text = random_text(rng) if rng.random() < 0.5 else dag.render(random_node(dag, rng))
+        assert dag.render(dag.intern(text)) == text
+    # Without parentheses in the leaves, the text parses back to the very node it came from
+    plain = [piece for piece in PIECES if "(" not in piece and ")" not in piece]
+    for _ in range(500):
+        node = random_node(dag, rng, pieces=plain)
+        assert dag.intern(dag.render(node)) == node
+    assert len(dag._interned) <= 64
+
+
+def test_replace_first_matches_str_replace():
+    dag = ExpressionDAG()
+    rng = random.Random(1)
+    for _ in range(5000):
+        node = random_node(dag, rng)
+        text = dag.render(node)
+        if text and rng.random() < 0.3:
+            start = rng.randrange(len(text))  # Any substring, wherever it falls in the tree
+            old = text[start:start + rng.randint(1, 6)]
+        else:
+            old = rng.choice(REPLACEMENTS[:-1])
+        new = rng.choice(REPLACEMENTS)
+        assert dag.render(dag.replace_first(node, old, new)) == text.replace(old, new, 1), (text, old, new)
+
+
+def test_replace_first_shares_untouched_subexpressions():
+    dag = ExpressionDAG()
+    left, right = dag.intern("a + b = b + a"), dag.intern("a * 1 = a")
+    fused = dag.fuse(dag.epsilon(left, 2), right)
+    replaced = dag.replace_first(fused, "*", "/")
+    assert dag.render(replaced) == "((a + b = b + a) + ε^2) <=> (a / 1 = a)"
+    assert dag._left[replaced] == dag._left[fused]  # Only the right operand was rebuilt
+    assert dag.replace_first(fused, "?", "!") == fused
+
+
+def test_single_anchor_apis_return_plain_dicts():
+    controller = SymbolicController(seed=0)
+    controller.last_drift = 0.5  # Low drift calls for a drive fusion
+    anchors = [
+        BraidSelfDirectedFusion(ANCHORS).fuse_anchors(*ANCHORS),
+        mutate_anchor(ANCHORS[0], 3),
+        controller.generate_drive_signal(ANCHORS, mirror_log=[]),
+    ]
+    for anchor in anchors:
+        assert type(anchor) is dict
+        assert "expression" in anchor
+        assert json.loads(json.dumps(anchor))["expression"] == anchor["expression"]
+    assert anchors[0]["expression"] == "(a + b = b + a) <=> (a * 1 = a)"
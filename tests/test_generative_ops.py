@@ -0,0 +1,70 @@
+# test_generative_ops.py
+
+import hashlib
+
+import numpy as np
+
+from expression_dag import ExpressionDAG
+from generative_ops import ContentIndex, fuse_batch, fuse_pairs
+from symbolic_mutation import mutate_batch
+
+ANCHORS = [
+    {"id": "a", "name": "commutativity_add", "expression": "a + b = b + a", "tier": 1,
+     "quantized_fingerprint": [10, 20, 30, 40]},
+    {"id": "b", "name": "distributivity", "expression": "a * (b + c) = a * b + a * c", "tier": 2,
+     "quantized_fingerprint": [50, 60, 70, 80]},
+    {"id": "c", "name": "identity_mul", "expression": "a * 1 = a", "tier": 1,
+     "quantized_fingerprint": [90, 100, 110, 120]},
+]
+
+
+def legacy_fusion(a1, a2):
+    """A fusion as the original dict-based code stored it."""
+    name = f"{a1['name']}_{a2['name']}_fusion"
+    expression = f"({a1['expression']}) <=> ({a2['expression']})"
+    return {"id": hashlib.md5((name + expression).encode()).hexdigest()[:12], "name": name, "expression": expression}
+
+
+def test_fusions_dedupe_within_a_batch_and_against_the_index():
+    dag = ExpressionDAG()
+    index = ContentIndex()
+    pairs = [(ANCHORS[0], ANCHORS[1]), (ANCHORS[1], ANCHORS[2]), (ANCHORS[0], ANCHORS[1])]
+    fused = fuse_pairs(pairs, index=index, dag=dag)
+    assert [anchor["name"] for anchor in fused] == [
+        "commutativity_add_distributivity_fusion", "distributivity_identity_mul_fusion"
+    ]
+    assert len(index) == 2
+
+    assert fuse_pairs(pairs, index=index, dag=dag) == []
+    assert len(fuse_batch(ANCHORS, 50, np.random.default_rng(0), index=index, dag=dag)) <= 4  # Only 6 ordered pairs exist
+
+
+def test_fusions_keep_legacy_ids():
+    dag = ExpressionDAG()
+    stored = [legacy_fusion(ANCHORS[0], ANCHORS[1]), legacy_fusion(ANCHORS[2], ANCHORS[0])]
+    for legacy, (fused,) in zip(stored, [fuse_pairs([(ANCHORS[0], ANCHORS[1])], dag=dag),
+                                         fuse_pairs([(ANCHORS[2], ANCHORS[0])], dag=dag)]):
+        assert fused["id"] == legacy["id"]
+        assert fused["expression"] == legacy["expression"]
+
+    # An index loaded from stored anchors recognises their regenerated fusions
+    index = ContentIndex(stored)
+    pairs = [(ANCHORS[0], ANCHORS[1]), (ANCHORS[2], ANCHORS[0]), (ANCHORS[1], ANCHORS[2])]
+    assert [anchor["name"] for anchor in fuse_pairs(pairs, index=index, dag=dag)] == [
+        "distributivity_identity_mul_fusion"
+    ]
+
+
+def test_mutations_keep_legacy_ids():
+    dag = ExpressionDAG()
+    mutations = mutate_batch(ANCHORS, 7, np.random.default_rng(1), dag=dag)
+    assert len(mutations) == len(ANCHORS)
+    for anchor, mutation in zip(ANCHORS, mutations):
+        expression = anchor["expression"]
+        legacy_expressions = {f"({expression}) + ε^{anchor['tier'] + 1}"}
+        legacy_expressions |= {expression.replace(old, new, 1) for old in "+-*/" for new in "+-*/^ε" if new != old}
+        assert mutation["expression"] in legacy_expressions
+        assert mutation["id"] == hashlib.sha256((mutation["name"] + mutation["expression"]).encode()).hexdigest()[:12]
+
+    index = ContentIndex(mutation.materialized() for mutation in mutations)
+    assert mutate_batch(ANCHORS, 7, np.random.default_rng(1), index=index, dag=dag) == []
@@ -0,0 +1,50 @@
+# test_self_loop_pipeline.py
+
+import time
+
+import pytest
+
+from llm_backends import StubLLM
+from symbolic_self_loop import SymbolicSelfLoop
+
+STEPS = 24
+
+
+def scored_steps(ordered):
+    loop = SymbolicSelfLoop(model_path="stub", llm=StubLLM())
+    scored = []
+    finish = loop._finish
+
+    def ask(step):
+        return f"Question {step}?", step % 3 != 0  # Every third question is rejected
+
+    def answer(prompt):
+        step = int(prompt.split()[1].rstrip("?"))
+        time.sleep(0.002 * (step % 4))  # Later steps often finish first
+        return f"Answer to {prompt}"
+
+    def record(step, text):
+        scored.append(step)
+        return finish(step, text)
+
+    loop._ask, loop._answer, loop._finish = ask, answer, record
+    try:
+        accepted = loop.run_pipelined(steps=STEPS, depth=4, complete_workers=3, ordered=ordered)
+    finally:
+        loop.close()
+    return accepted, scored
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # The loop's filter keeps its state in the working directory
+
+
+def test_ordered_and_unordered_score_the_same_steps():
+    expected = [step for step in range(1, STEPS + 1) if step % 3 != 0]
+    ordered_count, ordered = scored_steps(ordered=True)
+    unordered_count, unordered = scored_steps(ordered=False)
+
+    assert ordered == expected
+    assert sorted(unordered) == expected
+    assert ordered_count == unordered_count == len(expected)
@@ -0,0 +1,26 @@
+# test_self_loop_progress.py
+
+import pytest
+
+from llm_backends import StubLLM
+from symbolic_self_loop import SymbolicSelfLoop
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # The loop's filter keeps its state in the working directory
+
+
+def test_loop_keeps_progressing_after_a_rejection():
+    loop = SymbolicSelfLoop(model_path="stub", llm=StubLLM())
+    try:
+        loop.filter.mutate(lambda state: state.reseed(3))
+        loop.what_if(steps=100, commit=True)  # Seeded, so validation replays the same streams every run
+        start = loop.filter.snapshot().time
+
+        results = [loop.loop_once(step) for step in range(1, 41)]
+        first_rejection = results.index(False)
+        assert True in results[first_rejection + 1:]
+        assert loop.filter.snapshot().time == start + sum(results)
+    finally:
+        loop.close()
@@ -0,0 +1,25 @@
+# test_semantic_cluster.py
+
+from semantic_cluster import IncrementalClusterer
+
+
+def anchors(names):
+    return [{"anchor": name, "expression": f"{name} <=> {name}_rule", "tier": 1} for name in names]
+
+
+def test_first_batch_smaller_than_k_seeds_the_rest_later():
+    clusterer = IncrementalClusterer(k=5, n_features=256)
+    clusterer.update(anchors(["alpha", "beta", "gamma"]))
+    assert len(clusterer.centroids) == 3
+
+    clusters = clusterer.update(anchors(["alpha", "beta", "gamma", "delta", "epsilon", "zeta"]))
+    assert len(clusterer.centroids) == 5
+    assert len(clusterer.counts) == 5
+    assert sum(len(cluster) for cluster in clusters) == 6
+
+
+def test_update_is_stable_for_unchanged_anchors():
+    clusterer = IncrementalClusterer(k=3, n_features=256, refine=0)
+    batch = anchors(["alpha", "beta", "gamma", "delta"])
+    first = clusterer.update(batch)
+    assert clusterer.update(batch) == first
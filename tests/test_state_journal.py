@@ -0,0 +1,55 @@
+# test_state_journal.py
+
+import glob
+import os
+
+from state_journal import StateJournal
+from symbolic_braid_simulation import simulate_step
+from truth_anchors import anchor_tiers, truth_anchors_scaffold
+
+
+def summary(state):
+    return (
+        state.time,
+        set(state.discovered_anchors),
+        dict(state.symbolic_resilience),
+        list(state.discovery_log),
+        list(state.symbol_chain),
+        list(state.symbolic_cycles),
+        list(state.symbolic_memory_depth),
+    )
+
+
+def test_recovery_drops_torn_tail_record(tmp_path):
+    path = str(tmp_path / "braid.snap")
+    journal = StateJournal(path, compact_every=10_000, compact_interval=3600)
+    state = journal.recover()
+    state.reseed(11)
+    expected = None
+    for i in range(5):
+        simulate_step(state, truth_anchors_scaffold, anchor_tiers, steps=40)
+        journal.append(state)
+        if i == 3:
+            expected = summary(state)
+    final = summary(state)
+    journal.close(compact=False)
+
+    segment = sorted(glob.glob(os.path.join(path + ".journal", "segment-*.wal")))[-1]
+    size = os.path.getsize(segment)
+    with open(segment, "r+b") as f:
+        f.truncate(size - 7)  # Crash partway through writing the last record
+
+    recovered = StateJournal(path, compact_every=10_000, compact_interval=3600)
+    state = recovered.recover()
+    assert summary(state) == expected
+    assert summary(state) != final
+
+    # Journaling carries on after the torn record
+    simulate_step(state, truth_anchors_scaffold, anchor_tiers, steps=40)
+    recovered.append(state)
+    after = summary(state)
+    recovered.close()
+
+    reopened = StateJournal(path, compact_every=10_000, compact_interval=3600)
+    assert summary(reopened.recover()) == after
+    reopened.close()
@@ -0,0 +1,81 @@
+# test_state_overlay.py
+
+import pytest
+
+from state_overlay import StateOverlay
+from symbolic_braid_simulation import SymbolicState, simulate_step
+from truth_anchors import anchor_tiers, truth_anchors_scaffold
+
+
+def summary(state):
+    return (
+        state.time,
+        set(state.discovered_anchors),
+        dict(state.symbolic_resilience),
+        {pair: count for pair, count in state.symbol_pair_counter.items() if count},
+        list(state.discovery_log),
+        list(state.symbol_chain),
+        list(state.symbolic_cycles),
+        list(state.symbolic_memory_depth),
+    )
+
+
+def twins(warmup=400, seed=9):
+    """Two identical states: one to speculate on, one to run directly for comparison."""
+    return [simulate_step(SymbolicState(seed=seed), truth_anchors_scaffold, anchor_tiers, steps=warmup)
+            for _ in range(2)]
+
+
+def test_commit_matches_running_on_the_state():
+    state, direct = twins()
+    before = summary(state)
+    overlay = StateOverlay(state)
+    simulate_step(overlay, truth_anchors_scaffold, anchor_tiers, steps=300)
+    simulate_step(direct, truth_anchors_scaffold, anchor_tiers, steps=300)
+
+    assert summary(state) == before  # Nothing lands until commit
+    assert summary(overlay) == summary(direct)
+    overlay.commit()
+    assert summary(state) == summary(direct)
+
+    # The base carries on from where the overlay left its random stream
+    simulate_step(state, truth_anchors_scaffold, anchor_tiers, steps=200)
+    simulate_step(direct, truth_anchors_scaffold, anchor_tiers, steps=200)
+    assert summary(state) == summary(direct)
+
+
+def test_discarded_overlay_leaves_the_state_alone():
+    state, _ = twins()
+    before = summary(state)
+    overlay = StateOverlay(state)
+    simulate_step(overlay, truth_anchors_scaffold, anchor_tiers, steps=300)
+    overlay.discard()
+    assert summary(state) == before
+
+
+def test_snapshot_overlay_rebases_onto_the_live_state():
+    state, direct = twins()
+    overlay = StateOverlay(state.snapshot())
+    simulate_step(overlay, truth_anchors_scaffold, anchor_tiers, steps=300)
+    simulate_step(direct, truth_anchors_scaffold, anchor_tiers, steps=300)
+
+    overlay.rebase(state)
+    overlay.commit()
+    assert summary(state) == summary(direct)
+
+
+def test_commit_refuses_once_the_base_has_moved():
+    state, _ = twins()
+    overlay = StateOverlay(state)
+    stale = StateOverlay(state.snapshot())
+    simulate_step(overlay, truth_anchors_scaffold, anchor_tiers, steps=50)
+    simulate_step(stale, truth_anchors_scaffold, anchor_tiers, steps=50)
+    simulate_step(state, truth_anchors_scaffold, anchor_tiers, steps=1)
+    moved = summary(state)
+
+    with pytest.raises(RuntimeError):
+        overlay.commit()
+    stale.rebase(state)
+    with pytest.raises(RuntimeError):
+        stale.commit()
+    assert summary(state) == moved
@@ -1,7 +1,36 @@
 # truth_anchors.py
 
+import threading
+from contextlib import contextmanager
+
 import numpy as np
 
+_aux = threading.local()
+
+
+@contextmanager
+def feeding_aux(row):
+    """Within this block, `aux_uniform` calls on this thread scale `row`'s U(0, 1) draws in turn."""
+    _aux.row, _aux.used = row, 0
+    try:
+        yield
+    finally:
+        _aux.row = None
+
+
+def aux_uniform(low, high):
+    """
+    U(low, high) for anchors that draw their own inputs: the next fed aux
+    draw scaled as the array forms scale it, or np.random outside
+    `feeding_aux` (and once the fed row runs out).
+    """
+    row = getattr(_aux, "row", None)
+    if row is None or _aux.used >= len(row):
+        return np.random.uniform(low, high)
+    u = row[_aux.used]
+    _aux.used += 1
+    return low + (high - low) * u
+
 # Foundational symbolic truths (anchors)
 truth_anchors_scaffold = {
     'associativity_add': lambda a, b, c: np.isclose((a + b) + c, a + (b + c)),
@@ -14,7 +43,7 @@ truth_anchors_scaffold = {
         (2 * x3 + 1 - 2 * x2 - 1) / (x3 - x2), atol=1e-3
     ) and np.isclose((2 * x2 + 1 - 2 * x1 - 1) / (x2 - x1), 2, atol=1e-3)
         for x1, x2, x3 in [
-            (np.random.uniform(-5, 0), np.random.uniform(0, 5), np.random.uniform(5, 10))
+            (aux_uniform(-5, 0), aux_uniform(0, 5), aux_uniform(5, 10))
         ]),
 
     'derivative_quadratic': lambda x: np.isclose(((x**2 + 1e-4) - (x**2)) / 1e-4, 2 * x, atol=0.01),
@@ -44,6 +73,69 @@ truth_anchors_scaffold = {
     'recursive_definition_identity': lambda n: n == (n - 1) + 1 if n > 0 else True
 }
 
+
+def _prime_check_vec(n):
+    """Array form of prime_check: trial division up to the largest sqrt in the block."""
+    n = np.asarray(n, dtype=float)
+    result = n > 1
+    roots = np.floor(np.sqrt(np.where(result, n, 0.0)))
+    for i in range(2, int(roots.max(initial=0)) + 1):
+        result &= ~((roots >= i) & (n % i == 0))
+    return result
+
+
+def _derivative_linear_vec(u):
+    x1 = -5 + 5 * u[:, 0]
+    x2 = 5 * u[:, 1]
+    x3 = 5 + 5 * u[:, 2]
+    slope = (2 * x2 + 1 - 2 * x1 - 1) / (x2 - x1)
+    return (np.isclose(slope, (2 * x3 + 1 - 2 * x2 - 1) / (x3 - x2), atol=1e-3)
+            & np.isclose(slope, 2, atol=1e-3))
+
+
+def _truthy(v):
+    return np.asarray(v).astype(bool)
+
+
+# Array forms of the scaffold: each takes the same positional arguments as its
+# scalar twin, but as equal-length arrays, and returns a boolean array.
+# Zero-argument anchors, which draw their own inputs, instead receive an
+# (n, 3) array of U(0, 1) draws to scale into those inputs.
+vectorized_truth_anchors = {
+    'associativity_add': lambda a, b, c: np.isclose((a + b) + c, a + (b + c)),
+    'commutativity_add': lambda a, b: np.isclose(a + b, b + a),
+    'distributive': lambda a, b, c: np.isclose(a * (b + c), a * b + a * c),
+    'factor_identity': lambda a: np.isclose((a + 1) * (a + 1), a**2 + 2*a + 1),
+
+    'derivative_linear': _derivative_linear_vec,
+
+    'derivative_quadratic': lambda x: np.isclose(((x**2 + 1e-4) - (x**2)) / 1e-4, 2 * x, atol=0.01),
+    'derivative_sin': lambda x: np.isclose((np.sin(x + 1e-4) - np.sin(x)) / 1e-4, np.cos(x), atol=0.01),
+    'pythag_identity': lambda x: np.isclose(np.sin(x)**2 + np.cos(x)**2, 1.0, atol=0.01),
+    'log_exp_inverse': lambda x: np.isclose(np.log(np.exp(x)), x, atol=0.01),
+    'exp_log_inverse': lambda x: np.isclose(np.exp(np.log(np.abs(x) + 1e-5)), np.abs(x), atol=0.01),
+    'dot_product_identity': lambda x, y: np.isclose(x * x + y * y, x**2 + y**2, atol=0.01),
+    'matrix_identity': lambda a: np.isclose((1.0 / a) * a, 1.0, atol=0.01),
+
+    'demorgan_1': lambda p, q: ~(_truthy(p) | _truthy(q)) == (~_truthy(p) & ~_truthy(q)),
+    'demorgan_2': lambda p, q: ~(_truthy(p) & _truthy(q)) == (~_truthy(p) | ~_truthy(q)),
+    'identity_morphism': lambda x: x == x,
+    'composition_morphism': lambda x: (x * 2) + 1 == (2 * x + 1),
+
+    'prime_check': _prime_check_vec,
+    'fibonacci_recurrence': lambda a, b, c: (a + b == c) | (b + c == a) | (a + c == b),
+    'modular_equivalence': lambda a, b, m: np.isclose((a - b) % m, 0),
+    'square_identity': lambda n: np.zeros(np.shape(n), dtype=bool),  # scalar form rejects non-int inputs
+
+    'closure_under_addition': lambda a, b: np.ones(np.shape(a + b), dtype=bool),
+    'identity_element_addition': lambda a: a + 0 == a,
+    'inverse_exists_addition': lambda a: a + (-a) == 0,
+    'commutator_zero_addition': lambda a, b: (a + b) - (b + a) == 0,
+    'associativity_preserves_cycle': lambda a, b, c: ((a + b) + c) == (a + (b + c)),
+    'operation_arity_effect': lambda a, b, c: ((a + b + c) - (a + b)) == c,
+    'recursive_definition_identity': lambda n: np.where(n > 0, n == (n - 1) + 1, True)
+}
+
 # Tier system assigns growth complexity weight to each anchor
 anchor_tiers = {
     k: i for k, i in zip(